@@ -0,0 +1,51 @@
+"""
+Route planning time for the active delivery set.
+
+Plans routes over random stops scattered around the restaurant and reports
+mean planning time and route length against the nearest-neighbour baseline.
+
+Usage (from backend/):
+    python -m benchmarks.delivery_routing [--stops 100] [--runs 20]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from services.delivery_routing import (
+    distance_matrix, nearest_neighbour_route, get_restaurant_location, plan_route
+)
+
+
+def route_length(route: np.ndarray, dist: np.ndarray) -> float:
+    return float(dist[route[:-1], route[1:]].sum())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stops", type=int, default=100)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    restaurant = get_restaurant_location()
+    timings, nn_lengths, lengths = [], [], []
+    for _ in range(args.runs):
+        points = rng.normal([restaurant["lat"], restaurant["lng"]], 0.01, size=(args.stops, 2))
+        stops = [{"coordinates": {"lat": lat, "lng": lng}} for lat, lng in points]
+
+        started = time.perf_counter()
+        result = plan_route(stops)
+        timings.append((time.perf_counter() - started) * 1000)
+        lengths.append(result["total_distance_m"])
+
+        dist = distance_matrix(np.vstack([[restaurant["lat"], restaurant["lng"]], points]))
+        nn_lengths.append(route_length(nearest_neighbour_route(dist), dist))
+
+    print(f"{args.stops} stops, {args.runs} runs")
+    print(f"  planning time   mean {np.mean(timings):.1f} ms, max {np.max(timings):.1f} ms")
+    print(f"  route length    {np.mean(lengths) / 1000:.2f} km (nearest neighbour alone: {np.mean(nn_lengths) / 1000:.2f} km)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+"""
+Latency and throughput of the hot API endpoints, with regression checks.
+
+Runs the app in process (httpx ASGI transport, providers faked as in the
+test harness) against a seeded database with N orders, measures p50/p99
+latency sequentially and throughput with concurrent clients, and compares
+the result with a JSON baseline: any metric worse than the baseline by more
+than --tolerance fails the run (exit code 1).
+
+Each endpoint is measured --repeat times and the medians are kept, so one
+noisy round does not fail the run. Latency (and time per request, for
+throughput) must also be worse by at least --min-delta-ms: on
+sub-millisecond endpoints 25% is timer noise. p99 and throughput are only
+compared when a round had at least MIN_STABLE_SAMPLES requests (login runs
+a tenth of --requests, where p99 is simply the slowest one).
+
+The 1k dataset runs on the in-memory fake database. Larger datasets need a
+real MongoDB (--mongo-url); a throwaway database is created per size and
+dropped afterwards. Baselines are machine-specific, so none is committed:
+record one per machine (or CI runner) with --update-baseline. Without a
+baseline recorded the same way (database and providers), the run refuses
+to start rather than pass without comparing.
+
+--providers stand-in swaps the in-memory provider fakes for the HTTP
+stand-ins in benchmarks/provider_servers.py (real Zoho/Stripe/Resend clients,
+optional latency, errors and rate limits); results are only compared with
+a baseline recorded the same way.
+
+Usage (from backend/):
+    python -m benchmarks.hot_endpoints [--sizes 1k] [--requests 200] [--concurrency 10]
+    python -m benchmarks.hot_endpoints --mongo-url mongodb://localhost:27017 --sizes 1k,100k,1m
+    python -m benchmarks.hot_endpoints --update-baseline
+    python -m benchmarks.hot_endpoints --providers stand-in --provider-latency lognormal:80:800
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import logging
+import argparse
+import platform
+import statistics
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Any, List, Callable
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "panaghia_bench")
+
+import httpx
+from motor.motor_asyncio import AsyncIOMotorClient
+
+import server
+from routes.auth import create_access_token
+from services import background
+from benchmarks import order_history
+from benchmarks.patching import patched
+from testing import new_database, use_database, seed_database, FakeResend, FakeStripe, FakeZoho
+from testing.fake_db import ADMIN_PASSWORD
+from benchmarks.provider_servers import PROVIDERS, StandInServers, FaultProfile, parse_latency, seed_zoho_tokens
+
+DEFAULT_BASELINE = Path(__file__).parent / "baselines" / "hot_endpoints.json"
+SIZES = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000}
+# The fake database is pure Python; past this it measures mongomock, not us
+FAKE_DB_MAX_ORDERS = 10_000
+# Below this many requests per round, p99 and throughput are a few outliers
+MIN_STABLE_SAMPLES = 100
+ADMIN_EMAIL = "bench@panaghia.ro"
+
+
+def order_body(menu_ids: List[str], rng: random.Random) -> Dict[str, Any]:
+    return {
+        "items": [{"menu_item_id": item_id, "quantity": rng.randint(1, 3)} for item_id in rng.sample(menu_ids, rng.randint(1, 4))],
+        "customer": {"name": "Bench Client", "phone": f"07{rng.randint(10000000, 99999999)}"},
+        "order_type": "pickup",
+        "payment_method": "cash"
+    }
+
+
+def endpoints(menu_ids: List[str], rng: random.Random) -> Dict[str, Callable[[], Dict[str, Any]]]:
+    """name -> request kwargs factory; names are the baseline keys"""
+    admin = {"Authorization": f"Bearer {create_access_token({'sub': ADMIN_EMAIL})}"}
+    return {
+        "GET /api/menu/items": lambda: {"method": "GET", "url": "/api/menu/items"},
+        "GET /api/menu/categories": lambda: {"method": "GET", "url": "/api/menu/categories"},
+        "POST /api/orders/": lambda: {"method": "POST", "url": "/api/orders/", "json": order_body(menu_ids, rng)},
+        "GET /api/admin/dashboard": lambda: {"method": "GET", "url": "/api/admin/dashboard", "headers": admin},
+        "GET /api/admin/orders": lambda: {"method": "GET", "url": "/api/admin/orders", "headers": admin},
+        "POST /api/auth/login": lambda: {
+            "method": "POST", "url": "/api/auth/login", "json": {"email": ADMIN_EMAIL, "password": ADMIN_PASSWORD}
+        },
+    }
+
+
+async def measure(client: httpx.AsyncClient, make_request, requests: int, concurrency: int) -> Dict[str, float]:
+    for _ in range(min(10, requests)):
+        await client.request(**make_request())
+
+    latencies = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        response = await client.request(**make_request())
+        latencies.append((time.perf_counter() - started) * 1000)
+        if response.status_code >= 400:
+            raise RuntimeError(f"{response.status_code} {response.text[:200]}")
+    latencies.sort()
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            await client.request(**make_request())
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - started
+    await background.drain(timeout=10)
+
+    return {
+        "p50_ms": round(statistics.median(latencies), 3),
+        "p99_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))], 3),
+        "rps": round(requests / elapsed, 1),
+        "samples": requests
+    }
+
+
+def median_of(rounds: List[Dict[str, float]]) -> Dict[str, float]:
+    """Per-metric median over repeated rounds of one endpoint"""
+    return {
+        "p50_ms": round(statistics.median(r["p50_ms"] for r in rounds), 3),
+        "p99_ms": round(statistics.median(r["p99_ms"] for r in rounds), 3),
+        "rps": round(statistics.median(r["rps"] for r in rounds), 1),
+        "samples": rounds[0]["samples"],
+        "repeat": len(rounds)
+    }
+
+
+async def run_size(label: str, count: int, args) -> Dict[str, Dict[str, float]]:
+    rng = random.Random(42)
+    mongo_client = None
+    if args.mongo_url:
+        mongo_client = AsyncIOMotorClient(args.mongo_url)
+        db = mongo_client[f"panaghia_bench_{label}"]
+        await mongo_client.drop_database(db.name)
+    else:
+        db = new_database()
+
+    use_database(db)
+    await seed_database(ADMIN_EMAIL)
+    if mongo_client:
+        await server.create_indexes()
+    if args.providers == "stand-in":
+        await seed_zoho_tokens(db)
+
+    started = time.perf_counter()
+    await order_history.insert_orders(db, count, days=365)
+    print(f"[{label}] seeded {count} orders in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+    menu_ids = [item["id"] for item in await db.menu_items.find({}, {"_id": 0, "id": 1}).to_list(None)]
+    results = {}
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for name, make_request in endpoints(menu_ids, rng).items():
+            # bcrypt dominates login; fewer rounds keep the run short without hiding regressions
+            requests = max(10, args.requests // 10) if name == "POST /api/auth/login" else args.requests
+            rounds = [await measure(client, make_request, requests, args.concurrency) for _ in range(args.repeat)]
+            results[name] = median_of(rounds)
+            print(f"[{label}] {name:<28} {results[name]}", file=sys.stderr)
+
+    if mongo_client and not args.keep:
+        await mongo_client.drop_database(db.name)
+    return results
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float, min_delta_ms: float) -> List[str]:
+    """
+    Metrics worse than the baseline by more than `tolerance` (latency up,
+    throughput down) and by at least `min_delta_ms` (per request)
+    """
+    regressions = []
+    for size, endpoints_ in results.items():
+        for name, current in endpoints_.items():
+            base = baseline.get(size, {}).get(name)
+            if not base:
+                continue
+            # Baselines recorded before "samples" existed count as too small
+            stable = min(current.get("samples", 0), base.get("samples", 0)) >= MIN_STABLE_SAMPLES
+            for metric in ("p50_ms", "p99_ms") if stable else ("p50_ms",):
+                slower = current[metric] > base[metric] * (1 + tolerance)
+                if slower and current[metric] - base[metric] >= min_delta_ms:
+                    regressions.append(f"{size} {name} {metric}: {base[metric]} -> {current[metric]}")
+            if stable and current["rps"] < base["rps"] / (1 + tolerance):
+                if 1000 / current["rps"] - 1000 / base["rps"] >= min_delta_ms:
+                    regressions.append(f"{size} {name} rps: {base['rps']} -> {current['rps']}")
+    return regressions
+
+
+async def run(args) -> Dict[str, Any]:
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    results = {}
+    stand_ins = None
+    with patched() as monkeypatch:
+        if args.providers == "stand-in":
+            profile = dict(latency=args.provider_latency, error_rate=args.provider_error_rate, rate_limit=args.provider_rate_limit)
+            stand_ins = StandInServers({name: FaultProfile(**profile) for name in PROVIDERS}, seed=42).start()
+            stand_ins.install(monkeypatch)
+        else:
+            FakeResend().install(monkeypatch)
+            FakeStripe().install(monkeypatch)
+            FakeZoho().install(monkeypatch)
+        try:
+            for label in args.sizes:
+                results[label] = await run_size(label, SIZES[label], args)
+        finally:
+            if stand_ins:
+                stand_ins.stop()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1k", help=f"Comma-separated, from {', '.join(SIZES)}")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per endpoint (login uses a tenth)")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=3, help="Rounds per endpoint; the medians are reported")
+    parser.add_argument("--mongo-url", help="Run against a real MongoDB instead of the in-memory fake")
+    parser.add_argument("--keep", action="store_true", help="Keep the seeded MongoDB databases")
+    parser.add_argument("--providers", choices=("fake", "stand-in"), default="fake",
+                        help="In-memory provider fakes, or HTTP stand-ins with the real clients")
+    parser.add_argument("--provider-latency", default="fixed:0", help="Stand-in latency, e.g. lognormal:80:800")
+    parser.add_argument("--provider-error-rate", type=float, default=0.0, help="Stand-in share of failing requests")
+    parser.add_argument("--provider-rate-limit", type=float, default=0.0, help="Stand-in requests per second before 429")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown, 0.25 = 25%%")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0,
+                        help="Slowdowns smaller than this per request are never regressions")
+    parser.add_argument("--update-baseline", action="store_true", help="Write the results as the new baseline")
+    args = parser.parse_args()
+
+    args.sizes = [size.strip().lower() for size in args.sizes.split(",") if size.strip()]
+    unknown = [size for size in args.sizes if size not in SIZES]
+    if unknown:
+        parser.error(f"unknown size(s): {', '.join(unknown)}")
+    if args.repeat < 1:
+        parser.error("--repeat must be at least 1")
+    if not args.mongo_url and any(SIZES[size] > FAKE_DB_MAX_ORDERS for size in args.sizes):
+        parser.error("sizes above 1k need --mongo-url")
+    try:
+        parse_latency(args.provider_latency)
+    except ValueError as e:
+        parser.error(str(e))
+
+    database = "mongodb" if args.mongo_url else "fake"
+    providers = "fake" if args.providers == "fake" else {
+        "stand-in": {"latency": args.provider_latency, "error_rate": args.provider_error_rate, "rate_limit": args.provider_rate_limit}
+    }
+    baseline = None
+    if not args.update_baseline:
+        if not args.baseline.exists():
+            parser.error(f"no baseline at {args.baseline}; record one on this machine with --update-baseline")
+        baseline = json.loads(args.baseline.read_text())
+        if baseline.get("database") != database:
+            parser.error(f"baseline was recorded on the {baseline.get('database')} database, not {database}")
+        if baseline.get("providers", "fake") != providers:
+            parser.error(f"baseline was recorded with providers {baseline.get('providers', 'fake')}, not {providers}")
+
+    results = asyncio.run(run(args))
+    report = {
+        "recorded_at": datetime.now(timezone.utc).isoformat(),
+        "machine": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "database": database,
+        "providers": providers,
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "repeat": args.repeat,
+        "results": results
+    }
+    print(json.dumps(report, indent=2))
+
+    if args.update_baseline:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        # Keep sizes that were not re-run this time
+        previous = json.loads(args.baseline.read_text())["results"] if args.baseline.exists() else {}
+        report["results"] = {**previous, **results}
+        args.baseline.write_text(json.dumps(report, indent=2) + "\n")
+        print(f"Baseline written to {args.baseline}", file=sys.stderr)
+        return
+
+    regressions = compare(results, baseline["results"], args.tolerance, args.min_delta_ms)
+    if regressions:
+        print(f"Regressions beyond {args.tolerance:.0%} (and {args.min_delta_ms:g} ms):", file=sys.stderr)
+        for line in regressions:
+            print(f"  {line}", file=sys.stderr)
+        sys.exit(1)
+    print(f"No regressions beyond {args.tolerance:.0%}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
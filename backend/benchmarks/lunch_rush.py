@@ -0,0 +1,564 @@
+"""
+Lunch-rush load test.
+
+Replays a compressed weekday lunch (11:30-14:00, --speed times faster)
+against the app in process or a running server:
+- anonymous visitors load the home and menu pages (info, popular items,
+  reviews, daily menu, categories, all items), peaking with the orders
+- orders spike between 12:00 and 13:30
+- admins poll the dashboard and the order list
+- drivers send a location ping every few seconds
+Arrivals are open-loop (Poisson, scheduled ahead of time) and latency is
+measured from the scheduled start, so a saturated server shows up as
+growing latency instead of a politely slower client.
+
+With --ramp the peak mix is replayed at increasing multiples until order
+p99 exceeds --slo-ms, more than 1% of requests fail, or the server falls
+behind the offered rate; the last multiple that held is the saturation
+point. The server's in-flight high-water mark and (with a real MongoDB)
+Motor pool checkouts and waiters are read from its /metrics during each
+step to size workers and maxPoolSize.
+
+In process, the app runs under uvicorn in its own thread and event loop,
+so requests really overlap; the generator still shares the process (and
+the GIL). When it launches requests late, latencies include its own
+backlog and the sizing estimate is withheld. Past --max-in-flight
+outstanding requests, new ones are shed and counted as errors rather than
+queued in the client.
+
+Usage (from backend/):
+    python -m benchmarks.lunch_rush [--speed 60] [--history 5000]
+    python -m benchmarks.lunch_rush --ramp 1,2,4,8,16 --step-seconds 30
+    python -m benchmarks.lunch_rush --providers stand-in --provider-latency lognormal:80:2000 --provider-error-rate 0.05
+    python -m benchmarks.lunch_rush --base-url http://localhost:8001 --admin-email ... --admin-password ...
+"""
+import os
+import re
+import sys
+import json
+import time
+import random
+import socket
+import logging
+import asyncio
+import argparse
+import threading
+from collections import defaultdict
+from typing import Dict, Any, List, Callable, Optional
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "panaghia_loadtest")
+
+import httpx
+
+DAY_START_MINUTES = 11 * 60 + 30
+DAY_END_MINUTES = 14 * 60
+PEAK_MINUTES = (12 * 60, 13 * 60 + 30)
+RESTAURANT = (47.3463, 25.3550)
+
+HOME_BUNDLE = ["/api/restaurant/info", "/api/menu/items?popular_only=true", "/api/restaurant/reviews", "/api/menu/daily"]
+MENU_BUNDLE = ["/api/menu/categories", "/api/menu/items"]
+# Whole-page steps; their requests are also recorded one by one under "<step> <path>"
+PAGE_STEPS = ("browse: home", "browse: menu")
+PEAK_METRICS = ("in_flight", "server_in_flight", "server_in_flight_peak", "pool_in_use", "pool_waiting")
+ADMIN_EMAIL = "loadtest@panaghia.ro"
+
+
+def peak_factor(minute: float) -> float:
+    """0..1 shape of the rush: ramps up over 15 minutes into the peak and down after it"""
+    start, end = PEAK_MINUTES
+    if minute < start - 15 or minute > end + 15:
+        return 0.0
+    if minute < start:
+        return (minute - (start - 15)) / 15
+    if minute > end:
+        return (end + 15 - minute) / 15
+    return 1.0
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.offered: Dict[str, int] = defaultdict(int)
+        self.shed: Dict[str, int] = defaultdict(int)
+        self.in_flight = 0
+        self.peaks = {name: 0.0 for name in PEAK_METRICS}
+        # How late the generator launched requests; large values mean it, not the server, fell behind
+        self.schedule_lag = 0.0
+
+    def report(self, elapsed: float) -> Dict[str, Any]:
+        steps = {}
+        for step in sorted(set(self.offered) | set(self.latencies)):
+            values = sorted(self.latencies.get(step, []))
+            done = len(values)
+            steps[step] = {
+                "offered": self.offered.get(step, 0),
+                "completed": done,
+                "errors": self.errors.get(step, 0),
+                "shed": self.shed.get(step, 0),
+                "rps": round(done / elapsed, 2) if elapsed else 0,
+                **({
+                    "mean_ms": round(sum(values) / done, 1),
+                    "p50_ms": round(values[done // 2], 1),
+                    "p90_ms": round(values[min(done - 1, int(done * 0.9))], 1),
+                    "p99_ms": round(values[min(done - 1, int(done * 0.99))], 1),
+                    "max_ms": round(values[-1], 1)
+                } if done else {})
+            }
+        return {"seconds": round(elapsed, 1), "steps": steps, "peaks": dict(self.peaks),
+                "schedule_lag_ms": round(self.schedule_lag * 1000, 1)}
+
+
+class LunchRush:
+    def __init__(self, client: httpx.AsyncClient, args, admin_headers: Dict[str, str],
+                 driver_headers: List[Dict[str, str]], menu_ids: List[str], sample_pool: Callable[[], Dict[str, float]]):
+        self.client = client
+        self.args = args
+        self.admin_headers = admin_headers
+        self.driver_headers = driver_headers
+        self.menu_ids = menu_ids
+        self.sample_pool = sample_pool
+        self.rng = random.Random(args.seed)
+        self.tasks: set = set()
+
+    # ---- requests ----
+
+    async def _call(self, recorder: Recorder, step: str, scheduled: float, method: str, url: str, **kwargs):
+        if recorder.in_flight >= self.args.max_in_flight:
+            # Shed instead of queueing: a client-side queue of thousands starves the generator itself
+            recorder.errors[step] += 1
+            recorder.shed[step] += 1
+            return
+        recorder.in_flight += 1
+        recorder.peaks["in_flight"] = max(recorder.peaks["in_flight"], recorder.in_flight)
+        try:
+            response = await self.client.request(method, url, timeout=self.args.timeout, **kwargs)
+            failed = response.status_code >= 400
+        except httpx.HTTPError:
+            failed = True
+        finally:
+            recorder.in_flight -= 1
+        if failed:
+            recorder.errors[step] += 1
+        else:
+            recorder.latencies[step].append((time.perf_counter() - scheduled) * 1000)
+
+    async def visitor(self, recorder: Recorder, scheduled: float):
+        # Each page's requests go out together, like the browser does: home first, then the menu
+        started = scheduled
+        for bundle, step in ((HOME_BUNDLE, "browse: home"), (MENU_BUNDLE, "browse: menu")):
+            recorder.offered[step] += 1
+            for url in bundle:
+                recorder.offered[f"{step} {url.split('?')[0]}"] += 1
+            await asyncio.gather(*(self._call(recorder, f"{step} {url.split('?')[0]}", started, "GET", url) for url in bundle))
+            recorder.latencies[step].append((time.perf_counter() - started) * 1000)
+            started = time.perf_counter()
+
+    async def order(self, recorder: Recorder, scheduled: float):
+        rng = self.rng
+        delivery = rng.random() < 0.35
+        body = {
+            "items": [{"menu_item_id": item_id, "quantity": rng.randint(1, 2)} for item_id in rng.sample(self.menu_ids, rng.randint(1, 4))],
+            "customer": {
+                "name": "Load Test", "phone": f"07{rng.randint(20000000, 89999999)}",
+                **({"address": "Strada Dornelor nr. 10, Vatra Dornei"} if delivery else {})
+            },
+            "order_type": "delivery" if delivery else "pickup",
+            "payment_method": "cash"
+        }
+        recorder.offered["order: POST /api/orders/"] += 1
+        await self._call(recorder, "order: POST /api/orders/", scheduled, "POST", "/api/orders/", json=body)
+
+    async def admin_poll(self, recorder: Recorder, scheduled: float):
+        for url in ("/api/admin/dashboard", "/api/admin/orders?limit=50"):
+            step = f"admin: GET {url.split('?')[0]}"
+            recorder.offered[step] += 1
+            await self._call(recorder, step, scheduled, "GET", url, headers=self.admin_headers)
+
+    async def driver_ping(self, recorder: Recorder, scheduled: float, driver: int):
+        ping = {
+            "lat": RESTAURANT[0] + self.rng.uniform(-0.01, 0.01),
+            "lng": RESTAURANT[1] + self.rng.uniform(-0.015, 0.015),
+            "accuracy_m": 8, "speed_mps": self.rng.uniform(0, 12)
+        }
+        recorder.offered["driver: POST /api/drivers/location"] += 1
+        await self._call(recorder, "driver: POST /api/drivers/location", scheduled, "POST", "/api/drivers/location",
+                         json=ping, headers=self.driver_headers[driver])
+
+    # ---- scheduling ----
+
+    def _launch(self, coro):
+        task = asyncio.ensure_future(coro)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def _poisson(self, recorder: Recorder, rate_per_second: Callable[[float], float], action, until: float):
+        """Non-homogeneous Poisson arrivals by thinning; rate is a function of seconds since start"""
+        started = time.perf_counter()
+        peak_rate = max(rate_per_second(t) for t in range(0, int(until) + 1)) or 0
+        if peak_rate <= 0:
+            return
+        at = 0.0
+        while True:
+            at += self.rng.expovariate(peak_rate)
+            if at >= until:
+                return
+            if self.rng.random() * peak_rate > rate_per_second(at):
+                continue
+            delay = started + at - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            recorder.schedule_lag = max(recorder.schedule_lag, time.perf_counter() - started - at)
+            self._launch(action(recorder, started + at))
+
+    async def _every(self, recorder: Recorder, interval: float, action, until: float, offset: float):
+        started = time.perf_counter()
+        at = offset
+        while at < until:
+            delay = started + at - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            recorder.schedule_lag = max(recorder.schedule_lag, time.perf_counter() - started - at)
+            self._launch(action(recorder, started + at))
+            at += interval
+
+    async def _sample(self, recorder: Recorder, until: float):
+        started = time.perf_counter()
+        while time.perf_counter() - started < until:
+            for name, value in self.sample_pool().items():
+                recorder.peaks[name] = max(recorder.peaks[name], value)
+            await asyncio.sleep(0.25)
+
+    async def run(self, seconds: float, visitors_rate, orders_rate) -> Dict[str, Any]:
+        recorder = Recorder()
+        args = self.args
+        started = time.perf_counter()
+        await asyncio.gather(
+            self._poisson(recorder, visitors_rate, self.visitor, seconds),
+            self._poisson(recorder, orders_rate, self.order, seconds),
+            *(self._every(recorder, args.admin_poll_seconds, self.admin_poll, seconds, index * 1.7) for index in range(args.admins)),
+            *(
+                self._every(recorder, args.driver_ping_seconds, lambda r, s, d=index: self.driver_ping(r, s, d), seconds, index * 0.9)
+                for index in range(args.drivers)
+            ),
+            self._sample(recorder, seconds)
+        )
+        if self.tasks:
+            await asyncio.wait(set(self.tasks), timeout=args.timeout)
+        return recorder.report(time.perf_counter() - started)
+
+    async def lunch(self) -> Dict[str, Any]:
+        """The whole 11:30-14:00 window, compressed by --speed"""
+        args = self.args
+        seconds = (DAY_END_MINUTES - DAY_START_MINUTES) * 60 / args.speed
+
+        def minute(t: float) -> float:
+            return DAY_START_MINUTES + t * args.speed / 60
+
+        def per_second(per_minute_base: float, per_minute_peak: float):
+            return lambda t: (per_minute_base + (per_minute_peak - per_minute_base) * peak_factor(minute(t))) * args.speed / 60
+
+        return await self.run(
+            seconds,
+            per_second(args.peak_visitors_per_min / 5, args.peak_visitors_per_min),
+            per_second(args.peak_orders_per_min / 10, args.peak_orders_per_min)
+        )
+
+    async def ramp(self, multiples: List[float]) -> Dict[str, Any]:
+        """Peak mix at increasing multiples until it no longer holds"""
+        args = self.args
+        results, sustained = [], None
+        for multiple in multiples:
+            visitors = args.peak_visitors_per_min * multiple * args.speed / 60
+            orders = args.peak_orders_per_min * multiple * args.speed / 60
+            report = await self.run(args.step_seconds, lambda t: visitors, lambda t: orders)
+            order_step = report["steps"].get("order: POST /api/orders/", {})
+            requests = {name: step for name, step in report["steps"].items() if name not in PAGE_STEPS}
+            total_offered = sum(step["offered"] for step in requests.values())
+            total_errors = sum(step["errors"] for step in requests.values())
+            reasons = []
+            if order_step.get("p99_ms", 0) > args.slo_ms:
+                reasons.append(f"order p99 {order_step['p99_ms']} ms > {args.slo_ms} ms")
+            if total_offered and total_errors / total_offered > 0.01:
+                reasons.append(f"{total_errors}/{total_offered} requests failed")
+            if total_offered and sum(step["completed"] + step["errors"] for step in requests.values()) < 0.9 * total_offered:
+                reasons.append("fell behind the offered rate")
+            results.append({"multiple": multiple, "orders_per_min": round(args.peak_orders_per_min * multiple, 1),
+                            "saturated": reasons, **report})
+            print(f"x{multiple}: {'SATURATED ' + '; '.join(reasons) if reasons else 'ok'} {json.dumps(order_step)}", file=sys.stderr)
+            if reasons:
+                break
+            sustained = multiple
+        return {
+            "steps": results,
+            "saturation": {
+                "sustained_multiple": sustained,
+                "sustained_orders_per_min": round(args.peak_orders_per_min * sustained, 1) if sustained else None
+            }
+        }
+
+
+# ============== TARGETS ==============
+
+def _scrape_gauges(text: str) -> Dict[str, float]:
+    """Sum of each gauge we watch over its labels, from a Prometheus text page"""
+    totals = {name: 0.0 for name in PEAK_METRICS if name != "in_flight"}
+    names = {
+        "http_requests_in_flight": "server_in_flight",
+        "http_requests_in_flight_peak": "server_in_flight_peak",
+        "mongodb_pool_connections_in_use": "pool_in_use",
+        "mongodb_pool_checkout_waiting": "pool_waiting"
+    }
+    for line in text.splitlines():
+        match = re.match(r"^(\w+)(?:\{[^}]*\})? ([0-9.eE+-]+)$", line)
+        if match and match.group(1) in names:
+            totals[names[match.group(1)]] += float(match.group(2))
+    return totals
+
+
+async def run_remote(args) -> Dict[str, Any]:
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    limits = httpx.Limits(max_connections=args.max_connections, max_keepalive_connections=args.max_connections)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits) as client:
+        login = await client.post("/api/auth/login", json={"email": args.admin_email, "password": args.admin_password})
+        login.raise_for_status()
+        admin_headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+        driver_headers = []
+        for index in range(args.drivers):
+            issued = await client.post(f"/api/drivers/loadtest-{index}/token", json={"name": f"Load Test {index}"}, headers=admin_headers)
+            issued.raise_for_status()
+            driver_headers.append({"Authorization": f"Bearer {issued.json()['token']}"})
+        menu_ids = [item["id"] for item in (await client.get("/api/menu/items")).json()]
+
+        # The server's own gauges; one worker's view when it runs several. The in-flight
+        # peak is recorded by the server itself, so it catches bursts between scrapes
+        metrics_headers = {"Authorization": f"Bearer {args.metrics_token}"} if args.metrics_token else {}
+        latest: Dict[str, float] = {}
+
+        async def scrape():
+            while True:
+                try:
+                    response = await client.get("/metrics", headers=metrics_headers, timeout=2)
+                    if response.status_code == 200:
+                        latest.update(_scrape_gauges(response.text))
+                except httpx.HTTPError:
+                    pass
+                await asyncio.sleep(0.5)
+
+        scraper = asyncio.create_task(scrape())
+        try:
+            rush = LunchRush(client, args, admin_headers, driver_headers, menu_ids, lambda: dict(latest))
+            return await (rush.ramp(args.ramp) if args.ramp else rush.lunch())
+        finally:
+            scraper.cancel()
+
+
+class InProcessServer:
+    """server.app under uvicorn on a free localhost port, in its own thread and event loop
+
+    With the load generator and the app on one loop, a request to the fake
+    database never yields: nothing is ever in flight at once and every delay
+    shows up as the generator's own backlog. Here they only share the process.
+    """
+
+    def __init__(self, setup: Callable[[], Any], teardown: Callable[[], Any]):
+        self._setup = setup
+        self._teardown = teardown
+        self._server = None
+        self._thread: Optional[threading.Thread] = None
+        self._error: Optional[BaseException] = None
+        self.url = None
+
+    def start(self) -> str:
+        import uvicorn
+        import server
+
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.bind(("127.0.0.1", 0))
+        sock.listen(1024)
+        self.url = f"http://127.0.0.1:{sock.getsockname()[1]}"
+        # No lifespan: startup would seed and index the configured MongoDB, not the test database
+        self._server = uvicorn.Server(uvicorn.Config(server.app, lifespan="off", log_level="warning", access_log=False))
+        ready = threading.Event()
+
+        async def serve():
+            try:
+                await self._setup()
+                serving = asyncio.create_task(self._server.serve(sockets=[sock]))
+                while not self._server.started and not serving.done():
+                    await asyncio.sleep(0.01)
+                ready.set()
+                await serving
+            except BaseException as e:
+                self._error = e
+            finally:
+                ready.set()
+                await self._teardown()
+                sock.close()
+
+        self._thread = threading.Thread(target=lambda: asyncio.run(serve()), name="lunch-rush-app", daemon=True)
+        self._thread.start()
+        ready.wait()
+        if self._error:
+            raise self._error
+        return self.url
+
+    def stop(self):
+        if self._server:
+            self._server.should_exit = True
+        if self._thread:
+            self._thread.join(timeout=60)
+
+
+async def run_in_process(args) -> Dict[str, Any]:
+    # Imported here so --base-url runs need nothing but httpx
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    import server
+    from services import background, metrics
+    from benchmarks import order_history
+    from benchmarks.patching import patched
+    from testing import new_database, use_database, seed_database, FakeResend, FakeStripe, FakeZoho
+    from testing.fake_db import ADMIN_PASSWORD
+    from benchmarks.provider_servers import PROVIDERS, StandInServers, FaultProfile, seed_zoho_tokens
+
+    state: Dict[str, Any] = {}
+
+    async def setup():
+        # Runs on the app's loop: Motor binds to the loop it is first used on
+        if args.mongo_url:
+            state["client"] = AsyncIOMotorClient(
+                args.mongo_url, maxPoolSize=args.pool_size, event_listeners=[metrics.PoolMetricsListener()]
+            )
+            db = state["client"]["panaghia_lunch_rush"]
+            await state["client"].drop_database(db.name)
+        else:
+            db = new_database()
+        state["db"] = db
+        use_database(db)
+        await seed_database(ADMIN_EMAIL)
+        if args.mongo_url:
+            await server.create_indexes()
+        if args.providers == "stand-in":
+            await seed_zoho_tokens(db)
+        if args.history:
+            started = time.perf_counter()
+            await order_history.insert_orders(db, args.history, days=90)
+            print(f"seeded {args.history} orders in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+    async def teardown():
+        await background.drain(timeout=10)
+        if "client" in state:
+            await state["client"].drop_database(state["db"].name)
+
+    with patched() as monkeypatch:
+        stand_ins = None
+        if args.providers == "stand-in":
+            profile = dict(latency=args.provider_latency, error_rate=args.provider_error_rate, rate_limit=args.provider_rate_limit)
+            stand_ins = StandInServers({name: FaultProfile(**profile) for name in PROVIDERS}, seed=args.seed).start()
+            stand_ins.install(monkeypatch)
+        else:
+            FakeResend().install(monkeypatch)
+            FakeStripe().install(monkeypatch)
+            FakeZoho().install(monkeypatch)
+
+        app = InProcessServer(setup, teardown)
+        try:
+            args.base_url = app.start()
+            args.admin_email, args.admin_password = ADMIN_EMAIL, ADMIN_PASSWORD
+            return await run_remote(args)
+        finally:
+            app.stop()
+            if stand_ins:
+                stand_ins.stop()
+
+
+# Launch lateness past which latencies measure the generator, not the server
+MAX_SCHEDULE_LAG_MS = 50
+
+
+def sizing(report: Dict[str, Any], args) -> Dict[str, Any]:
+    """Little's law on the busiest step that held: concurrency = throughput x latency"""
+    runs = report["steps"] if args.ramp else [report]
+    held = [run for run in runs if not run.get("saturated")] or runs[:1]
+    busiest = held[-1]
+    requests = {name: step for name, step in busiest["steps"].items() if name not in PAGE_STEPS and step["completed"]}
+    throughput = sum(step["rps"] for step in requests.values())
+    mean_latency = sum(step["rps"] * step["mean_ms"] for step in requests.values()) / throughput / 1000 if throughput else 0
+    result = {
+        "target": "in process (uvicorn thread, same process as the generator)" if args.in_process else args.base_url,
+        "requests_per_second": round(throughput, 1),
+        "concurrent_requests_littles_law": round(throughput * mean_latency, 1),
+        "peak_in_flight": busiest["peaks"]["in_flight"],
+        "peak_server_in_flight": busiest["peaks"]["server_in_flight_peak"] or busiest["peaks"]["server_in_flight"],
+        "peak_pool_in_use": busiest["peaks"]["pool_in_use"],
+        "peak_pool_waiting": busiest["peaks"]["pool_waiting"],
+        "schedule_lag_ms": busiest["schedule_lag_ms"],
+        "note": "pool waiters > 0 means maxPoolSize is the bottleneck; in-flight near a worker's limit means add workers"
+    }
+    if busiest["schedule_lag_ms"] > MAX_SCHEDULE_LAG_MS:
+        # Latencies then include the generator's own backlog; concurrency derived from them is not the server's
+        result["concurrent_requests_littles_law"] = None
+        result["warning"] = (
+            f"load generator launched requests up to {busiest['schedule_lag_ms']} ms late; lower --speed or the "
+            "load, or run the generator on another machine with --base-url"
+        )
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", help="Load a running server instead of the app in process")
+    parser.add_argument("--admin-email", help="Admin login on --base-url (admins poll with it, drivers get tokens)")
+    parser.add_argument("--admin-password")
+    parser.add_argument("--metrics-token", default=os.environ.get("METRICS_TOKEN"), help="For the server's /metrics")
+    parser.add_argument("--mongo-url", help="In process: use a real MongoDB instead of the in-memory fake")
+    parser.add_argument("--pool-size", type=int, default=100, help="In process with --mongo-url: Motor maxPoolSize")
+    parser.add_argument("--history", type=int, default=0, help="In process: synthetic past orders to seed first")
+    parser.add_argument("--providers", choices=("fake", "stand-in"), default="fake",
+                        help="In process: in-memory fakes, or HTTP stand-ins (benchmarks/provider_servers.py) with the real clients")
+    parser.add_argument("--provider-latency", default="fixed:0", help="Stand-in latency, e.g. lognormal:80:800")
+    parser.add_argument("--provider-error-rate", type=float, default=0.0, help="Stand-in share of failing requests")
+    parser.add_argument("--provider-rate-limit", type=float, default=0.0, help="Stand-in requests per second before 429")
+    parser.add_argument("--speed", type=float, default=60, help="Simulated seconds per real second (also scales --ramp rates)")
+    parser.add_argument("--peak-orders-per-min", type=float, default=4, help="Simulated orders per minute at the peak")
+    parser.add_argument("--peak-visitors-per-min", type=float, default=40, help="Simulated visitors per minute at the peak")
+    parser.add_argument("--admins", type=int, default=2)
+    parser.add_argument("--admin-poll-seconds", type=float, default=5, help="Real seconds between dashboard polls")
+    parser.add_argument("--drivers", type=int, default=4)
+    parser.add_argument("--driver-ping-seconds", type=float, default=5, help="Real seconds between location pings")
+    parser.add_argument("--ramp", help="Comma-separated load multiples, e.g. 1,2,4,8,16")
+    parser.add_argument("--step-seconds", type=float, default=30, help="Real seconds per --ramp step")
+    parser.add_argument("--slo-ms", type=float, default=500, help="Order p99 past which a --ramp step is saturated")
+    parser.add_argument("--timeout", type=float, default=30, help="Per-request timeout in seconds")
+    parser.add_argument("--max-connections", type=int, default=256, help="Client connection limit")
+    parser.add_argument("--max-in-flight", type=int, default=256,
+                        help="Requests past this many outstanding are shed (counted as errors), not queued")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    if args.base_url and not (args.admin_email and args.admin_password):
+        parser.error("--base-url needs --admin-email and --admin-password")
+    if args.base_url and (args.mongo_url or args.history or args.providers != "fake"):
+        parser.error("--mongo-url, --history and --providers only apply in process (run benchmarks.provider_servers for a server)")
+    if args.providers == "stand-in":
+        from benchmarks.provider_servers import parse_latency
+        try:
+            parse_latency(args.provider_latency)
+        except ValueError as e:
+            parser.error(str(e))
+    if args.ramp:
+        try:
+            args.ramp = [float(value) for value in args.ramp.split(",") if value.strip()]
+        except ValueError:
+            parser.error("--ramp takes numbers, e.g. 1,2,4,8")
+
+    args.in_process = not args.base_url
+    report = asyncio.run(run_in_process(args) if args.in_process else run_remote(args))
+    report["sizing"] = sizing(report, args)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+"""
+Synthetic order history for scale testing.
+
+Bulk-inserts realistic orders so the dashboard, pagination, export and
+archive paths can be measured with years of data. Orders fall on weekdays
+in opening hours (11:00-17:00 Bucharest time) with most of them in the
+12:00-13:30 lunch peak, use meal-shaped mixes of the real menu (main, often
+a soup and a side, sometimes a salad, dessert or drink), come from a pool of
+repeat customers, and about a third are deliveries to real Vatra Dornei
+streets with coordinates. Past orders are delivered or cancelled with a
+consistent status history; today's are spread over the live statuses.
+Payment methods are mixed, and online card payments carry a payment status.
+
+Documents are inserted with insert_many in large unordered batches. The next
+batch is generated while MongoDB handles the previous one; only the server's
+time overlaps, since generation and BSON encoding share the GIL. Every
+generated order has synthetic: true, so --purge can remove them again.
+
+Usage (from backend/):
+    python -m benchmarks.order_history --mongo-url mongodb://localhost:27017 --db panaghia_scale --orders 2000000 --days 1095
+    python -m benchmarks.order_history --mongo-url mongodb://localhost:27017 --db panaghia_scale --purge
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+from datetime import datetime, date, timedelta, timezone
+from typing import Dict, Any, List, Iterator, Optional
+from zoneinfo import ZoneInfo
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import BulkWriteError
+
+from services import delivery_geo, geocoding_service
+
+LOCAL_TZ = ZoneInfo("Europe/Bucharest")
+OPEN_MINUTES = (11 * 60, 17 * 60)
+LUNCH_PEAK_MINUTES = (12 * 60, 13 * 60 + 30)
+LUNCH_PEAK_SHARE = 0.6
+DELIVERY_SHARE = 0.35
+CANCELLED_SHARE = 0.06
+DEFAULT_BATCH_SIZE = 20000
+
+# Share of orders per payment method
+PAYMENT_METHODS = [("cash", 0.55), ("card", 0.2), ("card_online", 0.25)]
+LIVE_STATUSES = [("pending", 0.25), ("confirmed", 0.2), ("preparing", 0.25), ("ready", 0.15), ("out_for_delivery", 0.15)]
+FLOW = ["pending", "confirmed", "preparing", "ready"]
+
+FIRST_NAMES = ["Andrei", "Maria", "Ioana", "Mihai", "Elena", "Alexandru", "Ana", "Gabriel", "Cristina", "Vasile",
+               "Adriana", "Ion", "Daniela", "Florin", "Raluca", "Gheorghe", "Irina", "Bogdan", "Simona", "Petru"]
+LAST_NAMES = ["Popescu", "Ionescu", "Rusu", "Moldovan", "Ciobanu", "Lazăr", "Munteanu", "Constantin", "Tănase",
+              "Hojda", "Cojocaru", "Ursu", "Onu", "Avram", "Nistor", "Bodnar", "Sauciuc", "Grigore"]
+NOTES = ["", "", "", "", "Fără ceapă", "Sunați la interfon", "Etaj 2", "Tacâmuri, vă rog", "Plătesc cu bancnotă de 100"]
+
+
+def _weighted(rng: random.Random, choices: List[tuple]) -> str:
+    return rng.choices([value for value, _ in choices], [weight for _, weight in choices])[0]
+
+
+def _minute_of_day(rng: random.Random) -> int:
+    if rng.random() < LUNCH_PEAK_SHARE:
+        # Triangular: busiest around 12:45
+        return int(rng.triangular(LUNCH_PEAK_MINUTES[0], LUNCH_PEAK_MINUTES[1]))
+    return rng.randint(OPEN_MINUTES[0], OPEN_MINUTES[1] - 1)
+
+
+def _order_time(rng: random.Random, weekdays: List[date], now: datetime) -> datetime:
+    """A moment in opening hours on a random weekday, as UTC, never in the future"""
+    while True:
+        day = rng.choice(weekdays)
+        minute = _minute_of_day(rng)
+        local = datetime(day.year, day.month, day.day, minute // 60, minute % 60, rng.randint(0, 59), tzinfo=LOCAL_TZ)
+        created = local.astimezone(timezone.utc)
+        if created <= now:
+            return created
+
+
+class OrderHistory:
+    """Generates order documents shaped like routes/orders.py's _insert_order output"""
+
+    def __init__(self, menu: List[Dict[str, Any]], days: int, seed: int = 42, now: Optional[datetime] = None):
+        self.rng = random.Random(seed)
+        self.now = now or datetime.now(timezone.utc)
+        today = self.now.astimezone(LOCAL_TZ).date()
+        self.weekdays = [
+            today - timedelta(days=offset) for offset in range(days) if (today - timedelta(days=offset)).weekday() < 5
+        ] or [today]
+        self.today = today
+
+        self.by_category: Dict[str, List[Dict[str, Any]]] = {}
+        for item in menu:
+            self.by_category.setdefault(item.get("category_id", "other"), []).append(item)
+        self.menu = menu
+
+        # The gazetteer also indexes bare names ("dornelor"); keep the full ones
+        streets = geocoding_service.load_gazetteer()
+        self.streets = sorted(
+            (name, position) for name, position in streets.items()
+            if name.partition(" ")[0] in geocoding_service.STREET_TYPES
+        ) or [("strada dornelor", (47.3458, 25.3561))]
+        # Repeat customers: most orders come from a few thousand regulars
+        self.customers = [self._customer(index) for index in range(5000)]
+        self.delivery_fee = delivery_geo.get_default_delivery_fee()
+
+    def _customer(self, index: int) -> Dict[str, Any]:
+        rng = self.rng
+        name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+        street, (lat, lng) = rng.choice(self.streets)
+        number = rng.randint(1, 120)
+        customer = {
+            "name": name,
+            "phone": f"07{rng.randint(20000000, 89999999)}",
+            "address": f"{street.title()} nr. {number}, Vatra Dornei",
+            "position": (lat + rng.uniform(-0.0012, 0.0012), lng + rng.uniform(-0.0016, 0.0016))
+        }
+        if rng.random() < 0.4:
+            customer["email"] = f"client{index}@example.ro"
+        return customer
+
+    def _pick(self, category: str) -> Optional[Dict[str, Any]]:
+        items = self.by_category.get(category)
+        if not items:
+            return None
+        # Popular dishes sell about three times as often
+        return self.rng.choices(items, [3 if item.get("is_popular") else 1 for item in items])[0]
+
+    def _items(self) -> List[Dict[str, Any]]:
+        rng = self.rng
+        people = 1 if rng.random() < 0.75 else rng.randint(2, 4)
+        wanted = []
+        if rng.random() < 0.6:
+            wanted.append("ciorbe")
+        if rng.random() < 0.85:
+            wanted.append("feluri-principale")
+            if rng.random() < 0.55:
+                wanted.append("garnituri")
+        for category, share in (("salate", 0.25), ("deserturi", 0.15), ("bauturi", 0.4)):
+            if rng.random() < share:
+                wanted.append(category)
+
+        lines: Dict[str, Dict[str, Any]] = {}
+        for category in wanted or ["feluri-principale"]:
+            item = self._pick(category) or rng.choice(self.menu)
+            line = lines.setdefault(item["id"], {
+                "menu_item_id": item["id"], "name": item["name"], "price": float(item["price"]), "quantity": 0
+            })
+            line["quantity"] += people if rng.random() < 0.8 else rng.randint(1, people)
+        return list(lines.values())
+
+    def _history(self, created: datetime, final_status: str, order_type: str) -> List[Dict[str, Any]]:
+        rng = self.rng
+        flow = FLOW + (["out_for_delivery"] if order_type == "delivery" else []) + ["delivered"]
+        if final_status == "cancelled":
+            steps = flow[:rng.randint(1, 2)] + ["cancelled"]
+        else:
+            steps = flow[:flow.index(final_status) + 1]
+        history, at = [], created
+        for step in steps:
+            history.append({"status": step, "at": at.isoformat()})
+            at += timedelta(minutes=rng.uniform(2, 15))
+        return history
+
+    def order(self, index: int) -> Dict[str, Any]:
+        rng = self.rng
+        created = _order_time(rng, self.weekdays, self.now)
+        is_today = created.astimezone(LOCAL_TZ).date() == self.today
+        customer = rng.choice(self.customers)
+        order_type = "delivery" if rng.random() < DELIVERY_SHARE else "pickup"
+
+        if rng.random() < CANCELLED_SHARE:
+            status = "cancelled"
+        elif is_today:
+            status = _weighted(rng, LIVE_STATUSES)
+            if status == "out_for_delivery" and order_type == "pickup":
+                status = "ready"
+        else:
+            status = "delivered"
+
+        items = self._items()
+        history = self._history(created, status, order_type)
+        payment_method = _weighted(rng, PAYMENT_METHODS)
+        subtotal = sum(item["price"] * item["quantity"] for item in items)
+        doc = {
+            "id": f"synthetic-{index:08d}",
+            "order_number": f"ORD-{created:%Y%m%d%H%M%S}-{index:06X}",
+            "items": items,
+            "customer": {
+                "name": customer["name"],
+                "phone": customer["phone"],
+                "email": customer.get("email"),
+                "address": customer["address"] if order_type == "delivery" else None,
+                "notes": rng.choice(NOTES) or None
+            },
+            "subtotal": subtotal,
+            "total": subtotal,
+            "status": status,
+            "order_type": order_type,
+            "payment_method": payment_method,
+            "version": len(history) - 1,
+            "status_history": history,
+            "created_at": created.isoformat(),
+            "updated_at": history[-1]["at"],
+            "synthetic": True
+        }
+        if payment_method == "card_online":
+            paid = status != "cancelled" or rng.random() < 0.5
+            doc["payment_status"] = "paid" if paid else "pending"
+            doc["stripe_session_id"] = f"cs_synthetic_{index:08d}"
+        if order_type == "delivery":
+            lat, lng = customer["position"]
+            doc.update(delivery_geo.position_fields(lat, lng))
+            doc["coordinates_source"] = "gazetteer"
+            doc["coordinates_precision"] = "street"
+            # Default fee, as _insert_order charges while no delivery zones are configured
+            doc["delivery_zone"] = None
+            doc["delivery_fee"] = self.delivery_fee
+            doc["total"] = subtotal + self.delivery_fee
+        return doc
+
+    def orders(self, count: int, start: int = 0) -> Iterator[Dict[str, Any]]:
+        for index in range(start, start + count):
+            yield self.order(index)
+
+
+async def insert_orders(db, count: int, days: int = 365, seed: int = 42, batch_size: int = DEFAULT_BATCH_SIZE,
+                        start: int = 0, progress: bool = False) -> int:
+    """Generate and insert `count` orders; returns how many were written (existing ids are skipped)"""
+    menu = await db.menu_items.find({}, {"_id": 0, "id": 1, "name": 1, "price": 1, "category_id": 1, "is_popular": 1}).to_list(None)
+    if not menu:
+        raise RuntimeError("menu_items is empty; seed the menu first")
+    history = OrderHistory(menu, days, seed)
+
+    written = 0
+    started = time.perf_counter()
+    pending: Optional[asyncio.Task] = None
+
+    async def write(batch: List[Dict[str, Any]]) -> int:
+        try:
+            result = await db.orders.insert_many(batch, ordered=False)
+            return len(result.inserted_ids)
+        except BulkWriteError as e:
+            # Re-running with the same --start: duplicates are skipped, the rest still lands
+            return e.details.get("nInserted", 0)
+
+    batch: List[Dict[str, Any]] = []
+    for doc in history.orders(count, start):
+        batch.append(doc)
+        if len(batch) == batch_size:
+            if pending:
+                written += await pending
+            pending = asyncio.create_task(write(batch))
+            # Let the task start: Motor hands insert_many to its executor thread and the
+            # loop is free again; without this it would not run until the next await
+            await asyncio.sleep(0)
+            batch = []
+            if progress:
+                rate = written / max(time.perf_counter() - started, 1e-9)
+                print(f"\r{written + batch_size:>10} / {count} orders ({rate:,.0f}/s)", end="", file=sys.stderr)
+    if pending:
+        written += await pending
+    if batch:
+        written += await write(batch)
+    if progress:
+        print(f"\r{written:>10} / {count} orders in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    return written
+
+
+async def run(args):
+    client = AsyncIOMotorClient(args.mongo_url)
+    db = client[args.db]
+    try:
+        if args.purge:
+            result = await db.orders.delete_many({"synthetic": True})
+            print(f"Removed {result.deleted_count} synthetic orders", file=sys.stderr)
+            return
+        if args.seed_menu and await db.menu_items.count_documents({}) == 0:
+            import server
+            server.set_database(db)
+            await server.seed_database()
+        written = await insert_orders(
+            db, args.orders, days=args.days, seed=args.seed, batch_size=args.batch_size, start=args.start, progress=True
+        )
+        summary = await db.orders.aggregate([
+            {"$match": {"synthetic": True}},
+            {"$group": {"_id": "$status", "count": {"$sum": 1}}}
+        ]).to_list(None)
+        print(json.dumps({
+            "inserted": written,
+            "synthetic_by_status": {row["_id"]: row["count"] for row in summary}
+        }, indent=2))
+    finally:
+        client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongo-url", default=os.environ.get("MONGO_URL"), required="MONGO_URL" not in os.environ)
+    parser.add_argument("--db", required=True, help="Target database (never defaults to DB_NAME on purpose)")
+    parser.add_argument("--orders", type=int, default=1_000_000)
+    parser.add_argument("--days", type=int, default=730, help="History length; orders fall on weekdays within it")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--start", type=int, default=0, help="First order index, to append to an earlier run")
+    parser.add_argument("--seed-menu", action="store_true", help="Seed the default menu first if the database has none")
+    parser.add_argument("--purge", action="store_true", help="Remove the synthetic orders instead")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
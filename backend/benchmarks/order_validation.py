@@ -0,0 +1,120 @@
+"""
+Per-order CPU cost of order validation and document building.
+
+Compares the previous create_order path (json -> dict -> OrderItem/CustomerInfo
+-> OrderCreate -> dump -> Order -> dump) with the single-pass TypeAdapter path.
+Database and menu lookups are excluded; both sides price from the same dict.
+
+Usage (from backend/):
+    python -m benchmarks.order_validation [--iterations 2000]
+"""
+import argparse
+import json
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import List
+
+from pydantic import BaseModel, TypeAdapter
+
+from models import Order, OrderItem, CustomerInfo, OrderCreate, generate_order_number
+
+LINE_COUNTS = [1, 5, 10, 25, 50]
+PRICES = {str(i): float(5 + i) for i in range(1, 51)}
+
+
+class LegacyOrderCreate(BaseModel):
+    """Shape of OrderCreate before typed request validation"""
+    items: List[OrderItem]
+    customer: CustomerInfo
+    order_type: str = "pickup"
+    payment_method: str = "cash"
+
+
+def build_body(lines: int) -> bytes:
+    return json.dumps({
+        "items": [
+            {"menu_item_id": str(i), "name": f"Produs {i}", "price": PRICES[str(i)], "quantity": 1 + i % 3}
+            for i in range(1, lines + 1)
+        ],
+        "customer": {
+            "name": "Benchmark Client",
+            "phone": "0740000000",
+            "email": "bench@example.com",
+            "address": "Strada Dornelor nr. 10, Vatra Dornei",
+            "notes": "Interfon 12"
+        },
+        "order_type": "delivery",
+        "payment_method": "cash"
+    }).encode()
+
+
+def legacy_path(body: bytes) -> dict:
+    order_data = json.loads(body)
+    items = [
+        {**item, "price": PRICES[item["menu_item_id"]]}
+        for item in order_data.get("items", [])
+    ]
+    total = sum(item["price"] * item["quantity"] for item in items)
+    order_create = LegacyOrderCreate(
+        items=[OrderItem(**item) for item in items],
+        customer=CustomerInfo(**order_data.get("customer", {})),
+        order_type=order_data.get("order_type", "pickup"),
+        payment_method=order_data.get("payment_method", "cash")
+    )
+    order = Order(**order_create.model_dump(), total=total)
+    doc = order.model_dump()
+    doc["created_at"] = doc["created_at"].isoformat()
+    doc["updated_at"] = doc["updated_at"].isoformat()
+    return doc
+
+
+order_create_adapter = TypeAdapter(OrderCreate)
+
+
+def typed_path(body: bytes) -> dict:
+    order_create = order_create_adapter.validate_json(body)
+    items = [
+        {"menu_item_id": item.menu_item_id, "name": item.name, "price": PRICES[item.menu_item_id], "quantity": item.quantity}
+        for item in order_create.items
+    ]
+    now = datetime.now(timezone.utc)
+    return {
+        "id": str(uuid.uuid4()),
+        "order_number": generate_order_number(now),
+        "items": items,
+        "customer": order_create.customer.model_dump(),
+        "total": sum(item["price"] * item["quantity"] for item in items),
+        "status": "pending",
+        "order_type": order_create.order_type,
+        "payment_method": order_create.payment_method,
+        "created_at": now.isoformat(),
+        "updated_at": now.isoformat()
+    }
+
+
+def cpu_time_per_call(fn, body: bytes, iterations: int) -> float:
+    """Microseconds of process CPU time per call"""
+    fn(body)  # warm up
+    start = time.process_time()
+    for _ in range(iterations):
+        fn(body)
+    return (time.process_time() - start) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"{'lines':>5} {'legacy µs':>10} {'typed µs':>10} {'speedup':>8}")
+    for lines in LINE_COUNTS:
+        body = build_body(lines)
+        assert legacy_path(body)["total"] == typed_path(body)["total"]
+        legacy = cpu_time_per_call(legacy_path, body, args.iterations)
+        typed = cpu_time_per_call(typed_path, body, args.iterations)
+        print(f"{lines:>5} {legacy:>10.1f} {typed:>10.1f} {legacy / typed:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""
+Process patches for benchmark runs
+The provider fakes (testing/providers.py) and stand-ins (provider_servers.py)
+install themselves through a monkeypatch-like object. Benchmarks run without
+pytest, so this is the same setattr/setitem/setenv surface with plain
+save-and-restore, undone in reverse order when patched() exits.
+"""
+import os
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, List, MutableMapping
+
+_MISSING = object()
+
+
+class Patches:
+    def __init__(self):
+        self._undo: List[Callable[[], None]] = []
+
+    def setattr(self, target: Any, name: str, value: Any):
+        old = getattr(target, name)
+        self._undo.append(lambda: setattr(target, name, old))
+        setattr(target, name, value)
+
+    def setitem(self, mapping: MutableMapping, key: Any, value: Any):
+        old = mapping.get(key, _MISSING)
+        if old is _MISSING:
+            self._undo.append(lambda: mapping.pop(key, None))
+        else:
+            self._undo.append(lambda: mapping.__setitem__(key, old))
+        mapping[key] = value
+
+    def setenv(self, name: str, value: Any):
+        self.setitem(os.environ, name, str(value))
+
+    def undo(self):
+        while self._undo:
+            self._undo.pop()()
+
+
+@contextmanager
+def patched() -> Iterator[Patches]:
+    patches = Patches()
+    try:
+        yield patches
+    finally:
+        patches.undo()
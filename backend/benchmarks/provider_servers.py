@@ -0,0 +1,441 @@
+"""
+Local stand-in servers for Zoho CRM, Stripe and Resend
+Unlike the fakes in testing/providers.py these speak HTTP, so the real clients
+(httpx for Zoho, the stripe and resend SDKs) run their whole request path:
+connection setup, serialization, timeouts, retries. Each server can be
+made slow or flaky per provider:
+- latency: "fixed:MS", "uniform:MIN:MAX" or "lognormal:P50:P99" (ms)
+- error_rate: share of requests answered with error_status (default 503)
+- rate_limit: requests per second before answering 429 with Retry-After
+The profile can be changed while running with PUT /_control (same JSON
+fields); GET /_control returns it with per-route counters.
+
+Point the app at them with ZOHO_ACCOUNTS_URL, ZOHO_API_URL, STRIPE_API_BASE
+and RESEND_API_URL (printed on start), or in process with
+StandInServers(...).install(monkeypatch).
+
+Usage (from backend/):
+    python -m benchmarks.provider_servers [--latency lognormal:40:400] [--error-rate 0.02] [--rate-limit 10]
+    python -m benchmarks.provider_servers --zoho-latency fixed:2000 --stripe-error-rate 0.1
+"""
+import math
+import time
+import uuid
+import random
+import socket
+import asyncio
+import argparse
+import threading
+from collections import defaultdict
+from urllib.parse import parse_qsl
+from dataclasses import dataclass, asdict, fields
+from typing import Dict, Any, Optional, Callable
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+
+PROVIDERS = ("zoho", "stripe", "resend")
+Z_99 = 2.3263  # standard normal 99th percentile
+
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """Latency spec -> sampler returning seconds"""
+    kind, *values = spec.split(":")
+    try:
+        numbers = [float(value) / 1000 for value in values]
+    except ValueError:
+        raise ValueError(f"Invalid latency: {spec}")
+    if kind == "fixed" and len(numbers) == 1:
+        return lambda rng: numbers[0]
+    if kind == "uniform" and len(numbers) == 2:
+        return lambda rng: rng.uniform(*numbers)
+    if kind == "lognormal" and len(numbers) == 2 and 0 < numbers[0] <= numbers[1]:
+        mu = math.log(numbers[0])
+        sigma = (math.log(numbers[1]) - mu) / Z_99
+        return lambda rng: rng.lognormvariate(mu, sigma)
+    raise ValueError(f"Invalid latency: {spec} (fixed:MS, uniform:MIN:MAX or lognormal:P50:P99)")
+
+
+@dataclass
+class FaultProfile:
+    latency: str = "fixed:0"
+    error_rate: float = 0.0
+    error_status: int = 503
+    rate_limit: float = 0.0  # requests per second, 0 = unlimited
+
+    def update(self, changes: Dict[str, Any]):
+        known = {field.name for field in fields(self)}
+        for name, value in changes.items():
+            if name not in known:
+                raise ValueError(f"Unknown field: {name}")
+            if name == "latency":
+                parse_latency(value)
+            setattr(self, name, type(getattr(self, name))(value))
+
+
+class _Faults:
+    """Applies a FaultProfile to every request of one stand-in app"""
+
+    def __init__(self, profile: FaultProfile, seed: Optional[int] = None):
+        self.profile = profile
+        self.rng = random.Random(seed)
+        self.counters: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self._sampler_spec = None
+        self._sampler = None
+        # Token bucket holding up to one second of requests, full at start
+        self._tokens: Optional[float] = None
+        self._refilled = time.monotonic()
+
+    def _allow(self) -> bool:
+        rate = self.profile.rate_limit
+        if rate <= 0:
+            return True
+        now = time.monotonic()
+        tokens = rate if self._tokens is None else self._tokens + (now - self._refilled) * rate
+        self._tokens = min(rate, tokens)
+        self._refilled = now
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+    def delay(self) -> float:
+        if self.profile.latency != self._sampler_spec:
+            self._sampler = parse_latency(self.profile.latency)
+            self._sampler_spec = self.profile.latency
+        return self._sampler(self.rng)
+
+    async def apply(self, route: str) -> Optional[str]:
+        """None to serve the request, else the fault to answer with ("rate_limited" or "error")"""
+        counters = self.counters[route]
+        counters["requests"] += 1
+        if not self._allow():
+            counters["rate_limited"] += 1
+            return "rate_limited"
+        delay = self.delay()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if self.rng.random() < self.profile.error_rate:
+            counters["errors"] += 1
+            return "error"
+        return None
+
+
+def _stand_in_app(name: str, profile: FaultProfile, fault_response: Callable[[str, int], Response],
+                  seed: Optional[int]) -> FastAPI:
+    app = FastAPI(title=f"{name} stand-in", openapi_url=None, docs_url=None, redoc_url=None)
+    faults = _Faults(profile, seed)
+    app.state.faults = faults
+
+    @app.middleware("http")
+    async def inject_faults(request: Request, call_next):
+        if request.url.path == "/_control":
+            return await call_next(request)
+        fault = await faults.apply(f"{request.method} {request.url.path}")
+        if fault == "rate_limited":
+            response = fault_response(fault, 429)
+            response.headers["Retry-After"] = "1"
+            return response
+        if fault == "error":
+            return fault_response(fault, profile.error_status)
+        return await call_next(request)
+
+    @app.get("/_control")
+    async def get_control():
+        return {"profile": asdict(profile), "counters": faults.counters}
+
+    @app.put("/_control")
+    async def put_control(request: Request):
+        try:
+            profile.update(await request.json())
+        except (ValueError, TypeError) as e:
+            return JSONResponse({"detail": str(e)}, status_code=400)
+        return {"profile": asdict(profile)}
+
+    return app
+
+
+# ============== ZOHO CRM ==============
+
+def zoho_app(profile: Optional[FaultProfile] = None, seed: Optional[int] = None) -> FastAPI:
+    """OAuth token refresh plus the Contacts and Deals calls services/zoho_service.py makes"""
+    profile = profile or FaultProfile()
+
+    def fault_response(fault: str, status: int) -> Response:
+        code = "TOO_MANY_REQUESTS" if fault == "rate_limited" else "INTERNAL_ERROR"
+        return JSONResponse({"code": code, "message": "stand-in fault", "status": "error"}, status_code=status)
+
+    app = _stand_in_app("zoho", profile, fault_response, seed)
+    contacts: Dict[str, Dict[str, Any]] = {}
+    deals: Dict[str, Dict[str, Any]] = {}
+    app.state.contacts = contacts
+    app.state.deals = deals
+
+    def success(record_id: str) -> Dict[str, Any]:
+        return {"data": [{"code": "SUCCESS", "details": {"id": record_id}, "message": "record added", "status": "success"}]}
+
+    @app.post("/oauth/v2/token")
+    async def token():
+        return {"access_token": f"1000.{uuid.uuid4().hex}", "api_domain": "https://www.zohoapis.eu",
+                "token_type": "Bearer", "expires_in": 3600}
+
+    @app.get("/crm/v6/Contacts/search")
+    async def search_contacts(phone: str = ""):
+        matches = [{"id": contact_id, **contact} for contact_id, contact in contacts.items() if contact.get("Phone") == phone]
+        # Zoho answers an empty search with 204 and no body
+        return {"data": matches, "info": {"count": len(matches)}} if matches else Response(status_code=204)
+
+    @app.post("/crm/v6/Contacts", status_code=201)
+    async def create_contact(request: Request):
+        contact_id = str(random.randint(10 ** 17, 10 ** 18))
+        contacts[contact_id] = (await request.json())["data"][0]
+        return success(contact_id)
+
+    @app.put("/crm/v6/Contacts/{contact_id}")
+    async def update_contact(contact_id: str, request: Request):
+        contacts.setdefault(contact_id, {}).update((await request.json())["data"][0])
+        return success(contact_id)
+
+    @app.post("/crm/v6/Deals", status_code=201)
+    async def create_deal(request: Request):
+        deal_id = str(random.randint(10 ** 17, 10 ** 18))
+        deals[deal_id] = (await request.json())["data"][0]
+        return success(deal_id)
+
+    @app.put("/crm/v6/Deals/{deal_id}")
+    async def update_deal(deal_id: str, request: Request):
+        deals.setdefault(deal_id, {}).update((await request.json())["data"][0])
+        return success(deal_id)
+
+    return app
+
+
+# ============== STRIPE ==============
+
+def stripe_app(profile: Optional[FaultProfile] = None, seed: Optional[int] = None) -> FastAPI:
+    """Checkout sessions: create and retrieve (form-encoded like the real API)"""
+    profile = profile or FaultProfile()
+
+    def fault_response(fault: str, status: int) -> Response:
+        kind = "rate_limit_error" if fault == "rate_limited" else "api_error"
+        return JSONResponse({"error": {"type": kind, "message": "stand-in fault"}}, status_code=status)
+
+    app = _stand_in_app("stripe", profile, fault_response, seed)
+    sessions: Dict[str, Dict[str, Any]] = {}
+    app.state.sessions = sessions
+
+    @app.post("/v1/checkout/sessions")
+    async def create_session(request: Request):
+        form = dict(parse_qsl((await request.body()).decode()))
+        amount = int(form.get("line_items[0][price_data][unit_amount]", 0)) * int(form.get("line_items[0][quantity]", 1))
+        session_id = f"cs_test_{uuid.uuid4().hex}"
+        sessions[session_id] = {
+            "id": session_id,
+            "object": "checkout.session",
+            "url": f"https://checkout.stripe.test/pay/{session_id}",
+            "status": "open",
+            "payment_status": "unpaid",
+            "amount_total": amount,
+            "currency": form.get("line_items[0][price_data][currency]", form.get("currency", "ron")),
+            "success_url": form.get("success_url"),
+            "cancel_url": form.get("cancel_url"),
+            "metadata": {key[len("metadata["):-1]: value for key, value in form.items() if key.startswith("metadata[")},
+            "created": int(time.time())
+        }
+        return sessions[session_id]
+
+    @app.get("/v1/checkout/sessions/{session_id}")
+    async def retrieve_session(session_id: str):
+        session = sessions.get(session_id)
+        if session is None:
+            return JSONResponse({"error": {"type": "invalid_request_error", "code": "resource_missing",
+                                           "message": f"No such checkout.session: '{session_id}'"}}, status_code=404)
+        return session
+
+    return app
+
+
+# ============== RESEND ==============
+
+def resend_app(profile: Optional[FaultProfile] = None, seed: Optional[int] = None) -> FastAPI:
+    """POST /emails, keeping what was sent"""
+    profile = profile or FaultProfile()
+
+    def fault_response(fault: str, status: int) -> Response:
+        name = "rate_limit_exceeded" if fault == "rate_limited" else "application_error"
+        return JSONResponse({"statusCode": status, "name": name, "message": "stand-in fault"}, status_code=status)
+
+    app = _stand_in_app("resend", profile, fault_response, seed)
+    app.state.sent = []
+
+    @app.post("/emails")
+    async def send_email(request: Request):
+        email_id = str(uuid.uuid4())
+        app.state.sent.append({"id": email_id, **(await request.json())})
+        return {"id": email_id}
+
+    return app
+
+
+APPS = {"zoho": zoho_app, "stripe": stripe_app, "resend": resend_app}
+
+
+# ============== SERVING ==============
+
+def _listen(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(128)
+    return sock
+
+
+def provider_env(urls: Dict[str, str]) -> Dict[str, str]:
+    """Environment variables that point the app at the given stand-in base URLs"""
+    env = {}
+    if "zoho" in urls:
+        env["ZOHO_ACCOUNTS_URL"] = urls["zoho"]
+        env["ZOHO_API_URL"] = f"{urls['zoho']}/crm/v6"
+    if "stripe" in urls:
+        env["STRIPE_API_BASE"] = urls["stripe"]
+    if "resend" in urls:
+        env["RESEND_API_URL"] = urls["resend"]
+    return env
+
+
+class StandInServers:
+    """The three stand-ins on free localhost ports, served from a background thread
+
+    Run in their own event loop so injected latency and load on the stand-ins
+    never stalls the loop of the app being measured.
+    """
+
+    def __init__(self, profiles: Optional[Dict[str, FaultProfile]] = None, host: str = "127.0.0.1",
+                 seed: Optional[int] = None, ports: Optional[Dict[str, int]] = None):
+        profiles = profiles or {}
+        self.host = host
+        self.ports = ports or {}
+        self.apps = {name: APPS[name](profiles.get(name) or FaultProfile(), seed) for name in PROVIDERS}
+        self.urls: Dict[str, str] = {}
+        self._servers = []
+        self._thread: Optional[threading.Thread] = None
+
+    def profile(self, name: str) -> FaultProfile:
+        """The live profile of one stand-in; changes apply to the next request"""
+        return self.apps[name].state.faults.profile
+
+    def start(self) -> "StandInServers":
+        import uvicorn
+
+        for name, app in self.apps.items():
+            sock = _listen(self.host, self.ports.get(name, 0))
+            self.urls[name] = f"http://{self.host}:{sock.getsockname()[1]}"
+            self._servers.append((uvicorn.Server(uvicorn.Config(app, log_level="warning", access_log=False)), sock))
+
+        started = threading.Event()
+
+        async def serve():
+            tasks = [asyncio.create_task(server.serve(sockets=[sock])) for server, sock in self._servers]
+            while not all(server.started for server, _ in self._servers):
+                await asyncio.sleep(0.01)
+            started.set()
+            await asyncio.gather(*tasks)
+
+        def run():
+            asyncio.run(serve())
+
+        self._thread = threading.Thread(target=run, name="provider-stand-ins", daemon=True)
+        self._thread.start()
+        if not started.wait(timeout=10):
+            raise RuntimeError("Provider stand-ins did not start")
+        return self
+
+    def stop(self):
+        for server, _ in self._servers:
+            server.should_exit = True
+        if self._thread:
+            self._thread.join(timeout=10)
+        for _, sock in self._servers:
+            sock.close()
+        self._servers.clear()
+
+    def __enter__(self) -> "StandInServers":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def install(self, monkeypatch):
+        """Point zoho_service, email_service and the Stripe client at the stand-ins"""
+        from services import zoho_service, email_service
+
+        for name, value in provider_env(self.urls).items():
+            monkeypatch.setenv(name, value)
+        monkeypatch.setattr(zoho_service, "ZOHO_ACCOUNTS_URL", self.urls["zoho"])
+        monkeypatch.setattr(zoho_service, "ZOHO_API_URL", f"{self.urls['zoho']}/crm/v6")
+        monkeypatch.setattr(email_service.resend, "api_url", self.urls["resend"])
+        monkeypatch.setattr(email_service.resend, "api_key", "re_test")
+        monkeypatch.setattr(email_service, "RESEND_API_KEY", "re_test")
+        monkeypatch.setenv("STRIPE_SECRET_KEY", "sk_test_stand_in")
+        monkeypatch.setenv("STRIPE_API_KEY", "sk_test_stand_in")
+        return self
+
+
+async def seed_zoho_tokens(db):
+    """A fresh token pair so zoho_service syncs instead of skipping (no OAuth setup)"""
+    from datetime import datetime, timezone
+
+    await db.zoho_tokens.update_one(
+        {"_id": "zoho_tokens"},
+        {"$set": {
+            "access_token": "1000.stand-in", "refresh_token": "1000.stand-in-refresh", "expires_in": 3600,
+            "created_at": datetime.now(timezone.utc), "updated_at": datetime.now(timezone.utc)
+        }},
+        upsert=True
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--zoho-port", type=int, default=9101)
+    parser.add_argument("--stripe-port", type=int, default=9102)
+    parser.add_argument("--resend-port", type=int, default=9103)
+    parser.add_argument("--seed", type=int)
+    defaults = FaultProfile()
+    for scope in (None, *PROVIDERS):
+        prefix = f"--{scope}-" if scope else "--"
+        label = f" for {scope}" if scope else " for every provider"
+        parser.add_argument(f"{prefix}latency", default=None if scope else defaults.latency,
+                            help=f"fixed:MS, uniform:MIN:MAX or lognormal:P50:P99{label}")
+        parser.add_argument(f"{prefix}error-rate", type=float, default=None if scope else defaults.error_rate,
+                            help=f"Share of requests failing{label}")
+        parser.add_argument(f"{prefix}error-status", type=int, default=None if scope else defaults.error_status)
+        parser.add_argument(f"{prefix}rate-limit", type=float, default=None if scope else defaults.rate_limit,
+                            help=f"Requests per second before 429{label} (0 = unlimited)")
+    args = vars(parser.parse_args())
+
+    profiles = {}
+    for name in PROVIDERS:
+        values = {}
+        for field in ("latency", "error_rate", "error_status", "rate_limit"):
+            override = args[f"{name}_{field}"]
+            values[field] = args[field] if override is None else override
+        try:
+            parse_latency(values["latency"])
+        except ValueError as e:
+            parser.error(str(e))
+        profiles[name] = FaultProfile(**values)
+
+    ports = {name: args[f"{name}_port"] for name in PROVIDERS}
+    with StandInServers(profiles, args["host"], args["seed"], ports) as stand_ins:
+        for name, value in provider_env(stand_ins.urls).items():
+            print(f"{name}={value}", flush=True)
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
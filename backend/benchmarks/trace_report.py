@@ -0,0 +1,106 @@
+"""
+Latency report from exported traces (TRACE_EXPORT_PATH files, OTLP/JSON lines).
+
+Prints p50/p95/p99 per span name, then the critical path of the slowest
+traces: from the root, repeatedly follow the child that finished last, so
+each line is what the request (or its background work) was waiting on.
+
+Usage (from backend/):
+    python -m benchmarks.trace_report traces.jsonl [--root "POST /api/orders/"] [--order P-0042] [--slowest 5]
+"""
+import argparse
+import json
+from collections import defaultdict
+from typing import Dict, List, Any
+
+
+def load_spans(paths: List[str]) -> List[Dict[str, Any]]:
+    spans = []
+    for path in paths:
+        with open(path, encoding="utf-8") as handle:
+            for line in handle:
+                if not line.strip():
+                    continue
+                for resource in json.loads(line).get("resourceSpans", []):
+                    for scope in resource.get("scopeSpans", []):
+                        for span in scope.get("spans", []):
+                            span["start"] = int(span["startTimeUnixNano"])
+                            span["end"] = int(span["endTimeUnixNano"])
+                            span["attrs"] = {
+                                item["key"]: next(iter(item["value"].values())) for item in span.get("attributes", [])
+                            }
+                            spans.append(span)
+    return spans
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def latency_table(spans: List[Dict[str, Any]]):
+    durations = defaultdict(list)
+    for span in spans:
+        durations[span["name"]].append((span["end"] - span["start"]) / 1e6)
+    print(f"{'span':<48} {'count':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for name, values in sorted(durations.items(), key=lambda item: -percentile(item[1], 0.99)):
+        print(
+            f"{name[:48]:<48} {len(values):>6} {percentile(values, 0.5):>8.1f} "
+            f"{percentile(values, 0.95):>8.1f} {percentile(values, 0.99):>8.1f} {max(values):>8.1f}"
+        )
+
+
+def critical_path(root: Dict[str, Any], children: Dict[str, List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    path = [root]
+    current = root
+    while children.get(current["spanId"]):
+        # Background work can outlive the request, so consider every child
+        current = max(children[current["spanId"]], key=lambda span: span["end"])
+        path.append(current)
+    return path
+
+
+def trace_end(span: Dict[str, Any], children: Dict[str, List[Dict[str, Any]]]) -> int:
+    return max([span["end"]] + [trace_end(child, children) for child in children.get(span["spanId"], [])])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--root", help="Only traces whose root span has this name")
+    parser.add_argument("--order", help="Only the trace of this order number")
+    parser.add_argument("--slowest", type=int, default=5)
+    args = parser.parse_args()
+
+    spans = load_spans(args.files)
+    latency_table(spans)
+
+    ids = {span["spanId"] for span in spans}
+    children = defaultdict(list)
+    roots = []
+    for span in spans:
+        # A parent from an upstream service is not in our files: treat the span as the root
+        if span.get("parentSpanId") in ids:
+            children[span["parentSpanId"]].append(span)
+        else:
+            roots.append(span)
+    if args.root:
+        roots = [span for span in roots if span["name"] == args.root]
+    if args.order:
+        roots = [span for span in roots if span["attrs"].get("order.number") == args.order]
+
+    # Slowest by end-to-end time, including the background work they started
+    roots.sort(key=lambda span: trace_end(span, children) - span["start"], reverse=True)
+    for root in roots[:args.slowest]:
+        total = (trace_end(root, children) - root["start"]) / 1e6
+        print(f"\ntrace {root['traceId']} {root['name']} {total:.1f} ms end to end"
+              f"{' order ' + str(root['attrs']['order.number']) if 'order.number' in root['attrs'] else ''}")
+        for depth, span in enumerate(critical_path(root, children)):
+            offset = (span["start"] - root["start"]) / 1e6
+            duration = (span["end"] - span["start"]) / 1e6
+            failed = " FAILED" if span.get("status", {}).get("code") == 2 else ""
+            print(f"  {'  ' * depth}{span['name']} +{offset:.1f} ms, {duration:.1f} ms{failed}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, ConfigDict
-from typing import List, Optional
+from typing import List, Optional, Literal
 from datetime import datetime, timezone
 import uuid
 
@@ -62,6 +62,11 @@ class MenuItemUpdate(BaseModel):
 
 # ============== ORDER MODELS ==============
 
+def generate_order_number(now: Optional[datetime] = None) -> str:
+    now = now or datetime.now(timezone.utc)
+    return f"ORD-{now.strftime('%Y%m%d%H%M%S')}-{str(uuid.uuid4())[:4].upper()}"
+
+
 class OrderItem(BaseModel):
     menu_item_id: Optional[str] = None
     name: str
@@ -81,7 +86,7 @@ class Order(BaseModel):
     model_config = ConfigDict(extra="ignore")
     
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    order_number: str = Field(default_factory=lambda: f"ORD-{datetime.now(timezone.utc).strftime('%Y%m%d%H%M%S')}-{str(uuid.uuid4())[:4].upper()}")
+    order_number: str = Field(default_factory=generate_order_number)
     items: List[OrderItem]
     customer: CustomerInfo
     total: float
@@ -92,11 +97,19 @@ class Order(BaseModel):
     updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 
+class OrderItemCreate(BaseModel):
+    """Order line as sent by the client; name and price are resolved from the menu"""
+    menu_item_id: str
+    quantity: int = Field(ge=1)
+    name: Optional[str] = None
+    price: Optional[float] = None
+
+
 class OrderCreate(BaseModel):
-    items: List[OrderItem]
+    items: List[OrderItemCreate] = Field(min_length=1)
     customer: CustomerInfo
-    order_type: str = "pickup"
-    payment_method: str = "cash"
+    order_type: Literal["pickup", "delivery"] = "pickup"
+    payment_method: Literal["cash", "card"] = "cash"
 
 
 class OrderStatusUpdate(BaseModel):
@@ -2,11 +2,14 @@
 Admin routes for Panaghia - Dashboard, Statistics, Delivery Management
 """
 from datetime import datetime, timedelta, timezone
-from typing import Optional, List
+from typing import Optional, List, Tuple
 from fastapi import APIRouter, HTTPException, Depends, Query
-from pydantic import BaseModel
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from pymongo.errors import OperationFailure
 
 from routes.auth import get_current_admin
+from services import menu_index, order_workflow, order_analytics, kitchen_service, geocoding_service, delivery_geo, order_export, order_archive
 
 router = APIRouter(prefix="/admin", tags=["Admin"])
 
@@ -44,6 +47,14 @@ class DeliveryOrder(BaseModel):
     coordinates: Optional[dict] = None
 
 
+class DeliveryZoneInput(BaseModel):
+    name: str
+    polygon: List[Tuple[float, float]] = Field(min_length=3)  # [[lat, lng], ...]
+    fee: float = Field(ge=0)
+    min_order: float = Field(default=0, ge=0)
+    is_active: bool = True
+
+
 # ============== DASHBOARD & STATS ==============
 
 @router.get("/dashboard", response_model=DashboardStats)
@@ -52,15 +63,18 @@ async def get_dashboard_stats(current_user: dict = Depends(get_current_admin)):
     now = datetime.now(timezone.utc)
     today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
     
+    # Archived orders only contribute through their monthly rollups
+    archived = await order_archive.get_archive_totals()
+    
     # Total orders
-    total_orders = await db.orders.count_documents({})
+    total_orders = await db.orders.count_documents({}) + archived["orders"]
     
     # Total revenue
     pipeline = [
         {"$group": {"_id": None, "total": {"$sum": "$total"}}}
     ]
     revenue_result = await db.orders.aggregate(pipeline).to_list(1)
-    total_revenue = revenue_result[0]["total"] if revenue_result else 0
+    total_revenue = (revenue_result[0]["total"] if revenue_result else 0) + archived["revenue"]
     
     # Orders today
     orders_today = await db.orders.count_documents({
@@ -78,21 +92,24 @@ async def get_dashboard_stats(current_user: dict = Depends(get_current_admin)):
     # Pending orders
     pending_orders = await db.orders.count_documents({"status": {"$in": ["pending", "confirmed", "preparing"]}})
     
-    # Popular items (top 5)
+    # Popular items (top 5, merged with archived counts per dish)
     popular_pipeline = [
         {"$unwind": "$items"},
-        {"$group": {"_id": "$items.name", "count": {"$sum": "$items.quantity"}}},
-        {"$sort": {"count": -1}},
-        {"$limit": 5}
+        {"$group": {"_id": "$items.name", "count": {"$sum": "$items.quantity"}}}
     ]
-    popular_items = await db.orders.aggregate(popular_pipeline).to_list(5)
+    item_counts = dict(archived["items"])
+    async for item in db.orders.aggregate(popular_pipeline):
+        item_counts[item["_id"]] = item_counts.get(item["_id"], 0) + item["count"]
+    popular_items = sorted(item_counts.items(), key=lambda entry: entry[1], reverse=True)[:5]
     
     # Orders by status
     status_pipeline = [
         {"$group": {"_id": "$status", "count": {"$sum": 1}}}
     ]
     status_result = await db.orders.aggregate(status_pipeline).to_list(10)
-    orders_by_status = {item["_id"]: item["count"] for item in status_result}
+    orders_by_status = dict(archived["by_status"])
+    for item in status_result:
+        orders_by_status[item["_id"]] = orders_by_status.get(item["_id"], 0) + item["count"]
     
     # Revenue by day (last 7 days)
     seven_days_ago = (now - timedelta(days=7)).isoformat()
@@ -110,23 +127,18 @@ async def get_dashboard_stats(current_user: dict = Depends(get_current_admin)):
         orders_today=orders_today,
         revenue_today=revenue_today,
         pending_orders=pending_orders,
-        popular_items=[{"name": p["_id"], "count": p["count"]} for p in popular_items],
+        popular_items=[{"name": name, "count": count} for name, count in popular_items],
         orders_by_status=orders_by_status,
         revenue_by_day=[{"date": d["_id"], "revenue": d["revenue"], "orders": d["orders"]} for d in daily_result]
     )
 
 
-@router.get("/orders")
-async def get_admin_orders(
-    status: Optional[str] = None,
-    date_from: Optional[str] = None,
-    date_to: Optional[str] = None,
-    order_type: Optional[str] = None,
-    limit: int = Query(default=50, le=200),
-    skip: int = 0,
-    current_user: dict = Depends(get_current_admin)
-):
-    """Get all orders with filters"""
+def _build_order_query(
+    status: Optional[str],
+    order_type: Optional[str],
+    date_from: Optional[str],
+    date_to: Optional[str]
+) -> dict:
     query = {}
     
     if status:
@@ -140,6 +152,21 @@ async def get_admin_orders(
             query["created_at"]["$lte"] = date_to
         else:
             query["created_at"] = {"$lte": date_to}
+    return query
+
+
+@router.get("/orders")
+async def get_admin_orders(
+    status: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    order_type: Optional[str] = None,
+    limit: int = Query(default=50, le=200),
+    skip: int = 0,
+    current_user: dict = Depends(get_current_admin)
+):
+    """Get all orders with filters"""
+    query = _build_order_query(status, order_type, date_from, date_to)
     
     orders = await db.orders.find(query, {"_id": 0}).sort("created_at", -1).skip(skip).limit(limit).to_list(limit)
     total = await db.orders.count_documents(query)
@@ -147,55 +174,99 @@ async def get_admin_orders(
     return {"orders": orders, "total": total, "limit": limit, "skip": skip}
 
 
+@router.get("/orders/export")
+async def export_orders(
+    format: str = Query(default="csv", pattern="^(csv|ndjson)$"),
+    status: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    order_type: Optional[str] = None,
+    current_user: dict = Depends(get_current_admin)
+):
+    """Stream all matching orders as CSV or NDJSON (for accounting)"""
+    query = _build_order_query(status, order_type, date_from, date_to)
+    filename = f"comenzi-{datetime.now(timezone.utc).strftime('%Y%m%d-%H%M')}.{format}"
+    
+    return StreamingResponse(
+        order_export.stream(format, query),
+        media_type=order_export.EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
 @router.patch("/orders/{order_id}/status")
 async def update_order_status_admin(
     order_id: str,
     status_data: dict,
     current_user: dict = Depends(get_current_admin)
 ):
-    """Update order status (admin only)"""
-    valid_statuses = ['pending', 'confirmed', 'preparing', 'ready', 'out_for_delivery', 'delivered', 'cancelled']
+    """Update order status (admin only, optionally guarded by the order's version)"""
     new_status = status_data.get('status')
     
-    if new_status not in valid_statuses:
-        raise HTTPException(status_code=400, detail=f"Status invalid. Opțiuni: {', '.join(valid_statuses)}")
-    
-    result = await db.orders.find_one_and_update(
-        {"id": order_id},
-        {
-            "$set": {
-                "status": new_status,
-                "updated_at": datetime.now(timezone.utc).isoformat(),
-                "updated_by": current_user["email"]
-            }
-        },
-        return_document=True
-    )
-    
-    if not result:
+    try:
+        return await order_workflow.transition_order(
+            order_id,
+            new_status,
+            status_data.get('version'),
+            extra_set={"updated_by": current_user["email"]}
+        )
+    except order_workflow.UnknownStatus:
+        raise HTTPException(status_code=400, detail=f"Status invalid. Opțiuni: {', '.join(order_workflow.ORDER_STATUSES)}")
+    except order_workflow.OrderNotFound:
         raise HTTPException(status_code=404, detail="Comandă negăsită")
-    
-    result.pop("_id", None)
-    return result
+    except order_workflow.InvalidTransition as e:
+        raise HTTPException(status_code=409, detail=f"Comanda nu poate trece din {e.current} în {e.target}")
+    except order_workflow.VersionConflict:
+        raise HTTPException(status_code=409, detail="Comanda a fost modificată între timp. Reîncărcați și încercați din nou.")
 
 
-# ============== DELIVERY MANAGEMENT ==============
+# ============== ANALYTICS ==============
 
-@router.get("/delivery/orders")
-async def get_delivery_orders(
-    status: Optional[str] = Query(default=None),
+@router.get("/analytics/timings")
+async def get_order_timings(
+    days: int = Query(default=7, ge=1, le=366),
     current_user: dict = Depends(get_current_admin)
 ):
-    """Get delivery orders for map view"""
-    query = {"order_type": "delivery"}
-    
-    if status:
-        query["status"] = status
-    else:
-        # Default: show active deliveries
-        query["status"] = {"$in": ["confirmed", "preparing", "ready", "out_for_delivery"]}
-    
-    orders = await db.orders.find(query, {"_id": 0}).sort("created_at", -1).to_list(100)
+    """Prep (confirmed → ready) and delivery (out_for_delivery → delivered) percentiles per hour and order size"""
+    return await order_analytics.get_timing_report(days)
+
+
+# ============== KITCHEN ==============
+
+@router.get("/kitchen/prep-list")
+async def get_kitchen_prep_list(current_user: dict = Depends(get_current_admin)):
+    """Portions to prepare per dish across confirmed/preparing orders"""
+    items = await kitchen_service.get_prep_list()
+    return {"items": items, "total_portions": sum(item["quantity"] for item in items)}
+
+
+@router.get("/kitchen/prep-list/stream")
+async def stream_kitchen_prep_list(current_user: dict = Depends(get_current_admin)):
+    """Server-sent events for the kitchen display: snapshot, then live deltas"""
+    queue = kitchen_service.subscribe()
+    return StreamingResponse(
+        kitchen_service.event_stream(queue),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.post("/kitchen/prep-list/rebuild")
+async def rebuild_kitchen_prep_list(current_user: dict = Depends(get_current_admin)):
+    """Recompute the prep list from active orders (recovery after manual DB edits)"""
+    items = await kitchen_service.rebuild()
+    return {"items": items, "total_portions": sum(item["quantity"] for item in items)}
+
+
+# ============== DELIVERY MANAGEMENT ==============
+
+ACTIVE_DELIVERY_STATUSES = ["confirmed", "preparing", "ready", "out_for_delivery"]
+
+
+async def _find_delivery_orders(statuses: List[str], limit: int = 100) -> List[dict]:
+    """Delivery orders in the given statuses, formatted for the map"""
+    query = {"order_type": "delivery", "status": {"$in": statuses}}
+    orders = await db.orders.find(query, {"_id": 0}).sort("created_at", -1).to_list(limit)
     
     # Format for map display
     delivery_orders = []
@@ -211,19 +282,58 @@ async def get_delivery_orders(
             "status": order["status"],
             "created_at": order["created_at"],
             "items": order["items"],
-            "coordinates": order.get("coordinates")  # Will be set when geocoded
+            "status_history": order.get("status_history", []),
+            "coordinates": order.get("coordinates")  # Geocoded at order creation or confirmed on the map
         })
-    
+    return delivery_orders
+
+
+@router.get("/delivery/orders")
+async def get_delivery_orders(
+    status: Optional[str] = Query(default=None),
+    current_user: dict = Depends(get_current_admin)
+):
+    """Get delivery orders for map view"""
+    # Default: show active deliveries
+    delivery_orders = await _find_delivery_orders([status] if status else ACTIVE_DELIVERY_STATUSES)
     return {"deliveries": delivery_orders, "total": len(delivery_orders)}
 
 
+@router.get("/delivery/route")
+async def get_delivery_route(
+    status: Optional[str] = Query(default=None),
+    return_to_restaurant: bool = True,
+    current_user: dict = Depends(get_current_admin)
+):
+    """Suggested visiting order for active deliveries (nearest neighbour + 2-opt)"""
+    from services.delivery_routing import plan_route
+    
+    delivery_orders = await _find_delivery_orders([status] if status else ACTIVE_DELIVERY_STATUSES)
+    return plan_route(delivery_orders, return_to_restaurant)
+
+
+@router.get("/delivery/batches")
+async def get_delivery_batches(
+    drivers: int = Query(default=1, ge=1, le=20),
+    capacity: int = Query(default=4, ge=1, le=20),
+    window_minutes: int = Query(default=15, ge=1, le=120),
+    current_user: dict = Depends(get_current_admin)
+):
+    """Group preparing/ready deliveries into routed driver runs"""
+    from services.delivery_routing import plan_batches
+    
+    delivery_orders = await _find_delivery_orders(["preparing", "ready"])
+    result = plan_batches(delivery_orders, drivers, capacity, window_minutes)
+    return {**result, "drivers": drivers, "capacity": capacity, "window_minutes": window_minutes}
+
+
 @router.patch("/delivery/orders/{order_id}/coordinates")
 async def update_delivery_coordinates(
     order_id: str,
     coordinates: dict,
     current_user: dict = Depends(get_current_admin)
 ):
-    """Update delivery coordinates (from geocoding)"""
+    """Update delivery coordinates (confirmed on the map; cached for repeat addresses)"""
     lat = coordinates.get("lat")
     lng = coordinates.get("lng")
     
@@ -232,17 +342,164 @@ async def update_delivery_coordinates(
     
     result = await db.orders.find_one_and_update(
         {"id": order_id},
-        {"$set": {"coordinates": {"lat": lat, "lng": lng}}},
+        {"$set": {
+            **delivery_geo.position_fields(lat, lng),
+            "coordinates_source": "map",
+            "coordinates_precision": "address"
+        }},
         return_document=True
     )
     
     if not result:
         raise HTTPException(status_code=404, detail="Comandă negăsită")
     
+    await geocoding_service.remember(result.get("customer", {}).get("address"), lat, lng)
+    
     result.pop("_id", None)
     return result
 
 
+@router.get("/delivery/nearby")
+async def get_delivery_orders_nearby(
+    lat: float,
+    lng: float,
+    radius_m: float = Query(default=1000, gt=0, le=50000),
+    status: Optional[str] = Query(default=None),
+    current_user: dict = Depends(get_current_admin)
+):
+    """Delivery orders within radius_m of a point, closest first"""
+    orders = await delivery_geo.orders_near(
+        lat, lng, radius_m, [status] if status else ACTIVE_DELIVERY_STATUSES
+    )
+    return {"deliveries": orders, "total": len(orders)}
+
+
+@router.get("/delivery/pending-by-distance")
+async def get_pending_deliveries_by_distance(current_user: dict = Depends(get_current_admin)):
+    """Pending deliveries sorted by distance from the restaurant"""
+    orders = await delivery_geo.pending_by_distance()
+    return {"deliveries": orders, "total": len(orders)}
+
+
+# ============== DELIVERY ZONES ==============
+
+@router.get("/delivery/zones")
+async def get_delivery_zones(current_user: dict = Depends(get_current_admin)):
+    """Delivery fee zones"""
+    return {"zones": await delivery_geo.list_zones()}
+
+
+@router.post("/delivery/zones")
+async def create_delivery_zone(
+    zone: DeliveryZoneInput,
+    current_user: dict = Depends(get_current_admin)
+):
+    """Create a delivery fee zone (polygon of [lat, lng] points)"""
+    import uuid
+    
+    return await _save_delivery_zone(str(uuid.uuid4()), zone)
+
+
+@router.put("/delivery/zones/{zone_id}")
+async def update_delivery_zone(
+    zone_id: str,
+    zone: DeliveryZoneInput,
+    current_user: dict = Depends(get_current_admin)
+):
+    """Replace a delivery fee zone"""
+    if not await db.delivery_zones.find_one({"id": zone_id}, {"_id": 1}):
+        raise HTTPException(status_code=404, detail="Zonă negăsită")
+    return await _save_delivery_zone(zone_id, zone)
+
+
+async def _save_delivery_zone(zone_id: str, zone: DeliveryZoneInput) -> dict:
+    try:
+        return await delivery_geo.save_zone({
+            "id": zone_id,
+            **zone.model_dump(),
+            "updated_at": datetime.now(timezone.utc).isoformat()
+        })
+    except OperationFailure:
+        # 2dsphere index rejects self-intersecting or degenerate polygons
+        raise HTTPException(status_code=400, detail="Poligon invalid")
+
+
+@router.delete("/delivery/zones/{zone_id}")
+async def delete_delivery_zone(
+    zone_id: str,
+    current_user: dict = Depends(get_current_admin)
+):
+    """Delete a delivery fee zone"""
+    try:
+        await delivery_geo.delete_zone(zone_id)
+    except delivery_geo.ZoneNotFound:
+        raise HTTPException(status_code=404, detail="Zonă negăsită")
+    return {"message": "Zonă ștearsă cu succes"}
+
+
+@router.get("/delivery/zones/{zone_id}/orders")
+async def get_delivery_zone_orders(
+    zone_id: str,
+    status: Optional[str] = Query(default=None),
+    current_user: dict = Depends(get_current_admin)
+):
+    """Delivery orders located inside a zone"""
+    try:
+        orders = await delivery_geo.orders_in_zone(
+            zone_id, [status] if status else ACTIVE_DELIVERY_STATUSES
+        )
+    except delivery_geo.ZoneNotFound:
+        raise HTTPException(status_code=404, detail="Zonă negăsită")
+    return {"deliveries": orders, "total": len(orders)}
+
+
+# ============== ARCHIVE ==============
+
+@router.post("/archive/run")
+async def run_order_archival(
+    older_than_days: Optional[int] = Query(default=None, ge=30),
+    current_user: dict = Depends(get_current_admin)
+):
+    """Move closed orders older than the cutoff into monthly archive collections"""
+    return await order_archive.run_archival(older_than_days)
+
+
+@router.get("/archive/months")
+async def get_archive_months(
+    month_from: Optional[str] = Query(default=None, pattern=r"^\d{4}-\d{2}$"),
+    month_to: Optional[str] = Query(default=None, pattern=r"^\d{4}-\d{2}$"),
+    current_user: dict = Depends(get_current_admin)
+):
+    """Monthly rollups of archived orders (historical reports)"""
+    return {"months": await order_archive.get_rollups(month_from, month_to)}
+
+
+@router.get("/archive/months/{month}/orders")
+async def get_archive_month_orders(
+    month: str,
+    limit: int = Query(default=50, le=200),
+    skip: int = 0,
+    current_user: dict = Depends(get_current_admin)
+):
+    """Archived orders of one month"""
+    try:
+        return await order_archive.get_archived_orders(month, skip, limit)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Lună invalidă (format AAAA-LL)")
+
+
+@router.get("/archive/orders/{order_id}")
+async def get_archived_order(
+    order_id: str,
+    current_user: dict = Depends(get_current_admin)
+):
+    """Look up one archived order"""
+    order = await order_archive.find_archived_order(order_id)
+    if not order:
+        raise HTTPException(status_code=404, detail="Comandă negăsită")
+    return order
+
+
 # ============== MENU MANAGEMENT ==============
 
 @router.post("/menu/categories")
@@ -317,6 +574,7 @@ async def create_item_admin(
     
     await db.menu_items.insert_one(doc)
     doc.pop("_id", None)  # Remove MongoDB ObjectId before returning
+    menu_index.update_item(doc)
     return doc
 
 
@@ -338,6 +596,7 @@ async def update_item_admin(
         raise HTTPException(status_code=404, detail="Produs negăsit")
     
     result.pop("_id", None)
+    menu_index.update_item(result)
     return result
 
 
@@ -350,6 +609,7 @@ async def delete_item_admin(
     result = await db.menu_items.delete_one({"id": item_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Produs negăsit")
+    menu_index.remove_item(item_id)
     return {"message": "Produs șters cu succes"}
 
 
@@ -5,6 +5,7 @@ JWT-based authentication with security features
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 import os
+import asyncio
 import secrets
 import hashlib
 
@@ -103,6 +104,15 @@ def hash_password(password: str) -> str:
     return pwd_context.hash(password)
 
 
+# bcrypt is deliberately slow (~100+ ms): run it off the event loop in request handlers
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await asyncio.to_thread(verify_password, plain_password, hashed_password)
+
+
+async def hash_password_async(password: str) -> str:
+    return await asyncio.to_thread(hash_password, password)
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
     expire = datetime.now(timezone.utc) + (expires_delta or timedelta(minutes=get_access_token_expire()))
@@ -125,6 +135,22 @@ def create_refresh_token(data: dict) -> str:
     return jwt.encode(to_encode, get_jwt_secret(), algorithm=get_jwt_algorithm())
 
 
+def get_driver_token_expire():
+    return int(os.environ.get('DRIVER_TOKEN_EXPIRE_HOURS', 12))
+
+
+def create_driver_token(driver_id: str, name: str) -> str:
+    """Shift-long token for a driver's phone (location pings only, no admin access)"""
+    to_encode = {
+        "sub": driver_id,
+        "name": name,
+        "exp": datetime.now(timezone.utc) + timedelta(hours=get_driver_token_expire()),
+        "iat": datetime.now(timezone.utc),
+        "type": "driver"
+    }
+    return jwt.encode(to_encode, get_jwt_secret(), algorithm=get_jwt_algorithm())
+
+
 def decode_token(token: str) -> dict:
     try:
         payload = jwt.decode(token, get_jwt_secret(), algorithms=[get_jwt_algorithm()])
@@ -207,6 +233,16 @@ async def get_current_admin(current_user: dict = Depends(get_current_user)):
     return current_user
 
 
+async def get_current_driver(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """Verify a driver token (signature only, no database read per ping)"""
+    payload = decode_token(credentials.credentials)
+    
+    if payload.get("type") != "driver" or not payload.get("sub"):
+        raise HTTPException(status_code=401, detail="Token invalid")
+    
+    return {"driver_id": payload["sub"], "name": payload.get("name", "")}
+
+
 # ============== ROUTES ==============
 
 @router.post("/login", response_model=LoginResponse)
@@ -235,7 +271,7 @@ async def login(request: LoginRequest):
         raise HTTPException(status_code=423, detail="Contul este blocat temporar")
     
     # Verify password
-    if not verify_password(request.password, user["hashed_password"]):
+    if not await verify_password_async(request.password, user["hashed_password"]):
         record_failed_attempt(email)
         
         # Update failed attempts in DB
@@ -328,7 +364,8 @@ async def request_password_reset(request: PasswordResetRequest):
         "email": email,
         "token_hash": hashed_token,
         "created_at": datetime.now(timezone.utc).isoformat(),
-        "expires_at": (datetime.now(timezone.utc) + timedelta(hours=1)).isoformat(),
+        # Stored as a date so the TTL index removes it once expired
+        "expires_at": datetime.now(timezone.utc) + timedelta(hours=1),
         "used": False
     })
     
@@ -356,8 +393,15 @@ async def confirm_password_reset(request: PasswordResetConfirm):
     if not token_doc:
         raise HTTPException(status_code=400, detail="Token invalid sau expirat")
     
-    # Check expiration
-    expires_at = datetime.fromisoformat(token_doc["expires_at"])
+    # Check expiration (the TTL monitor only runs once a minute)
+    expires_at = token_doc["expires_at"]
+    if isinstance(expires_at, str):
+        expires_at = datetime.fromisoformat(expires_at)
+    
+    # Dates come back naive from MongoDB
+    if expires_at.tzinfo is None:
+        expires_at = expires_at.replace(tzinfo=timezone.utc)
+    
     if datetime.now(timezone.utc) > expires_at:
         raise HTTPException(status_code=400, detail="Token expirat")
     
@@ -366,7 +410,7 @@ async def confirm_password_reset(request: PasswordResetConfirm):
         raise HTTPException(status_code=400, detail="Parola trebuie să aibă minim 8 caractere")
     
     # Update password
-    new_hash = hash_password(request.new_password)
+    new_hash = await hash_password_async(request.new_password)
     await db.admin_users.update_one(
         {"email": token_doc["email"]},
         {"$set": {"hashed_password": new_hash}}
@@ -390,7 +434,7 @@ async def change_password(
     user = await db.admin_users.find_one({"email": current_user["email"]})
     
     # Verify current password
-    if not verify_password(request.current_password, user["hashed_password"]):
+    if not await verify_password_async(request.current_password, user["hashed_password"]):
         raise HTTPException(status_code=400, detail="Parola actuală incorectă")
     
     # Validate new password
@@ -398,7 +442,7 @@ async def change_password(
         raise HTTPException(status_code=400, detail="Parola nouă trebuie să aibă minim 8 caractere")
     
     # Update password
-    new_hash = hash_password(request.new_password)
+    new_hash = await hash_password_async(request.new_password)
     await db.admin_users.update_one(
         {"email": current_user["email"]},
         {"$set": {"hashed_password": new_hash}}
@@ -0,0 +1,186 @@
+"""
+Debug routes for Panaghia - runtime diagnostics for the admin (query cost, event loop, CPU profile, memory)
+"""
+import time
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Path, Query
+from fastapi.responses import PlainTextResponse
+
+from routes.auth import get_current_admin, login_attempts
+from services import query_monitor, loop_monitor, profiler, memory_debug, background
+
+router = APIRouter(prefix="/admin/debug", tags=["Debug"])
+
+# Database reference
+db = None
+
+def set_db(database):
+    global db
+    db = database
+
+
+# ============== DATABASE ==============
+
+@router.get("/db-stats")
+async def get_db_stats(current_user: dict = Depends(get_current_admin)):
+    """MongoDB command counts and timings per collection, plus recent slow queries"""
+    return query_monitor.stats.snapshot()
+
+
+@router.post("/db-stats/reset")
+async def reset_db_stats(current_user: dict = Depends(get_current_admin)):
+    """Start a fresh measurement window"""
+    query_monitor.stats.reset()
+    return {"message": "Statistici resetate"}
+
+
+@router.get("/collections")
+async def get_collection_stats(current_user: dict = Depends(get_current_admin)):
+    """Document counts, data and index sizes per collection (collStats)"""
+    collections = []
+    for name in sorted(await db.list_collection_names()):
+        stats = await db.command("collStats", name)
+        collections.append({
+            "collection": name,
+            "count": stats.get("count", 0),
+            "size_bytes": stats.get("size", 0),
+            "storage_bytes": stats.get("storageSize", 0),
+            "index_bytes": stats.get("totalIndexSize", 0),
+            "indexes": stats.get("nindexes", 0)
+        })
+    return {"collections": collections}
+
+
+# ============== EVENT LOOP ==============
+
+@router.get("/event-loop")
+async def get_event_loop_status(current_user: dict = Depends(get_current_admin)):
+    """Current loop lag, worst lag since the last read and recent blocking stacks (debug mode)"""
+    return loop_monitor.get_status()
+
+
+# ============== CPU PROFILE ==============
+
+@router.get("/profile")
+async def profile_cpu(
+    seconds: float = Query(default=10, ge=1, le=60),
+    format: str = Query(default="collapsed", pattern="^(collapsed|json)$"),
+    scope: str = Query(default="app", pattern="^(app|all)$"),
+    current_user: dict = Depends(get_current_admin)
+):
+    """
+    Sample this worker's event loop for N seconds.
+    collapsed: flamegraph-ready folded stacks; json: summary and top functions.
+    scope=app keeps only stacks that reach our code (handlers, services, background tasks).
+    """
+    try:
+        stacks, summary = await profiler.profile(seconds, app_only=scope == "app")
+    except profiler.ProfilerBusy:
+        raise HTTPException(status_code=409, detail="Un profil rulează deja")
+    
+    if format == "collapsed":
+        filename = f"profile-{time.strftime('%Y%m%d-%H%M%S')}.folded"
+        return PlainTextResponse(
+            profiler.collapsed(stacks),
+            headers={
+                "Content-Disposition": f'attachment; filename="{filename}"',
+                "X-Profile-Samples": str(summary["samples"]),
+                "X-Profile-Busy-Ratio": str(summary["busy_ratio"])
+            }
+        )
+    return {
+        **summary,
+        "top_functions": profiler.top_functions(stacks),
+        "stacks": [{"stack": list(stack), "count": count} for stack, count in stacks.most_common(100)]
+    }
+
+
+# ============== MEMORY ==============
+
+SNAPSHOT_NAME_PATTERN = "^[A-Za-z0-9_.-]{1,40}$"
+KEY_TYPE_PATTERN = "^(lineno|filename|traceback)$"
+
+
+@router.get("/memory")
+async def get_memory_status(current_user: dict = Depends(get_current_admin)):
+    """tracemalloc state, stored snapshots and the size of in-memory stores"""
+    return {
+        **memory_debug.get_status(),
+        "in_memory": {
+            "login_attempts": len(login_attempts),
+            "background_tasks": background.running_count()
+        }
+    }
+
+
+@router.post("/memory/tracing/start")
+async def start_memory_tracing(
+    frames: int = Query(default=memory_debug.DEFAULT_TRACE_FRAMES, ge=1, le=50),
+    current_user: dict = Depends(get_current_admin)
+):
+    """Start tracemalloc on this worker (slows allocations down while on)"""
+    memory_debug.start(frames)
+    return memory_debug.get_status()
+
+
+@router.post("/memory/tracing/stop")
+async def stop_memory_tracing(current_user: dict = Depends(get_current_admin)):
+    memory_debug.stop()
+    return memory_debug.get_status()
+
+
+@router.post("/memory/snapshots/{name}")
+async def take_memory_snapshot(name: str = Path(pattern=SNAPSHOT_NAME_PATTERN), current_user: dict = Depends(get_current_admin)):
+    try:
+        return await memory_debug.take_snapshot(name)
+    except memory_debug.TracingOff:
+        raise HTTPException(status_code=409, detail="tracemalloc nu este pornit")
+
+
+@router.delete("/memory/snapshots/{name}")
+async def delete_memory_snapshot(name: str, current_user: dict = Depends(get_current_admin)):
+    try:
+        memory_debug.delete_snapshot(name)
+    except memory_debug.SnapshotNotFound:
+        raise HTTPException(status_code=404, detail="Snapshot negăsit")
+    return {"message": "Snapshot șters"}
+
+
+@router.get("/memory/top")
+async def get_memory_top(
+    snapshot: Optional[str] = None,
+    key_type: str = Query(default="lineno", pattern=KEY_TYPE_PATTERN),
+    limit: int = Query(default=25, ge=1, le=200),
+    current_user: dict = Depends(get_current_admin)
+):
+    """Largest allocation sites of a stored snapshot (or of the heap right now)"""
+    try:
+        return await memory_debug.top(snapshot, key_type, limit)
+    except memory_debug.TracingOff:
+        raise HTTPException(status_code=409, detail="tracemalloc nu este pornit")
+    except memory_debug.SnapshotNotFound:
+        raise HTTPException(status_code=404, detail="Snapshot negăsit")
+
+
+@router.get("/memory/diff")
+async def get_memory_diff(
+    base: str,
+    target: Optional[str] = None,
+    key_type: str = Query(default="lineno", pattern=KEY_TYPE_PATTERN),
+    limit: int = Query(default=25, ge=1, le=200),
+    current_user: dict = Depends(get_current_admin)
+):
+    """Allocation growth from snapshot `base` to `target` (or to the heap right now)"""
+    try:
+        return await memory_debug.diff(base, target, key_type, limit)
+    except memory_debug.TracingOff:
+        raise HTTPException(status_code=409, detail="tracemalloc nu este pornit")
+    except memory_debug.SnapshotNotFound:
+        raise HTTPException(status_code=404, detail="Snapshot negăsit")
+
+
+@router.get("/tasks")
+async def get_task_counts(current_user: dict = Depends(get_current_admin)):
+    """Live asyncio tasks grouped by coroutine name"""
+    return memory_debug.task_counts()
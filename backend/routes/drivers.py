@@ -0,0 +1,80 @@
+"""
+Driver routes for Panaghia - location pings from drivers' phones, live positions for the admin map
+"""
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+
+from routes.auth import get_current_admin, get_current_driver, create_driver_token, get_driver_token_expire
+from services import driver_tracking
+
+router = APIRouter(prefix="/drivers", tags=["Drivers"])
+
+
+# ============== MODELS ==============
+
+class LocationPing(BaseModel):
+    lat: float = Field(ge=-90, le=90)
+    lng: float = Field(ge=-180, le=180)
+    accuracy_m: Optional[float] = Field(default=None, ge=0)
+    heading: Optional[float] = Field(default=None, ge=0, le=360)
+    speed_mps: Optional[float] = Field(default=None, ge=0)
+    recorded_at: Optional[datetime] = None
+
+
+class DriverTokenRequest(BaseModel):
+    name: str
+
+
+# ============== DRIVER PHONE ==============
+
+@router.post("/location", status_code=202)
+async def report_location(ping: LocationPing, driver: dict = Depends(get_current_driver)):
+    """Location ping from a driver's phone (kept in memory, written in batches)"""
+    position = driver_tracking.record_ping(driver["driver_id"], driver["name"], ping.model_dump())
+    return {"accepted": True, "recorded_at": position["recorded_at"]}
+
+
+# ============== ADMIN ==============
+
+@router.post("/{driver_id}/token")
+async def issue_driver_token(
+    driver_id: str,
+    request: DriverTokenRequest,
+    current_user: dict = Depends(get_current_admin)
+):
+    """Token for a driver's phone, valid for one shift"""
+    return {
+        "driver_id": driver_id,
+        "token": create_driver_token(driver_id, request.name),
+        "expires_in": get_driver_token_expire() * 3600
+    }
+
+
+@router.get("/positions")
+async def get_driver_positions(current_user: dict = Depends(get_current_admin)):
+    """Latest position of every driver"""
+    return {"drivers": driver_tracking.get_positions()}
+
+
+@router.get("/positions/stream")
+async def stream_driver_positions(current_user: dict = Depends(get_current_admin)):
+    """Server-sent events for the admin map: all positions, then each ping"""
+    queue = driver_tracking.subscribe()
+    return StreamingResponse(
+        driver_tracking.event_stream(queue),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get("/{driver_id}/track")
+async def get_driver_track(
+    driver_id: str,
+    minutes: int = Query(default=60, ge=1, le=24 * 60),
+    current_user: dict = Depends(get_current_admin)
+):
+    """Stored path of a driver over the last N minutes"""
+    return {"driver_id": driver_id, "points": await driver_tracking.get_track(driver_id, minutes)}
@@ -2,6 +2,8 @@ from fastapi import APIRouter, HTTPException
 from typing import List
 from datetime import datetime, timezone
 
+from services import menu_index
+
 router = APIRouter(prefix="/menu", tags=["Menu"])
 
 
@@ -109,6 +111,7 @@ async def create_menu_item(item: dict):
     doc['updated_at'] = doc['updated_at'].isoformat()
     
     await db.menu_items.insert_one(doc)
+    menu_index.update_item(doc)
     return doc
 
 
@@ -126,6 +129,7 @@ async def update_menu_item(item_id: str, item: dict):
         raise HTTPException(status_code=404, detail="Menu item not found")
     
     result.pop("_id", None)
+    menu_index.update_item(result)
     return result
 
 
@@ -138,6 +142,7 @@ async def delete_menu_item(item_id: str):
     )
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="Menu item not found")
+    menu_index.set_availability(item_id, False)
     return {"message": "Menu item deleted successfully"}
 
 
@@ -1,8 +1,16 @@
-from fastapi import APIRouter, HTTPException
-from typing import List
+from fastapi import APIRouter, HTTPException, Header, Request
+from fastapi.exceptions import RequestValidationError
+from pydantic import TypeAdapter, ValidationError
+from typing import List, Optional
 from datetime import datetime, timezone
+import uuid
+import logging
+
+from models import OrderCreate, generate_order_number
+from services import idempotency_service, menu_index, order_workflow, geocoding_service, delivery_geo, background, tracing
 
 router = APIRouter(prefix="/orders", tags=["Orders"])
+logger = logging.getLogger(__name__)
 
 
 # This will be set from server.py
@@ -14,6 +22,10 @@ def set_db(database):
     db = database
 
 
+# Built once: the order body is parsed and validated in a single pass
+order_create_adapter = TypeAdapter(OrderCreate)
+
+
 @router.get("/", response_model=List[dict])
 async def get_orders(status: str = None, limit: int = 50):
     """Get all orders, optionally filtered by status"""
@@ -33,6 +45,24 @@ async def get_orders(status: str = None, limit: int = 50):
     return orders
 
 
+@router.get("/delivery-check", response_model=dict)
+async def check_delivery_area(
+    address: Optional[str] = None,
+    lat: Optional[float] = None,
+    lng: Optional[float] = None
+):
+    """Checkout check: can we deliver to this address/point, and for what fee"""
+    if lat is None or lng is None:
+        position = await geocoding_service.geocode(address)
+        if not position:
+            # Unknown street: accepted, the position is confirmed on the delivery map
+            return {"resolved": False, "deliverable": True, "zone": None,
+                    "fee": delivery_geo.get_default_delivery_fee(), "min_order": 0}
+        lat, lng = position["lat"], position["lng"]
+    
+    return {"resolved": True, **await delivery_geo.check_delivery(lat, lng)}
+
+
 @router.get("/{order_id}", response_model=dict)
 async def get_order(order_id: str):
     """Get a specific order by ID"""
@@ -51,43 +81,119 @@ async def get_order_by_number(order_number: str):
     return order
 
 
-@router.post("/", response_model=dict)
-async def create_order(order_data: dict):
-    """Create a new order"""
-    from models import Order, OrderCreate, OrderItem, CustomerInfo
-    
-    # Calculate total
-    total = sum(item['price'] * item['quantity'] for item in order_data.get('items', []))
-    
-    # Create order object
-    order_create = OrderCreate(
-        items=[OrderItem(**item) for item in order_data.get('items', [])],
-        customer=CustomerInfo(**order_data.get('customer', {})),
-        order_type=order_data.get('order_type', 'pickup'),
-        payment_method=order_data.get('payment_method', 'cash')
-    )
-    
-    order = Order(
-        **order_create.model_dump(),
-        total=total
-    )
-    
-    doc = order.model_dump()
-    
-    # Convert datetime to ISO string for MongoDB
-    doc['created_at'] = doc['created_at'].isoformat()
-    doc['updated_at'] = doc['updated_at'].isoformat()
+async def _insert_order(order_create: OrderCreate) -> dict:
+    """
+    Price and store a validated order, building the document directly.
+    Delivery orders resolved to a zone must reach its minimum (on the items,
+    422 otherwise) and pay its fee, which is included in the total.
+    """
+    # Price items from the menu index (client prices are ignored)
+    try:
+        items = await menu_index.price_items(order_create.items)
+    except menu_index.MenuItemNotFound as e:
+        raise HTTPException(status_code=400, detail=f"Unknown menu item: {e.item_id}")
+    except menu_index.MenuItemUnavailable as e:
+        raise HTTPException(status_code=409, detail=f"Menu item unavailable: {e.name}")
+    subtotal = sum(item['price'] * item['quantity'] for item in items)
+    
+    now = datetime.now(timezone.utc)
+    doc = {
+        "id": str(uuid.uuid4()),
+        "order_number": generate_order_number(now),
+        "items": items,
+        "customer": order_create.customer.model_dump(),
+        "subtotal": subtotal,
+        "total": subtotal,
+        "status": "pending",
+        "order_type": order_create.order_type,
+        "payment_method": order_create.payment_method,
+        "version": 0,
+        "status_history": [{"status": "pending", "at": now.isoformat()}],
+        "created_at": now.isoformat(),
+        "updated_at": now.isoformat()
+    }
+    
+    # Resolve delivery coordinates up front so routing never waits on the browser
+    if order_create.order_type == "delivery":
+        position = await geocoding_service.geocode(order_create.customer.address)
+        if position:
+            zone_check = await delivery_geo.check_delivery(position["lat"], position["lng"])
+            if not zone_check["deliverable"]:
+                raise HTTPException(status_code=422, detail="Address is outside the delivery area")
+            if subtotal < (zone_check["min_order"] or 0):
+                raise HTTPException(
+                    status_code=422,
+                    detail=f"Minimum order for this delivery area is {zone_check['min_order']:g} lei"
+                )
+            doc.update(delivery_geo.position_fields(position["lat"], position["lng"]))
+            doc["coordinates_source"] = position["source"]
+            doc["coordinates_precision"] = position["precision"]
+            doc["delivery_zone"] = zone_check["zone"]
+            doc["delivery_fee"] = zone_check["fee"]
+            doc["total"] = subtotal + zone_check["fee"]
     
     await db.orders.insert_one(doc)
     
     # Return without _id
     doc.pop('_id', None)
+    return doc
+
+
+@router.post("/", response_model=dict)
+async def create_order(
+    request: Request,
+    idempotency_key: Optional[str] = Header(default=None, alias="Idempotency-Key")
+):
+    """Create a new order (retries with the same Idempotency-Key replay the first result)"""
+    try:
+        order_create = order_create_adapter.validate_json(await request.body())
+    except ValidationError as e:
+        raise RequestValidationError(
+            [{**error, "loc": ("body", *error["loc"])} for error in e.errors(include_url=False)]
+        )
+    
+    if idempotency_key:
+        if len(idempotency_key) > idempotency_service.MAX_KEY_LENGTH:
+            raise HTTPException(status_code=400, detail="Idempotency-Key too long")
+        
+        try:
+            stored_response = await idempotency_service.begin(
+                "orders:create",
+                idempotency_key,
+                idempotency_service.hash_request(order_create.model_dump(mode="json"))
+            )
+        except idempotency_service.IdempotencyKeyMismatch:
+            raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different order")
+        except idempotency_service.IdempotencyKeyInProgress:
+            raise HTTPException(status_code=409, detail="An order with this Idempotency-Key is still being processed")
+        
+        # Replay: no new order, email or Zoho deal
+        if stored_response is not None:
+            return stored_response
+    
+    try:
+        doc = await _insert_order(order_create)
+    except Exception:
+        if idempotency_key:
+            await idempotency_service.release("orders:create", idempotency_key)
+        raise
+    
+    if idempotency_key:
+        try:
+            await idempotency_service.complete("orders:create", idempotency_key, doc)
+        except Exception as e:
+            # The order exists: answer with it rather than a 500 the client would retry into a 409
+            logger.error(f"Could not store the response for order {doc['order_number']} "
+                         f"(Idempotency-Key {idempotency_key}): {e}")
+    
+    # Lets the trace of this request (and its email/Zoho spans) be found by order
+    tracing.set_attribute("order.id", doc["id"])
+    tracing.set_attribute("order.number", doc["order_number"])
     
     # Send email notification (async, don't block response)
     try:
         from services.email_service import send_new_order_notification
-        import asyncio
-        asyncio.create_task(send_new_order_notification(doc))
+        background.spawn(send_new_order_notification(doc), "email.new_order")
     except Exception as e:
         # Log but don't fail the order creation
         import logging
@@ -96,7 +202,6 @@ async def create_order(order_data: dict):
     # Sync to Zoho CRM (async, don't block response)
     try:
         from services.zoho_service import sync_customer_to_zoho, sync_order_to_zoho
-        import asyncio
         
         async def sync_to_zoho():
             # First sync customer
@@ -105,7 +210,7 @@ async def create_order(order_data: dict):
             # Then sync order with contact reference
             await sync_order_to_zoho(doc, contact_id)
         
-        asyncio.create_task(sync_to_zoho())
+        background.spawn(sync_to_zoho(), "zoho.sync_order")
     except Exception as e:
         import logging
         logging.error(f"Failed to queue Zoho CRM sync: {e}")
@@ -115,61 +220,29 @@ async def create_order(order_data: dict):
 
 @router.patch("/{order_id}/status", response_model=dict)
 async def update_order_status(order_id: str, status_data: dict):
-    """Update order status"""
-    valid_statuses = ['pending', 'confirmed', 'preparing', 'ready', 'delivered', 'cancelled']
+    """Update order status (optionally guarded by the order's current version)"""
     new_status = status_data.get('status')
     
-    if new_status not in valid_statuses:
-        raise HTTPException(status_code=400, detail=f"Invalid status. Must be one of: {', '.join(valid_statuses)}")
-    
-    result = await db.orders.find_one_and_update(
-        {"id": order_id},
-        {
-            "$set": {
-                "status": new_status,
-                "updated_at": datetime.now(timezone.utc).isoformat()
-            }
-        },
-        return_document=True
-    )
-    
-    if not result:
+    try:
+        return await order_workflow.transition_order(order_id, new_status, status_data.get('version'))
+    except order_workflow.UnknownStatus:
+        raise HTTPException(status_code=400, detail=f"Invalid status. Must be one of: {', '.join(order_workflow.ORDER_STATUSES)}")
+    except order_workflow.OrderNotFound:
         raise HTTPException(status_code=404, detail="Order not found")
-    
-    result.pop("_id", None)
-    
-    # Sync status update to Zoho CRM (async)
-    zoho_deal_id = result.get("zoho_deal_id")
-    if zoho_deal_id:
-        try:
-            from services.zoho_service import update_deal_status
-            import asyncio
-            asyncio.create_task(update_deal_status(zoho_deal_id, new_status))
-        except Exception as e:
-            import logging
-            logging.error(f"Failed to sync status to Zoho CRM: {e}")
-    
-    return result
+    except order_workflow.InvalidTransition as e:
+        raise HTTPException(status_code=409, detail=f"Cannot change order status from {e.current} to {e.target}")
+    except order_workflow.VersionConflict:
+        raise HTTPException(status_code=409, detail="Order was modified by someone else, reload and try again")
 
 
 @router.delete("/{order_id}")
 async def cancel_order(order_id: str):
     """Cancel an order"""
-    order = await db.orders.find_one({"id": order_id})
-    if not order:
+    try:
+        await order_workflow.transition_order(order_id, "cancelled")
+    except order_workflow.OrderNotFound:
         raise HTTPException(status_code=404, detail="Order not found")
-    
-    if order.get('status') in ['delivered', 'cancelled']:
+    except order_workflow.InvalidTransition:
         raise HTTPException(status_code=400, detail="Cannot cancel this order")
     
-    await db.orders.update_one(
-        {"id": order_id},
-        {
-            "$set": {
-                "status": "cancelled",
-                "updated_at": datetime.now(timezone.utc).isoformat()
-            }
-        }
-    )
-    
     return {"message": "Order cancelled successfully"}
@@ -5,12 +5,17 @@ from datetime import datetime, timezone
 from typing import Optional
 import os
 import uuid
+import logging
 
 from fastapi import APIRouter, HTTPException, Request
 from pydantic import BaseModel
 
+from services import order_workflow, tracing
+
 router = APIRouter(prefix="/payments", tags=["Payments"])
 
+logger = logging.getLogger(__name__)
+
 # Database reference
 db = None
 
@@ -39,15 +44,25 @@ class PaymentStatusResponse(BaseModel):
     order_id: Optional[str] = None
 
 
+# ============== STRIPE CLIENT ==============
+
+def _stripe_checkout(api_key: str, webhook_url: str):
+    """StripeCheckout, sent to STRIPE_API_BASE when set (a local stand-in, see benchmarks/provider_servers.py)"""
+    from emergentintegrations.payments.stripe.checkout import StripeCheckout
+
+    api_base = os.environ.get('STRIPE_API_BASE')
+    if api_base:
+        import stripe
+        stripe.api_base = api_base
+    return StripeCheckout(api_key=api_key, webhook_url=webhook_url)
+
+
 # ============== ROUTES ==============
 
 @router.post("/checkout", response_model=CheckoutResponse)
 async def create_checkout_session(request: CreateCheckoutRequest, http_request: Request):
     """Create Stripe checkout session for an order"""
-    from emergentintegrations.payments.stripe.checkout import (
-        StripeCheckout, 
-        CheckoutSessionRequest
-    )
+    from emergentintegrations.payments.stripe.checkout import CheckoutSessionRequest
     
     # Get order
     order = await db.orders.find_one({"id": request.order_id}, {"_id": 0})
@@ -70,7 +85,7 @@ async def create_checkout_session(request: CreateCheckoutRequest, http_request:
     cancel_url = f"{host_url}/comanda?cancelled=true"
     
     # Initialize Stripe
-    stripe_checkout = StripeCheckout(api_key=api_key, webhook_url=webhook_url)
+    stripe_checkout = _stripe_checkout(api_key, webhook_url)
     
     # Create checkout session
     # Amount in RON (or EUR if RON not supported)
@@ -90,11 +105,13 @@ async def create_checkout_session(request: CreateCheckoutRequest, http_request:
     )
     
     try:
-        session = await stripe_checkout.create_checkout_session(checkout_request)
+        with tracing.span("stripe create_checkout_session", tracing.KIND_CLIENT, {"peer.service": "stripe", "currency": "ron"}):
+            session = await stripe_checkout.create_checkout_session(checkout_request)
     except Exception as e:
         # If RON doesn't work, try EUR
         checkout_request.currency = "eur"
-        session = await stripe_checkout.create_checkout_session(checkout_request)
+        with tracing.span("stripe create_checkout_session", tracing.KIND_CLIENT, {"peer.service": "stripe", "currency": "eur"}):
+            session = await stripe_checkout.create_checkout_session(checkout_request)
     
     # Create payment transaction record
     transaction = {
@@ -134,16 +151,15 @@ async def create_checkout_session(request: CreateCheckoutRequest, http_request:
 @router.get("/status/{session_id}", response_model=PaymentStatusResponse)
 async def get_payment_status(session_id: str):
     """Get payment status for a checkout session"""
-    from emergentintegrations.payments.stripe.checkout import StripeCheckout
-    
     api_key = os.environ.get('STRIPE_SECRET_KEY')
     if not api_key:
         raise HTTPException(status_code=500, detail="Stripe nu este configurat")
     
-    stripe_checkout = StripeCheckout(api_key=api_key, webhook_url="")
+    stripe_checkout = _stripe_checkout(api_key, "")
     
     try:
-        status = await stripe_checkout.get_checkout_status(session_id)
+        with tracing.span("stripe get_checkout_status", tracing.KIND_CLIENT, {"peer.service": "stripe"}):
+            status = await stripe_checkout.get_checkout_status(session_id)
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Eroare la verificarea statusului: {str(e)}")
     
@@ -167,17 +183,8 @@ async def get_payment_status(session_id: str):
                 }
             )
             
-            # Update order
-            await db.orders.update_one(
-                {"id": order_id},
-                {
-                    "$set": {
-                        "payment_status": "paid",
-                        "payment_method": "card_online",
-                        "status": "confirmed"  # Auto-confirm paid orders
-                    }
-                }
-            )
+            # Update order (auto-confirms pending paid orders)
+            await order_workflow.mark_order_paid(order_id)
     
     return PaymentStatusResponse(
         status=status.status,
@@ -191,20 +198,19 @@ async def get_payment_status(session_id: str):
 @router.post("/webhook/stripe")
 async def stripe_webhook(request: Request):
     """Handle Stripe webhooks"""
-    from emergentintegrations.payments.stripe.checkout import StripeCheckout
-    
     api_key = os.environ.get('STRIPE_API_KEY')
     if not api_key:
         return {"status": "error", "message": "Stripe not configured"}
     
-    stripe_checkout = StripeCheckout(api_key=api_key, webhook_url="")
+    stripe_checkout = _stripe_checkout(api_key, "")
     
     # Get raw body
     body = await request.body()
     signature = request.headers.get("Stripe-Signature")
     
     try:
-        webhook_response = await stripe_checkout.handle_webhook(body, signature)
+        with tracing.span("stripe handle_webhook", tracing.KIND_INTERNAL, {"peer.service": "stripe"}):
+            webhook_response = await stripe_checkout.handle_webhook(body, signature)
         
         # Process webhook
         if webhook_response.payment_status == "paid":
@@ -225,19 +231,10 @@ async def stripe_webhook(request: Request):
             
             # Update order
             if order_id:
-                await db.orders.update_one(
-                    {"id": order_id},
-                    {
-                        "$set": {
-                            "payment_status": "paid",
-                            "payment_method": "card_online",
-                            "status": "confirmed"
-                        }
-                    }
-                )
+                await order_workflow.mark_order_paid(order_id)
         
         return {"status": "success", "event_type": webhook_response.event_type}
     
     except Exception as e:
-        print(f"Webhook error: {e}")
+        logger.error(f"Webhook error: {e}")
         return {"status": "error", "message": str(e)}
@@ -1,7 +1,8 @@
-from fastapi import FastAPI, APIRouter, Request
+from fastapi import FastAPI, APIRouter, Request, Query, Response
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import CollectionInvalid, OperationFailure
 import os
 import logging
 from pathlib import Path
@@ -11,26 +12,46 @@ import uuid
 from datetime import datetime, timezone
 
 # Import routes
-from routes import menu, orders, restaurant, auth, admin, payments, zoho
-from services import zoho_service
+from routes import menu, orders, restaurant, auth, admin, payments, zoho, drivers, debug
+from services import zoho_service, idempotency_service, menu_index, order_workflow, order_analytics, kitchen_service, geocoding_service, delivery_geo, driver_tracking, order_export, order_archive, metrics, query_monitor, loop_monitor, tracing
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
-
-# Set database for routes
-menu.set_db(db)
-orders.set_db(db)
-restaurant.set_db(db)
-auth.set_db(db)
-admin.set_db(db)
-payments.set_db(db)
-zoho.set_db(db)
-zoho_service.set_db(db)
+client = AsyncIOMotorClient(
+    mongo_url,
+    event_listeners=[metrics.PoolMetricsListener(), query_monitor.QueryMonitor(), tracing.MongoTracingListener()]
+)
+
+
+def set_database(database):
+    """Point the app and every route/service module at `database` (tests pass a fake one)"""
+    global db
+    db = database
+    menu.set_db(database)
+    orders.set_db(database)
+    restaurant.set_db(database)
+    auth.set_db(database)
+    admin.set_db(database)
+    payments.set_db(database)
+    zoho.set_db(database)
+    debug.set_db(database)
+    zoho_service.set_db(database)
+    idempotency_service.set_db(database)
+    menu_index.set_db(database)
+    order_workflow.set_db(database)
+    order_analytics.set_db(database)
+    kitchen_service.set_db(database)
+    geocoding_service.set_db(database)
+    delivery_geo.set_db(database)
+    driver_tracking.set_db(database)
+    order_export.set_db(database)
+    order_archive.set_db(database)
+
+
+set_database(client[os.environ['DB_NAME']])
 
 # Create the main app
 app = FastAPI(
@@ -80,8 +101,12 @@ async def create_status_check(input: StatusCheckCreate):
 
 
 @api_router.get("/status", response_model=List[StatusCheck])
-async def get_status_checks():
-    status_checks = await db.status_checks.find({}, {"_id": 0}).to_list(1000)
+async def get_status_checks(
+    limit: int = Query(default=50, ge=1, le=200),
+    skip: int = Query(default=0, ge=0)
+):
+    # Newest first; the collection is capped so skip stays cheap
+    status_checks = await db.status_checks.find({}, {"_id": 0}).sort("$natural", -1).skip(skip).limit(limit).to_list(limit)
     
     for check in status_checks:
         if isinstance(check['timestamp'], str):
@@ -105,10 +130,21 @@ api_router.include_router(auth.router)
 api_router.include_router(admin.router)
 api_router.include_router(payments.router)
 api_router.include_router(zoho.router)
+api_router.include_router(drivers.router)
+api_router.include_router(debug.router)
 
 # Include the router in the main app
 app.include_router(api_router)
 
+
+# Prometheus scrape endpoint (outside /api, like other infrastructure endpoints)
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics(request: Request):
+    token = os.environ.get('METRICS_TOKEN')
+    if token and request.headers.get("authorization") != f"Bearer {token}":
+        return Response(status_code=401)
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
@@ -117,6 +153,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Added last so it is outermost: latency covers CORS and error handling too
+app.add_middleware(metrics.MetricsMiddleware)
+# Outermost of all, so the request span contains everything else
+app.add_middleware(tracing.TracingMiddleware)
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -147,6 +188,21 @@ async def startup_event():
     
     # Create indexes
     await create_indexes()
+    
+    # Orders saved before GeoJSON locations only have {lat, lng}
+    await delivery_geo.backfill_locations()
+    
+    # Warm the in-memory menu price index used to price orders
+    await menu_index.load()
+    
+    # Periodic batch writes of driver location pings
+    driver_tracking.start()
+    
+    # Event-loop lag sampling (plus blocking-call watchdog with LOOP_MONITOR_DEBUG=1)
+    loop_monitor.start()
+    
+    # Span export (only with TRACE_EXPORT_PATH / TRACE_OTLP_ENDPOINT set)
+    tracing.start()
 
 
 async def create_admin_user(email: str):
@@ -181,6 +237,7 @@ async def create_indexes():
     await db.orders.create_index("status")
     await db.orders.create_index("created_at")
     await db.orders.create_index("order_type")
+    await db.orders.create_index([("location", "2dsphere")])
     
     # Menu indexes
     await db.menu_items.create_index("id", unique=True)
@@ -194,9 +251,69 @@ async def create_indexes():
     await db.payment_transactions.create_index("session_id", unique=True)
     await db.payment_transactions.create_index("order_id")
     
+    # Delivery fee zones (polygons)
+    await db.delivery_zones.create_index("id", unique=True)
+    await db.delivery_zones.create_index([("area", "2dsphere")])
+    
+    # Driver location history expires after the retention window
+    await db.driver_locations.create_index([("driver_id", 1), ("recorded_at", 1)])
+    await db.driver_locations.create_index(
+        "recorded_at",
+        expireAfterSeconds=driver_tracking.get_location_ttl_hours() * 3600
+    )
+    
+    # Password reset tokens are removed once expired; older tokens stored
+    # expires_at as a string, which the TTL monitor ignores
+    legacy_tokens = db.password_reset_tokens.find({"expires_at": {"$type": "string"}}, {"expires_at": 1})
+    async for token in legacy_tokens:
+        await db.password_reset_tokens.update_one(
+            {"_id": token["_id"]},
+            {"$set": {"expires_at": datetime.fromisoformat(token["expires_at"])}}
+        )
+    await db.password_reset_tokens.create_index("token_hash")
+    await db.password_reset_tokens.create_index("expires_at", expireAfterSeconds=0)
+    
+    # Idempotency keys expire after the retry window
+    await db.idempotency_keys.create_index(
+        "created_at",
+        expireAfterSeconds=idempotency_service.get_idempotency_ttl_hours() * 3600
+    )
+    
+    await ensure_capped_status_checks()
+    
     logger.info("Database indexes created")
 
 
+def get_status_checks_cap():
+    return (
+        int(os.environ.get('STATUS_CHECKS_MAX_BYTES', 1024 * 1024)),
+        int(os.environ.get('STATUS_CHECKS_MAX_DOCS', 1000))
+    )
+
+
+NAMESPACE_EXISTS = 48
+
+
+async def ensure_capped_status_checks():
+    """Keep status_checks as a fixed-size collection (oldest entries roll off)"""
+    size, max_docs = get_status_checks_cap()
+    if "status_checks" not in await db.list_collection_names():
+        try:
+            await db.create_collection("status_checks", capped=True, size=size, max=max_docs)
+            return
+        except CollectionInvalid:
+            pass  # another worker created it since the listing; check it below
+        except OperationFailure as e:
+            if e.code != NAMESPACE_EXISTS:
+                raise
+    
+    options = await db.status_checks.options()
+    if not options.get("capped"):
+        # convertToCapped keeps the newest documents that fit in size
+        await db.command("convertToCapped", "status_checks", size=size)
+        logger.info("Converted status_checks to a capped collection")
+
+
 async def seed_database():
     """Seed the database with initial data"""
     
@@ -286,4 +403,7 @@ async def seed_database():
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    await driver_tracking.stop()
+    await loop_monitor.stop()
+    await tracing.stop()
     client.close()
@@ -0,0 +1,91 @@
+"""
+Background Work for Panaghia
+spawn() replaces bare asyncio.create_task for fire-and-forget side effects
+(emails, Zoho sync, analytics): tasks are kept referenced until they finish,
+failures are logged, and running counts per task name plus registered queue
+depths are exported on /metrics.
+"""
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Optional, Set
+
+from services import metrics, tracing
+
+logger = logging.getLogger(__name__)
+
+# Strong references: the event loop only keeps weak ones
+_tasks: Set[asyncio.Task] = set()
+_running: Dict[str, int] = {}
+_queues: Dict[str, Callable[[], int]] = {}
+
+tasks_total = metrics.register(metrics.Counter(
+    "background_tasks_total", "Finished background tasks by outcome", ("name", "outcome")
+))
+
+
+def _running_samples():
+    return {(name,): count for name, count in _running.items()}
+
+
+def _queue_samples():
+    samples = {}
+    for name, depth in _queues.items():
+        try:
+            samples[(name,)] = depth()
+        except Exception as e:
+            logger.error(f"Queue depth probe {name} failed: {e}")
+    return samples
+
+
+metrics.register(metrics.Gauge(
+    "background_tasks_running", "Background tasks in progress", ("name",), callback=_running_samples
+))
+metrics.register(metrics.Gauge(
+    "work_queue_depth", "Items waiting in in-process queues and buffers", ("queue",), callback=_queue_samples
+))
+
+
+def spawn(coro: Awaitable, name: Optional[str] = None) -> asyncio.Task:
+    """Run a coroutine in the background, tracked and with errors logged"""
+    name = name or getattr(coro, "__qualname__", "task")
+    task = asyncio.ensure_future(_detached(coro, name))
+    _tasks.add(task)
+    _running[name] = _running.get(name, 0) + 1
+    task.add_done_callback(lambda done: _finished(done, name))
+    return task
+
+
+async def _detached(coro: Awaitable, name: str):
+    # The task starts with a copy of the spawner's context: keep its trace (a
+    # child span) but not its request, so its queries are not billed to that route
+    metrics.request_scope.set(None)
+    return await tracing.run_in_span(coro, name)
+
+
+def _finished(task: asyncio.Task, name: str):
+    _tasks.discard(task)
+    _running[name] -= 1
+    if task.cancelled():
+        tasks_total.inc((name, "cancelled"))
+        return
+    error = task.exception()
+    if error:
+        tasks_total.inc((name, "error"))
+        logger.error(f"Background task {name} failed: {error!r}")
+    else:
+        tasks_total.inc((name, "ok"))
+
+
+def register_queue(name: str, depth: Callable[[], int]):
+    """Expose the current size of an in-process queue or buffer as work_queue_depth"""
+    _queues[name] = depth
+
+
+def running_count() -> int:
+    return len(_tasks)
+
+
+async def drain(timeout: Optional[float] = None):
+    """Wait for the background tasks running now (tests, graceful shutdown)"""
+    if _tasks:
+        await asyncio.wait(set(_tasks), timeout=timeout)
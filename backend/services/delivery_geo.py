@@ -0,0 +1,201 @@
+"""
+Delivery Geo Queries for Panaghia
+Delivery positions are stored twice on an order: the {lat, lng} dict the
+admin map reads and a GeoJSON point in "location" backed by a 2dsphere index.
+Nearby searches, zone membership and delivery fee zones all run as indexed
+$geoNear / $geoWithin / $geoIntersects queries.
+"""
+import os
+import logging
+from typing import Optional, Dict, Any, List
+
+from pymongo import UpdateOne
+
+from services.delivery_routing import get_restaurant_location
+
+logger = logging.getLogger(__name__)
+
+# Database reference (set from server.py)
+db = None
+
+def set_db(database):
+    global db
+    db = database
+
+
+BACKFILL_BATCH_SIZE = 500
+
+
+class ZoneNotFound(Exception):
+    pass
+
+
+def get_default_delivery_fee() -> float:
+    """Fee used while no delivery zones are configured"""
+    return float(os.environ.get('DEFAULT_DELIVERY_FEE', 10))
+
+
+def to_point(lat: float, lng: float) -> Dict[str, Any]:
+    """GeoJSON point (GeoJSON order is [lng, lat])"""
+    return {"type": "Point", "coordinates": [lng, lat]}
+
+
+def position_fields(lat: float, lng: float) -> Dict[str, Any]:
+    """Fields to $set on an order whenever its delivery position changes"""
+    return {"coordinates": {"lat": lat, "lng": lng}, "location": to_point(lat, lng)}
+
+
+def to_polygon(points: List[List[float]]) -> Dict[str, Any]:
+    """GeoJSON polygon from [[lat, lng], ...] (the ring is closed if needed)"""
+    ring = [[lng, lat] for lat, lng in points]
+    if ring[0] != ring[-1]:
+        ring.append(ring[0])
+    return {"type": "Polygon", "coordinates": [ring]}
+
+
+def from_polygon(polygon: Dict[str, Any]) -> List[List[float]]:
+    ring = polygon["coordinates"][0]
+    return [[lat, lng] for lng, lat in ring[:-1]]
+
+
+async def backfill_locations() -> int:
+    """Add GeoJSON points to orders that only have {lat, lng} coordinates"""
+    cursor = db.orders.find(
+        {"coordinates.lat": {"$ne": None}, "location": {"$exists": False}},
+        {"_id": 1, "coordinates": 1}
+    )
+    updates: List[UpdateOne] = []
+    updated = 0
+    async for order in cursor:
+        coordinates = order["coordinates"]
+        updates.append(UpdateOne(
+            {"_id": order["_id"]},
+            {"$set": {"location": to_point(coordinates["lat"], coordinates["lng"])}}
+        ))
+        if len(updates) >= BACKFILL_BATCH_SIZE:
+            updated += (await db.orders.bulk_write(updates, ordered=False)).modified_count
+            updates = []
+    if updates:
+        updated += (await db.orders.bulk_write(updates, ordered=False)).modified_count
+    if updated:
+        logger.info(f"Backfilled GeoJSON location on {updated} orders")
+    return updated
+
+
+# ============== ORDER QUERIES ==============
+
+ORDER_GEO_PROJECTION = {
+    "_id": 0,
+    "id": 1,
+    "order_number": 1,
+    "status": 1,
+    "total": 1,
+    "created_at": 1,
+    "customer.name": 1,
+    "customer.phone": 1,
+    "customer.address": 1,
+    "coordinates": 1
+}
+
+
+async def orders_near(
+    lat: float,
+    lng: float,
+    radius_m: Optional[float] = None,
+    statuses: Optional[List[str]] = None,
+    limit: int = 100
+) -> List[Dict[str, Any]]:
+    """Delivery orders sorted by distance from a point, with distance_m"""
+    query: Dict[str, Any] = {"order_type": "delivery"}
+    if statuses:
+        query["status"] = {"$in": statuses}
+
+    geo_near: Dict[str, Any] = {
+        "near": to_point(lat, lng),
+        "distanceField": "distance_m",
+        "spherical": True,
+        "key": "location",
+        "query": query
+    }
+    if radius_m is not None:
+        geo_near["maxDistance"] = radius_m
+
+    pipeline = [
+        {"$geoNear": geo_near},
+        {"$limit": limit},
+        {"$project": {**ORDER_GEO_PROJECTION, "distance_m": {"$round": ["$distance_m", 0]}}}
+    ]
+    return await db.orders.aggregate(pipeline).to_list(limit)
+
+
+async def pending_by_distance(limit: int = 100) -> List[Dict[str, Any]]:
+    """Pending delivery orders, closest to the restaurant first"""
+    restaurant = get_restaurant_location()
+    return await orders_near(restaurant["lat"], restaurant["lng"], statuses=["pending"], limit=limit)
+
+
+async def orders_in_zone(zone_id: str, statuses: Optional[List[str]] = None, limit: int = 100) -> List[Dict[str, Any]]:
+    """Delivery orders located inside a delivery zone polygon"""
+    zone = await db.delivery_zones.find_one({"id": zone_id}, {"_id": 0, "area": 1})
+    if not zone:
+        raise ZoneNotFound()
+
+    query: Dict[str, Any] = {
+        "order_type": "delivery",
+        "location": {"$geoWithin": {"$geometry": zone["area"]}}
+    }
+    if statuses:
+        query["status"] = {"$in": statuses}
+    return await db.orders.find(query, ORDER_GEO_PROJECTION).sort("created_at", -1).to_list(limit)
+
+
+# ============== DELIVERY ZONES ==============
+
+def _format_zone(zone: Dict[str, Any]) -> Dict[str, Any]:
+    zone = {key: value for key, value in zone.items() if key != "_id"}
+    zone["polygon"] = from_polygon(zone.pop("area"))
+    return zone
+
+
+async def list_zones() -> List[Dict[str, Any]]:
+    zones = await db.delivery_zones.find({}).sort("fee", 1).to_list(100)
+    return [_format_zone(zone) for zone in zones]
+
+
+async def save_zone(zone: Dict[str, Any]) -> Dict[str, Any]:
+    """Insert or replace a zone; zone["polygon"] is [[lat, lng], ...]"""
+    doc = {key: value for key, value in zone.items() if key != "polygon"}
+    doc["area"] = to_polygon(zone["polygon"])
+    await db.delivery_zones.replace_one({"id": doc["id"]}, doc, upsert=True)
+    return _format_zone(doc)
+
+
+async def delete_zone(zone_id: str):
+    result = await db.delivery_zones.delete_one({"id": zone_id})
+    if result.deleted_count == 0:
+        raise ZoneNotFound()
+
+
+async def find_zone(lat: float, lng: float) -> Optional[Dict[str, Any]]:
+    """Cheapest active zone containing the point (zones may overlap)"""
+    zones = await db.delivery_zones.find(
+        {"is_active": True, "area": {"$geoIntersects": {"$geometry": to_point(lat, lng)}}},
+        {"_id": 0, "area": 0}
+    ).sort("fee", 1).to_list(1)
+    return zones[0] if zones else None
+
+
+async def check_delivery(lat: float, lng: float) -> Dict[str, Any]:
+    """Can we deliver to this point, and for what fee"""
+    if not await db.delivery_zones.find_one({"is_active": True}, {"_id": 1}):
+        return {"deliverable": True, "zone": None, "fee": get_default_delivery_fee(), "min_order": 0}
+
+    zone = await find_zone(lat, lng)
+    if not zone:
+        return {"deliverable": False, "zone": None, "fee": None, "min_order": None}
+    return {
+        "deliverable": True,
+        "zone": {"id": zone["id"], "name": zone["name"]},
+        "fee": zone["fee"],
+        "min_order": zone.get("min_order", 0)
+    }
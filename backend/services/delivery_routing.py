@@ -0,0 +1,217 @@
+"""
+Delivery Route Planning for Panaghia
+Orders the active delivery stops into a short driving sequence:
+vectorized haversine distance matrix, nearest-neighbour start, 2-opt polish.
+Distances are great-circle metres (no road network), which is a good proxy
+inside Vatra Dornei.
+"""
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import List, Dict, Any
+
+import numpy as np
+
+EARTH_RADIUS_M = 6371000.0
+
+
+def get_restaurant_location() -> Dict[str, float]:
+    return {
+        "lat": float(os.environ.get('RESTAURANT_LAT', 47.3463)),
+        "lng": float(os.environ.get('RESTAURANT_LNG', 25.3550))
+    }
+
+
+def distance_matrix(points: np.ndarray) -> np.ndarray:
+    """Pairwise haversine distances (metres) for an (n, 2) array of lat/lng degrees"""
+    radians = np.radians(points)
+    lat = radians[:, 0][:, None]
+    lng = radians[:, 1][:, None]
+    dlat = lat - lat.T
+    dlng = lng - lng.T
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat) * np.cos(lat.T) * np.sin(dlng / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def nearest_neighbour_route(dist: np.ndarray) -> np.ndarray:
+    """Closed route starting and ending at node 0, always visiting the closest unvisited node"""
+    n = len(dist)
+    route = [0]
+    unvisited = np.ones(n, dtype=bool)
+    unvisited[0] = False
+    for _ in range(n - 1):
+        candidates = np.where(unvisited, dist[route[-1]], np.inf)
+        nxt = int(np.argmin(candidates))
+        route.append(nxt)
+        unvisited[nxt] = False
+    route.append(0)
+    return np.array(route)
+
+
+def two_opt(route: np.ndarray, dist: np.ndarray, max_passes: int = 50) -> np.ndarray:
+    """Reverse segments while that shortens the closed route (all j evaluated at once per i)"""
+    route = route.copy()
+    last = len(route) - 1
+    for _ in range(max_passes):
+        improved = False
+        for i in range(1, last - 1):
+            a, b = route[i - 1], route[i]
+            js = np.arange(i + 1, last)
+            c, d = route[js], route[js + 1]
+            delta = dist[a, c] + dist[b, d] - dist[a, b] - dist[c, d]
+            best = int(np.argmin(delta))
+            if delta[best] < -1e-6:
+                j = js[best]
+                route[i:j + 1] = route[i:j + 1][::-1]
+                improved = True
+        if not improved:
+            break
+    return route
+
+
+def plan_route(stops: List[Dict[str, Any]], return_to_restaurant: bool = True) -> Dict[str, Any]:
+    """
+    Order stops (dicts with a "coordinates" {lat, lng} entry) into a route
+    from the restaurant. Stops without coordinates are returned as unrouted.
+    """
+    started = time.perf_counter()
+    restaurant = get_restaurant_location()
+
+    routable = [stop for stop in stops if _has_coordinates(stop)]
+    unrouted = [stop for stop in stops if not _has_coordinates(stop)]
+
+    ordered: List[Dict[str, Any]] = []
+    total = 0.0
+    if routable:
+        points = np.array(
+            [[restaurant["lat"], restaurant["lng"]]]
+            + [[stop["coordinates"]["lat"], stop["coordinates"]["lng"]] for stop in routable],
+            dtype=float
+        )
+        dist = distance_matrix(points)
+        if not return_to_restaurant:
+            # Free return leg: the closed-route solver then optimises an open path
+            dist[:, 0] = 0.0
+        route = two_opt(nearest_neighbour_route(dist), dist)
+
+        for previous, node in zip(route[:-2], route[1:-1]):
+            leg = float(dist[previous, node])
+            total += leg
+            ordered.append({
+                **routable[node - 1],
+                "sequence": len(ordered) + 1,
+                "leg_distance_m": round(leg),
+                "cumulative_distance_m": round(total)
+            })
+        if return_to_restaurant:
+            total += float(dist[route[-2], 0])
+
+    return {
+        "restaurant": restaurant,
+        "stops": ordered,
+        "unrouted": unrouted,
+        "total_distance_m": round(total),
+        "return_to_restaurant": return_to_restaurant,
+        "computed_ms": round((time.perf_counter() - started) * 1000, 2)
+    }
+
+
+def _has_coordinates(stop: Dict[str, Any]) -> bool:
+    coordinates = stop.get("coordinates") or {}
+    return coordinates.get("lat") is not None and coordinates.get("lng") is not None
+
+
+# ============== BATCHING ==============
+
+def get_prep_estimate_minutes() -> int:
+    """Expected kitchen time used when an order is not ready yet"""
+    return int(os.environ.get('PREP_ESTIMATE_MINUTES', 20))
+
+
+def estimate_ready_at(stop: Dict[str, Any]) -> datetime:
+    """When the order is (or should be) ready to leave the kitchen"""
+    history = {entry.get("status"): entry.get("at") for entry in stop.get("status_history", [])}
+    if history.get("ready"):
+        return datetime.fromisoformat(history["ready"])
+    started = history.get("preparing") or history.get("confirmed") or stop.get("created_at")
+    started_at = datetime.fromisoformat(started) if started else datetime.now(timezone.utc)
+    return started_at + timedelta(minutes=get_prep_estimate_minutes())
+
+
+def plan_batches(
+    stops: List[Dict[str, Any]],
+    drivers: int,
+    capacity: int,
+    window_minutes: int,
+    max_spread_m: float = 1500
+) -> Dict[str, Any]:
+    """
+    Group stops into driver runs by ready-time window and proximity.
+
+    Stops are swept in ready-time order into windows of window_minutes. Within
+    a window, each run is seeded with the stop farthest from the restaurant and
+    grows with the closest remaining stop (to any stop already in the run)
+    while it is within max_spread_m and the run has capacity. Runs are routed
+    with plan_route and handed to drivers round-robin in departure order.
+    """
+    started = time.perf_counter()
+    restaurant = get_restaurant_location()
+
+    routable = [stop for stop in stops if _has_coordinates(stop)]
+    unrouted = [stop for stop in stops if not _has_coordinates(stop)]
+    if not routable:
+        return {"batches": [], "unrouted": unrouted, "computed_ms": 0.0}
+
+    points = np.array(
+        [[restaurant["lat"], restaurant["lng"]]]
+        + [[stop["coordinates"]["lat"], stop["coordinates"]["lng"]] for stop in routable],
+        dtype=float
+    )
+    full = distance_matrix(points)
+    dist, from_restaurant = full[1:, 1:], full[0, 1:]
+    ready_at = [estimate_ready_at(stop) for stop in routable]
+    by_ready = sorted(range(len(routable)), key=lambda index: ready_at[index])
+
+    groups: List[List[int]] = []
+    window: List[int] = []
+    for index in by_ready:
+        if window and ready_at[index] - ready_at[window[0]] > timedelta(minutes=window_minutes):
+            groups.append(window)
+            window = []
+        window.append(index)
+    groups.append(window)
+
+    batches = []
+    for group in groups:
+        remaining = np.zeros(len(routable), dtype=bool)
+        remaining[group] = True
+        while remaining.any():
+            seed = int(np.argmax(np.where(remaining, from_restaurant, -np.inf)))
+            members = [seed]
+            remaining[seed] = False
+            while len(members) < capacity and remaining.any():
+                closest = np.where(remaining[None, :], dist[members], np.inf).min(axis=0)
+                candidate = int(np.argmin(closest))
+                if closest[candidate] > max_spread_m:
+                    break
+                members.append(candidate)
+                remaining[candidate] = False
+            batches.append(members)
+
+    planned = []
+    for members in sorted(batches, key=lambda members: max(ready_at[index] for index in members)):
+        route = plan_route([routable[index] for index in members])
+        planned.append({
+            "batch": len(planned) + 1,
+            "driver": len(planned) % drivers + 1,
+            "depart_at": max(ready_at[index] for index in members).isoformat(),
+            "order_count": len(members),
+            "total_distance_m": route["total_distance_m"],
+            "stops": route["stops"]
+        })
+
+    return {
+        "batches": planned,
+        "unrouted": unrouted,
+        "computed_ms": round((time.perf_counter() - started) * 1000, 2)
+    }
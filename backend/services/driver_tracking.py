@@ -0,0 +1,205 @@
+"""
+Driver Location Tracking for Panaghia
+Drivers' phones ping every few seconds. Each ping only touches memory: the
+latest position per driver is replaced and pushed to admin map subscribers,
+and the ping is buffered. A background task flushes the buffer to the
+TTL-indexed driver_locations collection in one bulk_write per interval.
+"""
+import os
+import json
+import asyncio
+import logging
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, List, Optional, Set
+
+from pymongo import InsertOne
+
+from services import background
+
+logger = logging.getLogger(__name__)
+
+# Database reference (set from server.py)
+db = None
+
+def set_db(database):
+    global db
+    db = database
+
+
+SUBSCRIBER_QUEUE_SIZE = 200
+# Pings kept while MongoDB is unreachable; the oldest are dropped beyond this
+MAX_BUFFERED_PINGS = 50000
+
+# Latest position per driver and pings waiting to be written (this worker only)
+_latest: Dict[str, Dict[str, Any]] = {}
+_buffer: deque = deque(maxlen=MAX_BUFFERED_PINGS)
+_subscribers: Set[asyncio.Queue] = set()
+_flush_task: Optional[asyncio.Task] = None
+
+background.register_queue("driver_location_buffer", lambda: len(_buffer))
+background.register_queue("driver_map_events", lambda: sum(queue.qsize() for queue in _subscribers))
+
+
+def get_flush_interval_seconds() -> float:
+    return float(os.environ.get('DRIVER_LOCATION_FLUSH_SECONDS', 5))
+
+
+def get_location_ttl_hours() -> int:
+    return int(os.environ.get('DRIVER_LOCATION_TTL_HOURS', 48))
+
+
+def get_stale_after_minutes() -> int:
+    """Drivers silent for longer are shown as offline"""
+    return int(os.environ.get('DRIVER_STALE_MINUTES', 5))
+
+
+def record_ping(driver_id: str, name: str, ping: Dict[str, Any]) -> Dict[str, Any]:
+    """Accept one ping: update the latest position, buffer it, notify the map"""
+    received_at = datetime.now(timezone.utc)
+    recorded_at = ping.get("recorded_at") or received_at
+    if recorded_at.tzinfo is None:
+        recorded_at = recorded_at.replace(tzinfo=timezone.utc)
+    # Phone clocks drift: a ping cannot be newer than its arrival
+    recorded_at = min(recorded_at, received_at)
+    position = {
+        "driver_id": driver_id,
+        "name": name,
+        "lat": ping["lat"],
+        "lng": ping["lng"],
+        "accuracy_m": ping.get("accuracy_m"),
+        "heading": ping.get("heading"),
+        "speed_mps": ping.get("speed_mps"),
+        "recorded_at": recorded_at,
+        "received_at": received_at
+    }
+    _buffer.append(position)
+
+    # Phones resend queued pings after a signal drop: never move a driver backwards
+    current = _latest.get(driver_id)
+    if current and current["recorded_at"] > recorded_at:
+        return _format(current)
+
+    _latest[driver_id] = position
+    formatted = _format(position)
+    publish({"type": "position", "driver": formatted})
+    return formatted
+
+
+def _format(position: Dict[str, Any]) -> Dict[str, Any]:
+    stale_before = datetime.now(timezone.utc) - timedelta(minutes=get_stale_after_minutes())
+    return {
+        **position,
+        "recorded_at": position["recorded_at"].isoformat(),
+        "received_at": position["received_at"].isoformat(),
+        "online": position["received_at"] >= stale_before
+    }
+
+
+def get_positions() -> List[Dict[str, Any]]:
+    """Latest known position of every driver seen by this worker"""
+    return [_format(position) for position in sorted(_latest.values(), key=lambda p: p["name"])]
+
+
+def buffered_count() -> int:
+    return len(_buffer)
+
+
+async def get_track(driver_id: str, minutes: int, limit: int = 2000) -> List[Dict[str, Any]]:
+    """Stored pings of one driver over the last N minutes (oldest first)"""
+    since = datetime.now(timezone.utc) - timedelta(minutes=minutes)
+    pings = await db.driver_locations.find(
+        {"driver_id": driver_id, "recorded_at": {"$gte": since}},
+        {"_id": 0, "lat": 1, "lng": 1, "recorded_at": 1, "speed_mps": 1}
+    ).sort("recorded_at", 1).to_list(limit)
+    for ping in pings:
+        # The client is not tz_aware: stored datetimes come back naive UTC
+        ping["recorded_at"] = ping["recorded_at"].replace(tzinfo=timezone.utc).isoformat()
+    return pings
+
+
+# ============== BATCH WRITES ==============
+
+async def flush() -> int:
+    """Write all buffered pings in one unordered bulk_write"""
+    if not _buffer:
+        return 0
+
+    batch = list(_buffer)
+    _buffer.clear()
+    try:
+        await db.driver_locations.bulk_write([InsertOne(dict(ping)) for ping in batch], ordered=False)
+    except Exception as e:
+        logger.error(f"Failed to flush {len(batch)} driver locations: {e}")
+        # Put them back in front of pings that arrived meanwhile; past maxlen the oldest go
+        arrived = list(_buffer)
+        _buffer.clear()
+        _buffer.extend(batch)
+        _buffer.extend(arrived)
+        return 0
+    return len(batch)
+
+
+async def _flush_loop():
+    interval = get_flush_interval_seconds()
+    while True:
+        await asyncio.sleep(interval)
+        await flush()
+
+
+def start():
+    global _flush_task
+    if _flush_task is None or _flush_task.done():
+        _flush_task = asyncio.create_task(_flush_loop())
+
+
+async def stop():
+    """Stop the background flusher and write whatever is still buffered"""
+    global _flush_task
+    if _flush_task:
+        _flush_task.cancel()
+        try:
+            await _flush_task
+        except asyncio.CancelledError:
+            pass
+        _flush_task = None
+    await flush()
+
+
+# ============== ADMIN MAP PUSH ==============
+
+def subscribe() -> asyncio.Queue:
+    queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+    _subscribers.add(queue)
+    return queue
+
+
+def unsubscribe(queue: asyncio.Queue):
+    _subscribers.discard(queue)
+
+
+def publish(event: Dict[str, Any]):
+    for queue in list(_subscribers):
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Map is not keeping up: tell it to reload all positions
+            queue.get_nowait()
+            queue.put_nowait({"type": "resync"})
+
+
+async def event_stream(queue: asyncio.Queue, heartbeat_seconds: float = 15):
+    """Server-sent events: all positions first, then each new position"""
+    try:
+        yield f"data: {json.dumps({'type': 'snapshot', 'drivers': get_positions()})}\n\n"
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=heartbeat_seconds)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            if event.get("type") == "resync":
+                event = {"type": "snapshot", "drivers": get_positions()}
+            yield f"data: {json.dumps(event)}\n\n"
+    finally:
+        unsubscribe(queue)
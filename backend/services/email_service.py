@@ -9,6 +9,8 @@ import resend
 from typing import Optional
 from datetime import datetime, timezone
 
+from services import tracing
+
 logger = logging.getLogger(__name__)
 
 # Resend configuration
@@ -19,6 +21,9 @@ FROM_EMAIL = "comenzi@panaghiaautoservirevatradornei.ro"  # Verified domain
 # Initialize Resend
 if RESEND_API_KEY:
     resend.api_key = RESEND_API_KEY
+# Local stand-in instead of api.resend.com (benchmarks/provider_servers.py)
+if os.environ.get('RESEND_API_URL'):
+    resend.api_url = os.environ['RESEND_API_URL']
 
 
 async def send_new_order_notification(order: dict) -> bool:
@@ -141,7 +146,8 @@ async def send_new_order_notification(order: dict) -> bool:
         }
         
         # Send email (run sync SDK in thread to keep FastAPI non-blocking)
-        email = await asyncio.to_thread(resend.Emails.send, params)
+        with tracing.span("resend POST /emails", tracing.KIND_CLIENT, {"peer.service": "resend"}):
+            email = await asyncio.to_thread(resend.Emails.send, params)
         
         logger.info(f"Email notification sent for order {order.get('order_number')}, email_id: {email.get('id')}")
         return True
@@ -217,7 +223,8 @@ async def send_order_status_update(order: dict, new_status: str) -> bool:
             "html": html_content
         }
         
-        await asyncio.to_thread(resend.Emails.send, params)
+        with tracing.span("resend POST /emails", tracing.KIND_CLIENT, {"peer.service": "resend"}):
+            await asyncio.to_thread(resend.Emails.send, params)
         logger.info(f"Status update email sent for order {order.get('order_number')}")
         return True
         
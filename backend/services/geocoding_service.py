@@ -0,0 +1,165 @@
+"""
+Geocoding Service for Panaghia
+Resolves delivery addresses to coordinates on the server:
+1. normalized-address cache in MongoDB (positions confirmed on the delivery map)
+2. local Vatra Dornei street gazetteer (street centroids, data/vatra_dornei_streets.json)
+"""
+import re
+import json
+import logging
+import unicodedata
+from datetime import datetime, timezone
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional, Dict, Any, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Database reference (set from server.py)
+db = None
+
+def set_db(database):
+    global db
+    db = database
+
+
+GAZETTEER_PATH = Path(__file__).parent.parent / 'data' / 'vatra_dornei_streets.json'
+
+# Abbreviation -> canonical token
+TOKEN_ALIASES = {
+    "str": "strada", "st": "strada", "strada": "strada",
+    "cal": "calea", "calea": "calea",
+    "bd": "bulevardul", "bdul": "bulevardul", "blvd": "bulevardul", "bulevardul": "bulevardul",
+    "al": "aleea", "aleea": "aleea",
+    "p-ta": "piata", "pta": "piata", "piata": "piata",
+    "nr": "nr", "numarul": "nr", "no": "nr",
+    "bl": "bloc", "bloc": "bloc",
+    "sc": "scara", "scara": "scara",
+    "et": "etaj", "etaj": "etaj",
+    "ap": "ap", "apartament": "ap",
+}
+STREET_TYPES = {"strada", "calea", "bulevardul", "aleea", "piata"}
+UNIT_TOKENS = {"bloc", "scara", "etaj", "ap"}
+
+# Town / county / country tokens that carry no street information
+NOISE_PATTERNS = [
+    r"\bvatra dornei\b", r"\bjud(etul)?\.?\s+suceava\b", r"\bsuceava\b", r"\bromania\b", r"\b725700\b"
+]
+
+
+def strip_diacritics(text: str) -> str:
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def normalize_address(address: str) -> str:
+    """Canonical form used as cache key, e.g. 'Str. Dornelor nr.10, Vatra Dornei' -> 'strada dornelor nr 10'"""
+    text = strip_diacritics(address or "").lower()
+    for pattern in NOISE_PATTERNS:
+        text = re.sub(pattern, " ", text)
+    # Split "nr.10" / "str.Dornelor" and drop punctuation (keep hyphens inside words)
+    text = re.sub(r"[^\w\s-]", " ", text)
+    text = re.sub(r"(?<=[a-z])(?=\d)|(?<=\d)(?=[a-z]{2,})", " ", text)
+    tokens = [TOKEN_ALIASES.get(token, token) for token in text.split()]
+    return " ".join(tokens)
+
+
+def split_street(normalized: str) -> Tuple[str, Optional[str]]:
+    """Street part and house number of a normalized address"""
+    tokens = normalized.split()
+    street, number = [], None
+    for index, token in enumerate(tokens):
+        if token == "nr":
+            if index + 1 < len(tokens):
+                number = tokens[index + 1]
+            break
+        if token in UNIT_TOKENS:
+            break
+        # A bare number after the street name is the house number ("strada dornelor 10")
+        if token.isdigit() and street and street[-1] not in STREET_TYPES:
+            number = token
+            break
+        street.append(token)
+    return " ".join(street), number
+
+
+def cache_key(normalized: str) -> str:
+    """Building-level key: street and house number, without block/apartment details"""
+    street, number = split_street(normalized)
+    return f"{street} nr {number}" if number else street
+
+
+@lru_cache(maxsize=1)
+def load_gazetteer() -> Dict[str, Tuple[float, float]]:
+    """Street name -> (lat, lng); indexed with and without the street type"""
+    try:
+        data = json.loads(GAZETTEER_PATH.read_text(encoding="utf-8"))
+    except (OSError, ValueError) as e:
+        logger.error(f"Could not load street gazetteer {GAZETTEER_PATH}: {e}")
+        return {}
+
+    index: Dict[str, Tuple[float, float]] = {}
+    for name, (lat, lng) in data.get("streets", {}).items():
+        key = normalize_address(name)
+        index[key] = (lat, lng)
+        street_type, _, bare = key.partition(" ")
+        if street_type in STREET_TYPES and bare:
+            index.setdefault(bare, (lat, lng))
+    return index
+
+
+def lookup_gazetteer(normalized: str) -> Optional[Dict[str, Any]]:
+    street, _ = split_street(normalized)
+    gazetteer = load_gazetteer()
+    position = gazetteer.get(street)
+    if not position:
+        street_type, _, bare = street.partition(" ")
+        position = gazetteer.get(bare) if street_type in STREET_TYPES else None
+    if not position:
+        return None
+    return {"lat": position[0], "lng": position[1], "source": "gazetteer", "precision": "street"}
+
+
+async def geocode(address: Optional[str]) -> Optional[Dict[str, Any]]:
+    """
+    Coordinates for a delivery address, or None when it cannot be resolved.
+    Costs at most one indexed read; the gazetteer is in memory.
+    """
+    if not address:
+        return None
+    normalized = normalize_address(address)
+    if not normalized:
+        return None
+
+    try:
+        cached = await db.geocode_cache.find_one({"_id": cache_key(normalized)})
+    except Exception as e:
+        logger.error(f"Geocode cache lookup failed: {e}")
+        cached = None
+    if cached:
+        return {"lat": cached["lat"], "lng": cached["lng"], "source": "cache", "precision": cached.get("precision", "address")}
+
+    return lookup_gazetteer(normalized)
+
+
+async def remember(address: Optional[str], lat: float, lng: float, precision: str = "address"):
+    """Store confirmed coordinates for an address so repeats skip geocoding"""
+    if not address:
+        return
+    normalized = normalize_address(address)
+    if not normalized:
+        return
+    await db.geocode_cache.update_one(
+        {"_id": cache_key(normalized)},
+        {
+            "$set": {
+                "lat": lat,
+                "lng": lng,
+                "precision": precision,
+                "address": address,
+                "updated_at": datetime.now(timezone.utc).isoformat()
+            },
+            "$inc": {"confirmations": 1}
+        },
+        upsert=True
+    )
@@ -0,0 +1,120 @@
+"""
+Idempotency Service for Panaghia
+Remembers the response of POST requests sent with an Idempotency-Key header
+so that client retries replay the stored result instead of repeating side effects
+"""
+import os
+import json
+import hashlib
+import logging
+from datetime import datetime, timezone
+from typing import Optional, Dict, Any
+
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+# Database reference (set from server.py)
+db = None
+
+def set_db(database):
+    global db
+    db = database
+
+
+MAX_KEY_LENGTH = 255
+COMPLETE_ATTEMPTS = 3
+
+
+def get_idempotency_ttl_hours() -> int:
+    return int(os.environ.get('IDEMPOTENCY_TTL_HOURS', 24))
+
+
+class IdempotencyKeyMismatch(Exception):
+    """The key was already used for a request with a different payload."""
+
+
+class IdempotencyKeyInProgress(Exception):
+    """The original request for this key has not finished yet."""
+
+
+def hash_request(payload: Any) -> str:
+    """Stable SHA-256 of a JSON-compatible payload (key order independent)."""
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _record_id(scope: str, key: str) -> str:
+    return f"{scope}:{key}"
+
+
+def _replay(record: Dict[str, Any], request_hash: str) -> Dict[str, Any]:
+    if record.get("request_hash") != request_hash:
+        raise IdempotencyKeyMismatch()
+    if record.get("status") != "completed":
+        raise IdempotencyKeyInProgress()
+    return record["response"]
+
+
+async def begin(scope: str, key: str, request_hash: str) -> Optional[Dict[str, Any]]:
+    """
+    Reserve an idempotency key before processing a request.
+
+    Returns the stored response when the key was already completed, or None
+    when the caller owns the key and should process the request.
+    """
+    record_id = _record_id(scope, key)
+
+    # Retries are answered by a single lookup on the _id index
+    record = await db.idempotency_keys.find_one({"_id": record_id})
+    if record:
+        return _replay(record, request_hash)
+
+    try:
+        await db.idempotency_keys.insert_one({
+            "_id": record_id,
+            "request_hash": request_hash,
+            "status": "in_progress",
+            "created_at": datetime.now(timezone.utc)
+        })
+    except DuplicateKeyError:
+        # A concurrent retry reserved the key between our read and insert
+        record = await db.idempotency_keys.find_one({"_id": record_id})
+        if not record:
+            raise IdempotencyKeyInProgress()
+        return _replay(record, request_hash)
+
+    return None
+
+
+async def complete(scope: str, key: str, response: Dict[str, Any]):
+    """
+    Store the response for a reserved key so retries can replay it.
+    Tried COMPLETE_ATTEMPTS times: until it lands, retries of an already
+    processed request get IdempotencyKeyInProgress.
+    """
+    for attempt in range(1, COMPLETE_ATTEMPTS + 1):
+        try:
+            await db.idempotency_keys.update_one(
+                {"_id": _record_id(scope, key)},
+                {
+                    "$set": {
+                        "status": "completed",
+                        "response": response,
+                        "completed_at": datetime.now(timezone.utc)
+                    }
+                }
+            )
+            return
+        except Exception as e:
+            if attempt == COMPLETE_ATTEMPTS:
+                raise
+            logger.warning(f"Storing the response for idempotency key {key} failed (attempt {attempt}): {e}")
+
+
+async def release(scope: str, key: str):
+    """Drop a reservation after a failed request so the client can retry."""
+    try:
+        await db.idempotency_keys.delete_one({"_id": _record_id(scope, key), "status": "in_progress"})
+    except Exception as e:
+        logger.error(f"Failed to release idempotency key {key}: {e}")
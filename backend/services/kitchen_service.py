@@ -0,0 +1,187 @@
+"""
+Kitchen Prep List for Panaghia
+Running totals of portions to cook across active orders (confirmed/preparing).
+Totals are adjusted with $inc whenever an order enters or leaves the active
+set, and every change is pushed to connected kitchen displays. Each $inc also
+bumps the total's "seq", so a recovery rebuild can tell which totals changed
+while it was counting.
+"""
+import json
+import asyncio
+import logging
+from typing import Dict, Any, List, Optional, Set
+
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from services import background
+
+logger = logging.getLogger(__name__)
+
+# Database reference (set from server.py)
+db = None
+
+def set_db(database):
+    global db
+    db = database
+
+
+ACTIVE_STATUSES = {"confirmed", "preparing"}
+REBUILD_ATTEMPTS = 5
+SUBSCRIBER_QUEUE_SIZE = 100
+
+# Queues of connected kitchen displays (this worker only)
+_subscribers: Set[asyncio.Queue] = set()
+
+background.register_queue("kitchen_display_events", lambda: sum(queue.qsize() for queue in _subscribers))
+
+
+def _item_key(item: Dict[str, Any]) -> str:
+    return item.get("menu_item_id") or item.get("name", "?")
+
+
+def _item_deltas(order: Dict[str, Any], sign: int) -> Dict[str, Dict[str, Any]]:
+    deltas: Dict[str, Dict[str, Any]] = {}
+    for item in order.get("items", []):
+        entry = deltas.setdefault(_item_key(item), {"name": item.get("name"), "delta": 0})
+        entry["delta"] += sign * item.get("quantity", 1)
+    return deltas
+
+
+async def apply_status_change(order: Dict[str, Any], old_status: Optional[str], new_status: str):
+    """Adjust totals when an order enters or leaves the active set (one bulk write)"""
+    was_active = old_status in ACTIVE_STATUSES
+    is_active = new_status in ACTIVE_STATUSES
+    if was_active == is_active:
+        return
+
+    deltas = _item_deltas(order, 1 if is_active else -1)
+    if not deltas:
+        return
+
+    try:
+        await db.kitchen_prep_totals.bulk_write([
+            UpdateOne(
+                {"_id": key},
+                {"$inc": {"quantity": entry["delta"], "seq": 1}, "$set": {"name": entry["name"]}},
+                upsert=True
+            )
+            for key, entry in deltas.items()
+        ], ordered=False)
+    except Exception as e:
+        logger.error(f"Failed to update kitchen prep list for order {order.get('order_number')}: {e}")
+        return
+
+    publish({
+        "type": "delta",
+        "order_number": order.get("order_number"),
+        "status": new_status,
+        "items": [{"menu_item_id": key, **entry} for key, entry in deltas.items()]
+    })
+
+
+async def get_prep_list() -> List[Dict[str, Any]]:
+    """Portions still to prepare, per menu item"""
+    totals = await db.kitchen_prep_totals.find({"quantity": {"$gt": 0}}).sort("name", 1).to_list(None)
+    return [{"menu_item_id": doc["_id"], "name": doc.get("name"), "quantity": doc["quantity"]} for doc in totals]
+
+
+async def rebuild() -> List[Dict[str, Any]]:
+    """Recompute totals from active orders (recovery only; counted in Python, no $unwind)
+
+    Each total is written only if its seq is unchanged since before the scan.
+    A total that apply_status_change moved in the meantime may be missing
+    that change from the scan, so it is counted again on the next attempt
+    instead of being overwritten.
+    """
+    pending: Optional[Set[str]] = None  # None: every key
+    for attempt in range(REBUILD_ATTEMPTS):
+        seq_filter = {} if pending is None else {"_id": {"$in": list(pending)}}
+        # Totals written before seq existed have none: matched as seq None
+        seqs = {doc["_id"]: doc.get("seq") async for doc in db.kitchen_prep_totals.find(seq_filter, {"seq": 1})}
+        totals = await _count_active_items()
+        keys = set(seqs) | set(totals) if pending is None else pending
+        pending = {
+            key for key in keys
+            if not await _write_total(key, key in seqs, seqs.get(key), totals.get(key))
+        }
+        if not pending:
+            break
+    else:
+        logger.warning(f"Kitchen totals kept changing during rebuild, left as maintained live: {sorted(pending)}")
+
+    prep_list = await get_prep_list()
+    publish({"type": "snapshot", "items": prep_list})
+    return prep_list
+
+
+async def _count_active_items() -> Dict[str, Dict[str, Any]]:
+    totals: Dict[str, Dict[str, Any]] = {}
+    cursor = db.orders.find({"status": {"$in": list(ACTIVE_STATUSES)}}, {"_id": 0, "items": 1})
+    async for order in cursor:
+        for key, entry in _item_deltas(order, 1).items():
+            total = totals.setdefault(key, {"name": entry["name"], "quantity": 0})
+            total["quantity"] += entry["delta"]
+    return totals
+
+
+async def _write_total(key: str, existed: bool, seq: Optional[int], total: Optional[Dict[str, Any]]) -> bool:
+    """Set (or remove) one total if it is unchanged since its seq was read; False on a conflict"""
+    if total is None:
+        if not existed:
+            return True
+        result = await db.kitchen_prep_totals.delete_one({"_id": key, "seq": seq})
+        return result.deleted_count == 1
+    try:
+        result = await db.kitchen_prep_totals.update_one(
+            {"_id": key, "seq": seq if existed else {"$exists": False}},
+            {"$set": {"name": total["name"], "quantity": total["quantity"]}, "$inc": {"seq": 1}},
+            upsert=not existed
+        )
+    except DuplicateKeyError:
+        # Created by apply_status_change since the seqs were read
+        return False
+    return not existed or result.matched_count == 1
+
+
+# ============== KITCHEN DISPLAY PUSH ==============
+
+def subscribe() -> asyncio.Queue:
+    queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+    _subscribers.add(queue)
+    return queue
+
+
+def unsubscribe(queue: asyncio.Queue):
+    _subscribers.discard(queue)
+
+
+def subscriber_count() -> int:
+    return len(_subscribers)
+
+
+def publish(event: Dict[str, Any]):
+    for queue in list(_subscribers):
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Display is not keeping up: tell it to reload the full list
+            queue.get_nowait()
+            queue.put_nowait({"type": "resync"})
+
+
+async def event_stream(queue: asyncio.Queue, heartbeat_seconds: float = 15):
+    """Server-sent events: a snapshot first, then deltas as they happen"""
+    try:
+        yield f"data: {json.dumps({'type': 'snapshot', 'items': await get_prep_list()})}\n\n"
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=heartbeat_seconds)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            if event.get("type") == "resync":
+                event = {"type": "snapshot", "items": await get_prep_list()}
+            yield f"data: {json.dumps(event)}\n\n"
+    finally:
+        unsubscribe(queue)
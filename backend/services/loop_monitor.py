@@ -0,0 +1,132 @@
+"""
+Event Loop Monitor for Panaghia
+Measures event-loop lag continuously: a task sleeps for a fixed interval
+and records how late it wakes up. In debug mode (LOOP_MONITOR_DEBUG=1)
+asyncio's slow-callback warnings are switched on and a watchdog thread
+captures the loop thread's stack whenever a single callback blocks it for
+longer than LOOP_BLOCK_THRESHOLD_MS, so the blocking code is named in logs.
+"""
+import os
+import sys
+import time
+import asyncio
+import logging
+import threading
+import traceback
+from collections import deque
+from typing import Dict, Any, Optional
+
+from services import metrics
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_INTERVAL_SECONDS = 0.5
+RECENT_BLOCKS_LIMIT = 20
+
+loop_lag = metrics.register(metrics.Histogram(
+    "event_loop_lag_seconds", "How late the event loop woke a sleeping task",
+    buckets=[0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5]
+))
+loop_blocked = metrics.register(metrics.Counter(
+    "event_loop_blocked_total", "Callbacks that blocked the loop past the threshold (debug mode)"
+))
+
+_state: Dict[str, Any] = {"last_lag": 0.0, "max_lag": 0.0, "heartbeat": time.monotonic()}
+_recent_blocks: deque = deque(maxlen=RECENT_BLOCKS_LIMIT)
+_task: Optional[asyncio.Task] = None
+_watchdog: Optional[threading.Thread] = None
+_stop_watchdog = threading.Event()
+
+
+def is_debug_mode() -> bool:
+    return os.environ.get('LOOP_MONITOR_DEBUG', '').lower() in ('1', 'true', 'yes')
+
+
+def get_block_threshold_seconds() -> float:
+    return float(os.environ.get('LOOP_BLOCK_THRESHOLD_MS', 100)) / 1000
+
+
+def get_lag_warning_seconds() -> float:
+    return float(os.environ.get('LOOP_LAG_WARN_MS', 250)) / 1000
+
+
+async def _measure_lag():
+    loop = asyncio.get_running_loop()
+    warn_after = get_lag_warning_seconds()
+    while True:
+        expected = loop.time() + SAMPLE_INTERVAL_SECONDS
+        await asyncio.sleep(SAMPLE_INTERVAL_SECONDS)
+        lag = max(0.0, loop.time() - expected)
+        _state["heartbeat"] = time.monotonic()
+        _state["last_lag"] = lag
+        _state["max_lag"] = max(_state["max_lag"], lag)
+        loop_lag.observe((), lag)
+        if lag >= warn_after:
+            logger.warning(f"Event loop lag {lag * 1000:.0f} ms")
+
+
+def _watch(loop_thread_id: int, threshold: float):
+    """Runs in its own thread: notices a stalled loop and records what it is executing"""
+    reported_heartbeat = None
+    while not _stop_watchdog.wait(threshold / 2):
+        heartbeat = _state["heartbeat"]
+        stalled = time.monotonic() - heartbeat - SAMPLE_INTERVAL_SECONDS
+        if stalled < threshold or heartbeat == reported_heartbeat:
+            continue
+        frame = sys._current_frames().get(loop_thread_id)
+        if frame is None:
+            continue
+        # One report per stall
+        reported_heartbeat = heartbeat
+        stack = "".join(traceback.format_stack(frame))
+        loop_blocked.inc()
+        _recent_blocks.append({"at": time.time(), "blocked_ms": round(stalled * 1000), "stack": stack})
+        logger.warning(f"Event loop blocked for {stalled * 1000:.0f} ms+, loop thread stack:\n{stack}")
+
+
+def start():
+    """Start lag sampling (and the debug watchdog) on the running loop"""
+    global _task, _watchdog
+    loop = asyncio.get_running_loop()
+    if _task is None or _task.done():
+        _state["heartbeat"] = time.monotonic()
+        _task = loop.create_task(_measure_lag())
+
+    if is_debug_mode() and _watchdog is None:
+        threshold = get_block_threshold_seconds()
+        # asyncio logs "Executing <Handle ...> took X seconds" for slow callbacks
+        loop.set_debug(True)
+        loop.slow_callback_duration = threshold
+        _stop_watchdog.clear()
+        _watchdog = threading.Thread(
+            target=_watch, args=(threading.get_ident(), threshold), name="loop-watchdog", daemon=True
+        )
+        _watchdog.start()
+        logger.info(f"Event loop debug monitoring on (threshold {threshold * 1000:.0f} ms)")
+
+
+async def stop():
+    global _task, _watchdog
+    if _task:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
+    if _watchdog:
+        _stop_watchdog.set()
+        _watchdog.join(timeout=1)
+        _watchdog = None
+
+
+def get_status() -> Dict[str, Any]:
+    max_lag = _state["max_lag"]
+    _state["max_lag"] = 0.0
+    return {
+        "debug_mode": is_debug_mode(),
+        "last_lag_ms": round(_state["last_lag"] * 1000, 1),
+        "max_lag_ms_since_last_read": round(max_lag * 1000, 1),
+        "block_threshold_ms": get_block_threshold_seconds() * 1000,
+        "recent_blocks": list(reversed(_recent_blocks))
+    }
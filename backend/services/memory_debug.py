@@ -0,0 +1,147 @@
+"""
+Memory Diagnostics for Panaghia
+Switches tracemalloc on and off at runtime, keeps a few named snapshots per
+worker and reports the top allocation sites of a snapshot or the growth
+between two of them, the usual way to find a slow leak. Also counts the
+live asyncio tasks by coroutine, so piled-up background work shows too.
+"""
+import asyncio
+import tracemalloc
+import time
+from collections import Counter
+from typing import Dict, Any, List, Optional
+
+DEFAULT_TRACE_FRAMES = 10
+MAX_SNAPSHOTS = 10
+KEY_TYPES = ("lineno", "filename", "traceback")
+
+# Allocations made by the tracing machinery itself are noise
+_NOISE_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+]
+
+# name -> (taken_at, snapshot); insertion ordered, oldest dropped first
+_snapshots: Dict[str, tuple] = {}
+
+
+class TracingOff(Exception):
+    pass
+
+
+class SnapshotNotFound(Exception):
+    pass
+
+
+def start(frames: int = DEFAULT_TRACE_FRAMES):
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+
+
+def stop():
+    """Stop tracing; snapshots already taken stay comparable"""
+    tracemalloc.stop()
+
+
+def get_status() -> Dict[str, Any]:
+    tracing = tracemalloc.is_tracing()
+    current, peak = tracemalloc.get_traced_memory() if tracing else (0, 0)
+    return {
+        "tracing": tracing,
+        "frames": tracemalloc.get_traceback_limit() if tracing else None,
+        "traced_bytes": current,
+        "peak_traced_bytes": peak,
+        "tracemalloc_overhead_bytes": tracemalloc.get_tracemalloc_memory() if tracing else 0,
+        "snapshots": [
+            {"name": name, "taken_at": taken_at, "traces": len(snapshot.traces)}
+            for name, (taken_at, snapshot) in _snapshots.items()
+        ]
+    }
+
+
+def _take() -> tracemalloc.Snapshot:
+    if not tracemalloc.is_tracing():
+        raise TracingOff()
+    return tracemalloc.take_snapshot().filter_traces(_NOISE_FILTERS)
+
+
+async def take_snapshot(name: str) -> Dict[str, Any]:
+    """Store a snapshot under `name` (replacing one with the same name)"""
+    # Walking every trace takes a while on a big heap; keep it off the loop
+    snapshot = await asyncio.to_thread(_take)
+    _snapshots.pop(name, None)
+    _snapshots[name] = (time.time(), snapshot)
+    while len(_snapshots) > MAX_SNAPSHOTS:
+        _snapshots.pop(next(iter(_snapshots)))
+    return {"name": name, "traces": len(snapshot.traces)}
+
+
+def delete_snapshot(name: str):
+    if _snapshots.pop(name, None) is None:
+        raise SnapshotNotFound(name)
+
+
+def _get(name: str) -> tracemalloc.Snapshot:
+    entry = _snapshots.get(name)
+    if entry is None:
+        raise SnapshotNotFound(name)
+    return entry[1]
+
+
+def _frames(traceback: tracemalloc.Traceback) -> List[str]:
+    return [f"{frame.filename}:{frame.lineno}" for frame in traceback]
+
+
+def _top(snapshot: tracemalloc.Snapshot, key_type: str, limit: int) -> Dict[str, Any]:
+    stats = snapshot.statistics(key_type)
+    return {
+        "total_bytes": sum(stat.size for stat in stats),
+        "sites": [
+            {"site": _frames(stat.traceback), "size_bytes": stat.size, "count": stat.count}
+            for stat in stats[:limit]
+        ]
+    }
+
+
+async def top(name: Optional[str], key_type: str = "lineno", limit: int = 25) -> Dict[str, Any]:
+    """Largest allocation sites of a stored snapshot, or of the heap right now"""
+    snapshot = _get(name) if name else await asyncio.to_thread(_take)
+    return await asyncio.to_thread(_top, snapshot, key_type, limit)
+
+
+def _diff(base: tracemalloc.Snapshot, target: tracemalloc.Snapshot, key_type: str, limit: int) -> Dict[str, Any]:
+    stats = target.compare_to(base, key_type)
+    return {
+        "size_diff_bytes": sum(stat.size_diff for stat in stats),
+        "sites": [
+            {
+                "site": _frames(stat.traceback),
+                "size_bytes": stat.size,
+                "size_diff_bytes": stat.size_diff,
+                "count": stat.count,
+                "count_diff": stat.count_diff
+            }
+            for stat in stats[:limit]
+        ]
+    }
+
+
+async def diff(base: str, target: Optional[str], key_type: str = "lineno", limit: int = 25) -> Dict[str, Any]:
+    """Sites that grew the most from `base` to `target` (or to the heap right now)"""
+    base_snapshot = _get(base)
+    target_snapshot = _get(target) if target else await asyncio.to_thread(_take)
+    return await asyncio.to_thread(_diff, base_snapshot, target_snapshot, key_type, limit)
+
+
+def task_counts() -> Dict[str, Any]:
+    """Live asyncio tasks on this worker grouped by coroutine"""
+    counts: Counter = Counter()
+    for task in asyncio.all_tasks():
+        coro = task.get_coro()
+        counts[getattr(coro, "__qualname__", None) or task.get_name()] += 1
+    return {
+        "total": sum(counts.values()),
+        "by_coroutine": [{"coroutine": name, "count": count} for name, count in counts.most_common()]
+    }
@@ -0,0 +1,126 @@
+"""
+Menu Price Index for Panaghia
+In-memory price/availability table keyed by menu item id.
+Orders are priced from this index instead of trusting client prices or
+querying menu_items once per line.
+"""
+import os
+import time
+import logging
+from typing import Dict, Any, Iterable, List
+
+logger = logging.getLogger(__name__)
+
+# Database reference (set from server.py)
+db = None
+
+def set_db(database):
+    global db
+    db = database
+
+
+INDEX_PROJECTION = {"_id": 0, "id": 1, "name": 1, "price": 1, "is_available": 1}
+
+# menu_item_id -> {"name", "price", "is_available"}
+_items: Dict[str, Dict[str, Any]] = {}
+_loaded_at = 0.0
+
+
+def get_refresh_interval() -> int:
+    """Seconds before the index is reloaded (picks up writes made by other workers)"""
+    return int(os.environ.get('MENU_INDEX_REFRESH_SECONDS', 60))
+
+
+class MenuItemNotFound(Exception):
+    def __init__(self, item_id: str):
+        super().__init__(item_id)
+        self.item_id = item_id
+
+
+class MenuItemUnavailable(Exception):
+    def __init__(self, item_id: str, name: str):
+        super().__init__(item_id)
+        self.item_id = item_id
+        self.name = name
+
+
+def _entry(doc: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "name": doc.get("name"),
+        "price": float(doc.get("price", 0)),
+        "is_available": doc.get("is_available", True)
+    }
+
+
+async def load():
+    """(Re)build the whole index with one query"""
+    global _items, _loaded_at
+    docs = await db.menu_items.find({}, INDEX_PROJECTION).to_list(None)
+    _items = {doc["id"]: _entry(doc) for doc in docs if doc.get("id")}
+    _loaded_at = time.monotonic()
+    logger.info(f"Menu price index loaded ({len(_items)} items)")
+
+
+def update_item(doc: Dict[str, Any]):
+    """Apply a menu item write (create or update) to the index"""
+    item_id = doc.get("id")
+    if not item_id:
+        return
+    changes = {key: doc[key] for key in ("name", "price", "is_available") if key in doc}
+    _items[item_id] = _entry({**_items.get(item_id, {}), **changes})
+
+
+def remove_item(item_id: str):
+    """Apply a hard delete to the index"""
+    _items.pop(item_id, None)
+
+
+def set_availability(item_id: str, is_available: bool):
+    """Apply a soft delete / restore to the index"""
+    if item_id in _items:
+        _items[item_id]["is_available"] = is_available
+
+
+async def resolve(item_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Look up menu items by id.
+
+    Served from memory; ids missing from the index (e.g. created on another
+    worker) are fetched together in a single query.
+    """
+    if not _loaded_at or time.monotonic() - _loaded_at > get_refresh_interval():
+        await load()
+
+    ids = set(item_ids)
+    missing = [item_id for item_id in ids if item_id not in _items]
+    if missing:
+        docs = await db.menu_items.find({"id": {"$in": missing}}, INDEX_PROJECTION).to_list(None)
+        for doc in docs:
+            _items[doc["id"]] = _entry(doc)
+
+    return {item_id: _items[item_id] for item_id in ids if item_id in _items}
+
+
+async def price_items(items: List[Any]) -> List[Dict[str, Any]]:
+    """
+    Build order lines from validated OrderItemCreate models using the menu's
+    own names and prices.
+
+    Raises MenuItemNotFound / MenuItemUnavailable before anything is stored.
+    """
+    entries = await resolve(item.menu_item_id for item in items)
+
+    priced = []
+    for item in items:
+        entry = entries.get(item.menu_item_id)
+        if not entry:
+            raise MenuItemNotFound(item.menu_item_id)
+        if not entry["is_available"]:
+            raise MenuItemUnavailable(item.menu_item_id, entry["name"])
+        priced.append({
+            "menu_item_id": item.menu_item_id,
+            "name": entry["name"],
+            "price": entry["price"],
+            "quantity": item.quantity
+        })
+    return priced
@@ -0,0 +1,314 @@
+"""
+Metrics for Panaghia
+Small in-process metric registry rendered in the Prometheus text format on
+/metrics: per-route latency and size histograms from an ASGI middleware,
+in-flight requests, MongoDB connection pool state and background work
+queues. No client library needed; updates are lock-protected because pool
+events arrive from Motor's worker threads.
+"""
+import time
+import threading
+from abc import ABC, abstractmethod
+from contextvars import ContextVar
+from bisect import bisect_left
+from typing import Dict, Tuple, List, Callable, Optional, Iterable
+
+from pymongo import monitoring
+
+LATENCY_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+SIZE_BUCKETS = [256, 1024, 4096, 16384, 65536, 262144, 1048576]
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric(ABC):
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return lines
+
+    @abstractmethod
+    def samples(self) -> List[str]:
+        """Exposition lines for the current values"""
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name, help_text, labelnames=()):
+        super().__init__(name, help_text, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, labels: LabelValues = (), amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def get(self, labels: LabelValues = ()) -> float:
+        with self._lock:
+            return self._values.get(labels, 0)
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in sorted(values.items())
+        ]
+
+
+class Gauge(Metric):
+    """Set directly, or computed at scrape time by a callback returning {labels: value}"""
+    kind = "gauge"
+
+    def __init__(self, name, help_text, labelnames=(), callback: Optional[Callable[[], Dict[LabelValues, float]]] = None):
+        super().__init__(name, help_text, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._callback = callback
+
+    def set(self, labels: LabelValues, value: float):
+        with self._lock:
+            self._values[labels] = value
+
+    def inc(self, labels: LabelValues = (), amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, labels: LabelValues = (), amount: float = 1):
+        self.inc(labels, -amount)
+
+    def get(self, labels: LabelValues = ()) -> float:
+        with self._lock:
+            return self._values.get(labels, 0)
+
+    def samples(self):
+        if self._callback:
+            values = self._callback()
+        else:
+            with self._lock:
+                values = dict(self._values)
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in sorted(values.items())
+        ]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets: List[float] = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = list(buckets)
+        # labels -> [per-bucket counts (last is +Inf), sum, count]
+        self._series: Dict[LabelValues, list] = {}
+
+    def observe(self, labels: LabelValues, value: float):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def samples(self):
+        with self._lock:
+            snapshot = {labels: ([*series[0]], series[1], series[2]) for labels, series in self._series.items()}
+        lines = []
+        for labels, (counts, total, count) in sorted(snapshot.items()):
+            running = 0
+            for edge, bucket_count in zip(self.buckets + [float("inf")], counts):
+                running += bucket_count
+                le = f'le="{_format_value(float(edge))}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {running}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+_registry: List[Metric] = []
+
+
+def register(metric: Metric) -> Metric:
+    _registry.append(metric)
+    return metric
+
+
+def render() -> str:
+    lines: List[str] = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ============== HTTP ==============
+
+http_request_duration = register(Histogram(
+    "http_request_duration_seconds", "Request latency by route template and status",
+    ("method", "route", "status")
+))
+http_requests_in_flight = register(Gauge(
+    "http_requests_in_flight", "Requests currently being handled", ("method",)
+))
+http_requests_in_flight_peak = register(Gauge(
+    "http_requests_in_flight_peak", "Most requests handled at once since the worker started"
+))
+http_request_size = register(Histogram(
+    "http_request_size_bytes", "Request body size", ("method", "route"), SIZE_BUCKETS
+))
+http_response_size = register(Histogram(
+    "http_response_size_bytes", "Response body size", ("method", "route"), SIZE_BUCKETS
+))
+
+
+# Requests in flight over all methods (this worker), for the high-water mark
+_in_flight_total = 0
+
+
+def _track_in_flight(delta: int):
+    global _in_flight_total
+    _in_flight_total += delta
+    if _in_flight_total > http_requests_in_flight_peak.get():
+        http_requests_in_flight_peak.set((), _in_flight_total)
+
+
+# ASGI scope of the request being handled (copied into Motor's executor threads)
+request_scope: ContextVar[Optional[dict]] = ContextVar("request_scope", default=None)
+
+
+def route_template(scope) -> str:
+    """Path template of the matched route (bounded label values; unmatched paths collapse)"""
+    route = scope.get("route")
+    return getattr(route, "path_format", None) or getattr(route, "path", None) or "unmatched"
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware (no BaseHTTPMiddleware buffering, streaming responses untouched)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        sizes = {"request": 0, "response": 0}
+        status = {"code": 500}
+
+        async def counting_receive():
+            message = await receive()
+            if message["type"] == "http.request":
+                sizes["request"] += len(message.get("body", b""))
+            return message
+
+        async def counting_send(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            elif message["type"] == "http.response.body":
+                sizes["response"] += len(message.get("body", b""))
+            await send(message)
+
+        request_scope.set(scope)
+        http_requests_in_flight.inc((method,))
+        _track_in_flight(1)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, counting_receive, counting_send)
+        finally:
+            elapsed = time.perf_counter() - started
+            http_requests_in_flight.dec((method,))
+            _track_in_flight(-1)
+            route = route_template(scope)
+            http_request_duration.observe((method, route, str(status["code"])), elapsed)
+            http_request_size.observe((method, route), sizes["request"])
+            http_response_size.observe((method, route), sizes["response"])
+
+
+# ============== MONGODB CONNECTION POOL ==============
+
+pool_connections_open = register(Gauge(
+    "mongodb_pool_connections_open", "Open connections per server", ("address",)
+))
+pool_connections_in_use = register(Gauge(
+    "mongodb_pool_connections_in_use", "Connections checked out per server", ("address",)
+))
+pool_checkout_waiting = register(Gauge(
+    "mongodb_pool_checkout_waiting", "Operations waiting for a pooled connection", ("address",)
+))
+pool_checkout_failures = register(Counter(
+    "mongodb_pool_checkout_failures_total", "Failed connection checkouts", ("address", "reason")
+))
+
+
+def _address(event) -> LabelValues:
+    host, port = event.address
+    return (f"{host}:{port}",)
+
+
+class PoolMetricsListener(monitoring.ConnectionPoolListener):
+    """Registered on the AsyncIOMotorClient in server.py"""
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pool_connections_open.set(_address(event), 0)
+        pool_connections_in_use.set(_address(event), 0)
+
+    def connection_created(self, event):
+        pool_connections_open.inc(_address(event))
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        pool_connections_open.dec(_address(event))
+
+    def connection_check_out_started(self, event):
+        pool_checkout_waiting.inc(_address(event))
+
+    def connection_check_out_failed(self, event):
+        pool_checkout_waiting.dec(_address(event))
+        pool_checkout_failures.inc(_address(event) + (str(event.reason),))
+
+    def connection_checked_out(self, event):
+        pool_checkout_waiting.dec(_address(event))
+        pool_connections_in_use.inc(_address(event))
+
+    def connection_checked_in(self, event):
+        pool_connections_in_use.dec(_address(event))
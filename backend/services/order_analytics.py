@@ -0,0 +1,169 @@
+"""
+Order Timing Analytics for Panaghia
+Kitchen prep time (confirmed -> ready) and delivery time
+(out_for_delivery -> delivered) are recorded as fixed-bucket histograms in
+one document per day, so percentile reports never scan the orders collection.
+"""
+import os
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Dict, Any, List
+from zoneinfo import ZoneInfo
+
+logger = logging.getLogger(__name__)
+
+# Database reference (set from server.py)
+db = None
+
+def set_db(database):
+    global db
+    db = database
+
+
+# Histogram bucket upper bounds in minutes (anything slower lands in "inf")
+BUCKET_EDGES = [2, 4, 6, 8, 10, 12, 15, 18, 21, 25, 30, 35, 40, 50, 60, 75, 90, 120]
+BUCKET_KEYS = [f"le_{edge}" for edge in BUCKET_EDGES] + ["inf"]
+
+# Order size classes by total portions
+MIX_CLASSES = [(2, "1-2"), (5, "3-5"), (10, "6-10")]
+MIX_LARGEST = "11+"
+MIX_ORDER = [name for _, name in MIX_CLASSES] + [MIX_LARGEST]
+
+PERCENTILES = [50, 90, 95]
+
+
+def get_restaurant_timezone() -> ZoneInfo:
+    return ZoneInfo(os.environ.get('RESTAURANT_TIMEZONE', 'Europe/Bucharest'))
+
+
+def bucket_key(minutes: float) -> str:
+    for edge, key in zip(BUCKET_EDGES, BUCKET_KEYS):
+        if minutes <= edge:
+            return key
+    return "inf"
+
+
+def mix_class(order: Dict[str, Any]) -> str:
+    portions = sum(item.get("quantity", 1) for item in order.get("items", []))
+    for limit, name in MIX_CLASSES:
+        if portions <= limit:
+            return name
+    return MIX_LARGEST
+
+
+def status_time(order: Dict[str, Any], *statuses: str) -> Optional[datetime]:
+    """Timestamp of the first history entry matching the earliest-listed status"""
+    history = order.get("status_history", [])
+    for status in statuses:
+        for entry in history:
+            if entry.get("status") == status:
+                return datetime.fromisoformat(entry["at"])
+    return None
+
+
+def _timed_metric(order: Dict[str, Any], new_status: str):
+    """Return (metric, started_at, finished_at) for transitions we measure"""
+    finished_at = status_time(order, new_status)
+    if not finished_at:
+        return None
+
+    if new_status == "ready":
+        started_at = status_time(order, "confirmed", "pending")
+        return ("prep", started_at, finished_at) if started_at else None
+
+    if new_status == "delivered" and order.get("order_type") == "delivery":
+        started_at = status_time(order, "out_for_delivery", "ready")
+        return ("delivery", started_at, finished_at) if started_at else None
+
+    return None
+
+
+async def record_transition(order: Dict[str, Any], new_status: str):
+    """Add a completed prep or delivery to today's histograms (one upsert)"""
+    timed = _timed_metric(order, new_status)
+    if not timed:
+        return
+
+    metric, started_at, finished_at = timed
+    seconds = (finished_at - started_at).total_seconds()
+    if seconds < 0:
+        return
+
+    local_start = started_at.astimezone(get_restaurant_timezone())
+    bucket = bucket_key(seconds / 60)
+
+    try:
+        await db.order_timing_daily.update_one(
+            {"_id": local_start.strftime("%Y-%m-%d")},
+            {
+                "$inc": {
+                    f"{metric}.count": 1,
+                    f"{metric}.sum_s": seconds,
+                    f"{metric}.all.{bucket}": 1,
+                    f"{metric}.hour.{local_start.hour:02d}.{bucket}": 1,
+                    f"{metric}.mix.{mix_class(order)}.{bucket}": 1
+                }
+            },
+            upsert=True
+        )
+    except Exception as e:
+        logger.error(f"Failed to record {metric} time for order {order.get('order_number')}: {e}")
+
+
+def _merge(target: Dict[str, int], source: Dict[str, int]):
+    for key, count in source.items():
+        target[key] = target.get(key, 0) + count
+
+
+def summarize(histogram: Dict[str, int]) -> Dict[str, Any]:
+    """Count and percentile upper bounds (minutes) of a bucket histogram"""
+    total = sum(histogram.values())
+    summary = {"count": total}
+    for percentile in PERCENTILES:
+        value = None
+        if total:
+            threshold = total * percentile / 100
+            running = 0
+            for edge, key in zip(BUCKET_EDGES + [None], BUCKET_KEYS):
+                running += histogram.get(key, 0)
+                if running >= threshold:
+                    value = edge
+                    break
+        summary[f"p{percentile}_minutes"] = value
+    return summary
+
+
+async def get_timing_report(days: int) -> Dict[str, Any]:
+    """Merge the last N daily documents into percentile summaries"""
+    today = datetime.now(timezone.utc).astimezone(get_restaurant_timezone()).date()
+    first_day = (today - timedelta(days=days - 1)).isoformat()
+
+    docs: List[Dict[str, Any]] = await db.order_timing_daily.find(
+        {"_id": {"$gte": first_day}}
+    ).to_list(days)
+
+    report = {"days": days, "from": first_day, "to": today.isoformat()}
+    for metric in ("prep", "delivery"):
+        overall: Dict[str, int] = {}
+        by_hour: Dict[str, Dict[str, int]] = {}
+        by_mix: Dict[str, Dict[str, int]] = {}
+        total_seconds = 0.0
+
+        for doc in docs:
+            data = doc.get(metric, {})
+            total_seconds += data.get("sum_s", 0)
+            _merge(overall, data.get("all", {}))
+            for hour, histogram in data.get("hour", {}).items():
+                _merge(by_hour.setdefault(hour, {}), histogram)
+            for mix, histogram in data.get("mix", {}).items():
+                _merge(by_mix.setdefault(mix, {}), histogram)
+
+        summary = summarize(overall)
+        summary["avg_minutes"] = round(total_seconds / summary["count"] / 60, 1) if summary["count"] else None
+        report[metric] = {
+            "overall": summary,
+            "by_hour": {hour: summarize(by_hour[hour]) for hour in sorted(by_hour)},
+            "by_mix": {mix: summarize(by_mix[mix]) for mix in MIX_ORDER if mix in by_mix}
+        }
+
+    return report
@@ -0,0 +1,165 @@
+"""
+Order Archival for Panaghia
+Closed orders (delivered/cancelled) older than ORDER_ARCHIVE_AFTER_DAYS are
+moved out of db.orders into one collection per month (orders_archive_YYYY_MM)
+and summarized in order_rollups_monthly, so the hot collection and its
+indexes only hold recent orders. Dashboard totals add the rollups back in.
+"""
+import os
+import re
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, List, Optional
+
+from pymongo.errors import BulkWriteError
+
+logger = logging.getLogger(__name__)
+
+# Database reference (set from server.py)
+db = None
+
+def set_db(database):
+    global db
+    db = database
+
+
+CLOSED_STATUSES = ["delivered", "cancelled"]
+ARCHIVE_PREFIX = "orders_archive_"
+ARCHIVE_BATCH_SIZE = 500
+DUPLICATE_KEY = 11000
+
+
+def get_archive_after_days() -> int:
+    return int(os.environ.get('ORDER_ARCHIVE_AFTER_DAYS', 180))
+
+
+def archive_collection(month: str):
+    """Archive collection for a "YYYY-MM" month"""
+    if not re.fullmatch(r"\d{4}-\d{2}", month):
+        raise ValueError(f"Invalid month: {month}")
+    return db[ARCHIVE_PREFIX + month.replace("-", "_")]
+
+
+async def _copy_to_archive(month: str, orders: List[Dict[str, Any]]):
+    """Insert keeping the original _id, so a re-run after a crash is harmless"""
+    collection = archive_collection(month)
+    try:
+        await collection.insert_many(orders, ordered=False)
+    except BulkWriteError as e:
+        if any(error.get("code") != DUPLICATE_KEY for error in e.details.get("writeErrors", [])):
+            raise
+
+
+async def run_archival(older_than_days: Optional[int] = None) -> Dict[str, Any]:
+    """Move closed orders older than the cutoff, then refresh the touched monthly rollups"""
+    days = older_than_days if older_than_days is not None else get_archive_after_days()
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=days)).isoformat()
+    query = {"status": {"$in": CLOSED_STATUSES}, "created_at": {"$lt": cutoff}}
+
+    moved: Dict[str, int] = {}
+    batch: List[Dict[str, Any]] = []
+    cursor = db.orders.find(query, batch_size=ARCHIVE_BATCH_SIZE).sort("created_at", 1)
+    async for order in cursor:
+        batch.append(order)
+        if len(batch) >= ARCHIVE_BATCH_SIZE:
+            await _move_batch(batch, moved)
+            batch = []
+    if batch:
+        await _move_batch(batch, moved)
+
+    for month in moved:
+        await archive_collection(month).create_index("id", unique=True)
+        await archive_collection(month).create_index("order_number")
+        await rebuild_rollup(month)
+
+    total = sum(moved.values())
+    if total:
+        logger.info(f"Archived {total} orders older than {days} days: {moved}")
+    return {"cutoff": cutoff, "archived": total, "by_month": moved}
+
+
+async def _move_batch(batch: List[Dict[str, Any]], moved: Dict[str, int]):
+    by_month: Dict[str, List[Dict[str, Any]]] = {}
+    for order in batch:
+        by_month.setdefault(order["created_at"][:7], []).append(order)
+
+    for month, orders in by_month.items():
+        await _copy_to_archive(month, orders)
+        # Only delete what is now safely in the archive
+        await db.orders.delete_many({"_id": {"$in": [order["_id"] for order in orders]}})
+        moved[month] = moved.get(month, 0) + len(orders)
+
+
+async def rebuild_rollup(month: str) -> Dict[str, Any]:
+    """Recompute a month's summary from its archive collection (idempotent)"""
+    collection = archive_collection(month)
+    totals = await collection.aggregate([
+        {"$group": {"_id": None, "orders": {"$sum": 1}, "revenue": {"$sum": "$total"}}}
+    ]).to_list(1)
+    by_status = await collection.aggregate([
+        {"$group": {"_id": "$status", "count": {"$sum": 1}}}
+    ]).to_list(None)
+    by_type = await collection.aggregate([
+        {"$group": {"_id": "$order_type", "count": {"$sum": 1}, "revenue": {"$sum": "$total"}}}
+    ]).to_list(None)
+    items = await collection.aggregate([
+        {"$unwind": "$items"},
+        {"$group": {"_id": "$items.name", "quantity": {"$sum": "$items.quantity"}}},
+        {"$sort": {"quantity": -1}}
+    ]).to_list(None)
+
+    rollup = {
+        "_id": month,
+        "orders": totals[0]["orders"] if totals else 0,
+        "revenue": totals[0]["revenue"] if totals else 0,
+        "by_status": {row["_id"]: row["count"] for row in by_status},
+        "by_type": {row["_id"]: {"orders": row["count"], "revenue": row["revenue"]} for row in by_type},
+        "items": [{"name": row["_id"], "quantity": row["quantity"]} for row in items],
+        "updated_at": datetime.now(timezone.utc).isoformat()
+    }
+    await db.order_rollups_monthly.replace_one({"_id": month}, rollup, upsert=True)
+    return rollup
+
+
+# ============== READ PATH ==============
+
+async def get_rollups(month_from: Optional[str] = None, month_to: Optional[str] = None) -> List[Dict[str, Any]]:
+    query: Dict[str, Any] = {}
+    if month_from:
+        query.setdefault("_id", {})["$gte"] = month_from
+    if month_to:
+        query.setdefault("_id", {})["$lte"] = month_to
+    rollups = await db.order_rollups_monthly.find(query).sort("_id", 1).to_list(None)
+    return [{"month": rollup.pop("_id"), **rollup} for rollup in rollups]
+
+
+async def get_archive_totals() -> Dict[str, Any]:
+    """All-time archived counts for the dashboard (one pass over the small rollup collection)"""
+    totals = {"orders": 0, "revenue": 0, "by_status": {}, "items": {}}
+    async for rollup in db.order_rollups_monthly.find({}, {"orders": 1, "revenue": 1, "by_status": 1, "items": 1}):
+        totals["orders"] += rollup.get("orders", 0)
+        totals["revenue"] += rollup.get("revenue", 0)
+        for status, count in rollup.get("by_status", {}).items():
+            totals["by_status"][status] = totals["by_status"].get(status, 0) + count
+        for item in rollup.get("items", []):
+            totals["items"][item["name"]] = totals["items"].get(item["name"], 0) + item["quantity"]
+    return totals
+
+
+async def get_archived_orders(month: str, skip: int = 0, limit: int = 50) -> Dict[str, Any]:
+    collection = archive_collection(month)
+    orders = await collection.find({}, {"_id": 0}).sort("created_at", 1).skip(skip).limit(limit).to_list(limit)
+    return {"month": month, "orders": orders, "total": await collection.count_documents({}), "skip": skip, "limit": limit}
+
+
+async def find_archived_order(order_id: str) -> Optional[Dict[str, Any]]:
+    """Look an order up across archive collections (newest month first)"""
+    names = sorted(
+        (name for name in await db.list_collection_names() if name.startswith(ARCHIVE_PREFIX)),
+        reverse=True
+    )
+    for name in names:
+        order = await db[name].find_one({"id": order_id}, {"_id": 0})
+        if order:
+            return order
+    return None
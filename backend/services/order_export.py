@@ -0,0 +1,120 @@
+"""
+Order Export for Panaghia
+Streams orders as CSV or NDJSON straight from a Motor cursor. Documents are
+projected to the exported fields, fetched in batches and written out in
+small chunks, so memory stays flat regardless of the date range.
+"""
+import io
+import csv
+import json
+import logging
+from typing import Dict, Any, AsyncIterator, List
+
+logger = logging.getLogger(__name__)
+
+# Database reference (set from server.py)
+db = None
+
+def set_db(database):
+    global db
+    db = database
+
+
+EXPORT_FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson"
+}
+
+# Documents per round trip to MongoDB
+EXPORT_BATCH_SIZE = 1000
+# Rows written per chunk sent to the client
+ROWS_PER_CHUNK = 200
+
+EXPORT_PROJECTION = {
+    "_id": 0,
+    "id": 1,
+    "order_number": 1,
+    "created_at": 1,
+    "status": 1,
+    "order_type": 1,
+    "payment_method": 1,
+    "payment_status": 1,
+    "total": 1,
+    "delivery_fee": 1,
+    "customer.name": 1,
+    "customer.phone": 1,
+    "customer.email": 1,
+    "customer.address": 1,
+    "items.menu_item_id": 1,
+    "items.name": 1,
+    "items.quantity": 1,
+    "items.price": 1
+}
+
+CSV_COLUMNS = [
+    "order_number", "created_at", "status", "order_type", "payment_method", "payment_status",
+    "customer_name", "customer_phone", "customer_email", "customer_address",
+    "items", "portions", "total", "delivery_fee"
+]
+
+
+def _csv_row(order: Dict[str, Any]) -> List[Any]:
+    customer = order.get("customer") or {}
+    items = order.get("items") or []
+    return [
+        order.get("order_number"),
+        order.get("created_at"),
+        order.get("status"),
+        order.get("order_type"),
+        order.get("payment_method"),
+        order.get("payment_status", ""),
+        customer.get("name"),
+        customer.get("phone"),
+        customer.get("email") or "",
+        customer.get("address") or "",
+        "; ".join(f"{item.get('quantity', 1)}x {item.get('name')}" for item in items),
+        sum(item.get("quantity", 1) for item in items),
+        order.get("total"),
+        order.get("delivery_fee", "")
+    ]
+
+
+def _cursor(query: Dict[str, Any]):
+    return db.orders.find(query, EXPORT_PROJECTION, batch_size=EXPORT_BATCH_SIZE).sort("created_at", 1)
+
+
+async def stream_csv(query: Dict[str, Any]) -> AsyncIterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # BOM so spreadsheet apps read Romanian diacritics as UTF-8
+    buffer.write("\ufeff")
+    writer.writerow(CSV_COLUMNS)
+
+    rows = 0
+    async for order in _cursor(query):
+        writer.writerow(_csv_row(order))
+        rows += 1
+        if rows % ROWS_PER_CHUNK == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+    logger.info(f"Exported {rows} orders as CSV")
+
+
+async def stream_ndjson(query: Dict[str, Any]) -> AsyncIterator[str]:
+    lines: List[str] = []
+    rows = 0
+    async for order in _cursor(query):
+        lines.append(json.dumps(order, ensure_ascii=False, default=str))
+        rows += 1
+        if len(lines) == ROWS_PER_CHUNK:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+    logger.info(f"Exported {rows} orders as NDJSON")
+
+
+def stream(export_format: str, query: Dict[str, Any]) -> AsyncIterator[str]:
+    return stream_csv(query) if export_format == "csv" else stream_ndjson(query)
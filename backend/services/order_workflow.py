@@ -0,0 +1,148 @@
+"""
+Order Workflow for Panaghia
+Single definition of order statuses and allowed transitions.
+Every transition is one conditional find_one_and_update guarded on the
+allowed source statuses (and optionally the order version), so concurrent
+staff updates cannot overwrite each other or reopen closed orders.
+"""
+import logging
+from datetime import datetime, timezone
+from typing import Optional, Dict, Any
+
+from pymongo import ReturnDocument
+
+from services import order_analytics, kitchen_service, background
+
+logger = logging.getLogger(__name__)
+
+# Database reference (set from server.py)
+db = None
+
+def set_db(database):
+    global db
+    db = database
+
+
+ORDER_STATUSES = ['pending', 'confirmed', 'preparing', 'ready', 'out_for_delivery', 'delivered', 'cancelled']
+
+# status -> statuses it may move to (forward only; delivered/cancelled are final)
+TRANSITIONS = {
+    'pending': ['confirmed', 'preparing', 'ready', 'out_for_delivery', 'delivered', 'cancelled'],
+    'confirmed': ['preparing', 'ready', 'out_for_delivery', 'delivered', 'cancelled'],
+    'preparing': ['ready', 'out_for_delivery', 'delivered', 'cancelled'],
+    'ready': ['out_for_delivery', 'delivered', 'cancelled'],
+    'out_for_delivery': ['delivered', 'cancelled'],
+    'delivered': [],
+    'cancelled': []
+}
+
+# status -> statuses it may be reached from (used as the update guard)
+ALLOWED_SOURCES = {
+    target: [source for source, targets in TRANSITIONS.items() if target in targets]
+    for target in ORDER_STATUSES
+}
+
+
+class UnknownStatus(Exception):
+    def __init__(self, status: str):
+        super().__init__(status)
+        self.status = status
+
+
+class OrderNotFound(Exception):
+    pass
+
+
+class InvalidTransition(Exception):
+    def __init__(self, current: str, target: str):
+        super().__init__(f"{current} -> {target}")
+        self.current = current
+        self.target = target
+
+
+class VersionConflict(Exception):
+    def __init__(self, current_version: int):
+        super().__init__(current_version)
+        self.current_version = current_version
+
+
+async def transition_order(
+    order_id: str,
+    new_status: str,
+    expected_version: Optional[int] = None,
+    extra_set: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    Move an order to new_status in a single round trip.
+
+    Returns the updated order. Raises UnknownStatus, OrderNotFound,
+    InvalidTransition or VersionConflict.
+    """
+    if new_status not in ALLOWED_SOURCES:
+        raise UnknownStatus(new_status)
+
+    query = {"id": order_id, "status": {"$in": ALLOWED_SOURCES[new_status]}}
+    if expected_version is not None:
+        # Orders created before versioning have no version field
+        query["version"] = expected_version if expected_version else {"$in": [0, None]}
+
+    now = datetime.now(timezone.utc).isoformat()
+    changes = {
+        **(extra_set or {}),
+        "status": new_status,
+        "updated_at": now
+    }
+    history_entry = {"status": new_status, "at": now}
+    if extra_set and extra_set.get("updated_by"):
+        history_entry["by"] = extra_set["updated_by"]
+
+    # Fetch the previous state so callers know which transition happened
+    previous = await db.orders.find_one_and_update(
+        query,
+        {"$set": changes, "$inc": {"version": 1}, "$push": {"status_history": history_entry}},
+        projection={"_id": 0},
+        return_document=ReturnDocument.BEFORE
+    )
+
+    if not previous:
+        current = await db.orders.find_one({"id": order_id}, {"_id": 0, "status": 1, "version": 1})
+        if not current:
+            raise OrderNotFound()
+        if current.get("status") not in ALLOWED_SOURCES[new_status]:
+            raise InvalidTransition(current.get("status"), new_status)
+        raise VersionConflict(current.get("version", 0))
+
+    order = {
+        **previous,
+        **changes,
+        "version": previous.get("version", 0) + 1,
+        "status_history": previous.get("status_history", []) + [history_entry]
+    }
+    _after_transition(order, previous.get("status"), new_status)
+    return order
+
+
+async def mark_order_paid(order_id: str):
+    """Record a completed online payment and auto-confirm the order if still pending"""
+    payment_fields = {"payment_status": "paid", "payment_method": "card_online"}
+    try:
+        await transition_order(order_id, "confirmed", extra_set=payment_fields)
+    except InvalidTransition:
+        # Already confirmed (or further along): keep its status, record the payment
+        await db.orders.update_one({"id": order_id}, {"$set": payment_fields})
+    except OrderNotFound:
+        logger.warning(f"Payment received for unknown order {order_id}")
+
+
+def _after_transition(order: Dict[str, Any], old_status: str, new_status: str):
+    """Fire-and-forget side effects of a completed transition"""
+    background.spawn(order_analytics.record_transition(order, new_status), "analytics.record_transition")
+    background.spawn(kitchen_service.apply_status_change(order, old_status, new_status), "kitchen.apply_status_change")
+    
+    zoho_deal_id = order.get("zoho_deal_id")
+    if zoho_deal_id:
+        try:
+            from services.zoho_service import update_deal_status
+            background.spawn(update_deal_status(zoho_deal_id, new_status), "zoho.update_deal_status")
+        except Exception as e:
+            logger.error(f"Failed to sync status to Zoho CRM: {e}")
@@ -0,0 +1,128 @@
+"""
+Sampling Profiler for Panaghia
+Samples the event-loop thread's stack from a separate thread every few
+milliseconds (sys._current_frames, no tracing hooks), so it can run in
+production for a short window. Samples are tagged with the asyncio task
+being executed and returned as collapsed stacks ("a;b;c count"), the input
+format of flamegraph.pl / speedscope, or as a top-functions table.
+"""
+import sys
+import time
+import asyncio
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+APP_ROOT = str(Path(__file__).resolve().parent.parent)
+DEFAULT_INTERVAL_SECONDS = 0.005
+IDLE_FUNCTIONS = {"select", "poll", "epoll", "_run_once"}
+
+_lock = asyncio.Lock()
+
+
+class ProfilerBusy(Exception):
+    pass
+
+
+def _is_app_file(filename: str) -> bool:
+    return filename.startswith(APP_ROOT) and "site-packages" not in filename
+
+
+def _label(code) -> str:
+    filename = code.co_filename
+    if _is_app_file(filename):
+        filename = filename[len(APP_ROOT) + 1:]
+    else:
+        filename = filename.rsplit("/", 1)[-1]
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(";", ",")
+
+
+def _task_name(loop: asyncio.AbstractEventLoop) -> Optional[str]:
+    """Task currently running on the loop (read from another thread; best effort)"""
+    task = asyncio.current_task(loop)
+    if task is None:
+        return None
+    coro = task.get_coro()
+    return getattr(coro, "__qualname__", None) or task.get_name()
+
+
+def _collect(frame, app_only: bool) -> Optional[List[str]]:
+    """Root-first stack; with app_only, trimmed to start at the first app frame"""
+    codes = []
+    while frame is not None:
+        codes.append(frame.f_code)
+        frame = frame.f_back
+    codes.reverse()
+
+    if app_only:
+        first_app = next((index for index, code in enumerate(codes) if _is_app_file(code.co_filename)), None)
+        if first_app is None:
+            return None
+        codes = codes[first_app:]
+    return [_label(code) for code in codes]
+
+
+class Sampler:
+    def __init__(self, loop: asyncio.AbstractEventLoop, loop_thread_id: int, app_only: bool, interval: float):
+        self.loop = loop
+        self.loop_thread_id = loop_thread_id
+        self.app_only = app_only
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.idle = 0
+
+    def run(self, seconds: float):
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            frame = sys._current_frames().get(self.loop_thread_id)
+            self.samples += 1
+            if frame is None or frame.f_code.co_name in IDLE_FUNCTIONS:
+                self.idle += 1
+            else:
+                stack = _collect(frame, self.app_only)
+                if stack:
+                    task = _task_name(self.loop)
+                    self.stacks[tuple([f"task:{task}"] if task else []) + tuple(stack)] += 1
+            time.sleep(self.interval)
+
+
+def collapsed(stacks: Counter) -> str:
+    return "".join(f"{';'.join(stack)} {count}\n" for stack, count in stacks.most_common())
+
+
+def top_functions(stacks: Counter, limit: int = 30) -> List[Dict[str, Any]]:
+    """Self (leaf) and total (anywhere on the stack) sample counts per function"""
+    own: Counter = Counter()
+    total: Counter = Counter()
+    for stack, count in stacks.items():
+        own[stack[-1]] += count
+        for label in set(stack):
+            total[label] += count
+    return [
+        {"function": label, "self": own.get(label, 0), "total": count}
+        for label, count in total.most_common(limit)
+        if not label.startswith("task:")
+    ]
+
+
+async def profile(seconds: float, app_only: bool = True, interval: float = DEFAULT_INTERVAL_SECONDS) -> Tuple[Counter, Dict[str, Any]]:
+    """Sample the loop thread for `seconds`; one profile at a time per worker"""
+    if _lock.locked():
+        raise ProfilerBusy()
+    async with _lock:
+        loop = asyncio.get_running_loop()
+        sampler = Sampler(loop, threading.get_ident(), app_only, interval)
+        started = time.time()
+        await asyncio.to_thread(sampler.run, seconds)
+        summary = {
+            "started_at": started,
+            "seconds": seconds,
+            "interval_ms": interval * 1000,
+            "samples": sampler.samples,
+            "idle_samples": sampler.idle,
+            "busy_ratio": round(1 - sampler.idle / sampler.samples, 3) if sampler.samples else 0,
+            "app_only": app_only
+        }
+        return sampler.stacks, summary
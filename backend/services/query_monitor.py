@@ -0,0 +1,181 @@
+"""
+MongoDB Command Monitoring for Panaghia
+A pymongo CommandListener registered on the Motor client times every
+command per collection, exports the durations on /metrics and logs
+commands slower than MONGO_SLOW_QUERY_MS with their filter shape (values
+replaced by "?") and the route that issued them.
+"""
+import os
+import time
+import logging
+import threading
+from collections import deque
+from typing import Dict, Any, Tuple, Optional
+
+from pymongo import monitoring
+
+from services import metrics
+
+logger = logging.getLogger(__name__)
+
+# Handshake/auth/driver-internal commands are not query cost
+IGNORED_COMMANDS = {
+    "hello", "ismaster", "isMaster", "ping", "buildInfo", "saslStart", "saslContinue",
+    "authenticate", "endSessions", "killCursors", "getnonce"
+}
+RECENT_SLOW_LIMIT = 100
+
+command_duration = metrics.register(metrics.Histogram(
+    "mongodb_command_duration_seconds", "MongoDB command duration by command and collection",
+    ("command", "collection")
+))
+command_failures = metrics.register(metrics.Counter(
+    "mongodb_command_failures_total", "Failed MongoDB commands", ("command", "collection")
+))
+
+
+def get_slow_query_ms() -> float:
+    return float(os.environ.get('MONGO_SLOW_QUERY_MS', 100))
+
+
+def filter_shape(value: Any) -> Any:
+    """Keep keys and operators, replace literal values: {"status": {"$in": "?"}}"""
+    if isinstance(value, dict):
+        return {key: filter_shape(item) for key, item in value.items()}
+    if isinstance(value, list) and value and all(isinstance(item, dict) for item in value):
+        return [filter_shape(item) for item in value]
+    if isinstance(value, str) and value.startswith("$"):
+        # Field path in a pipeline expression, not a value
+        return value
+    return "?"
+
+
+def _command_target(name: str, command: Dict[str, Any]) -> Tuple[str, Any]:
+    """(collection, filter or pipeline shape) of a command document"""
+    if name == "getMore":
+        return command.get("collection", "?"), None
+    collection = command.get(name)
+    collection = collection if isinstance(collection, str) else "?"
+    if name in ("find", "count", "distinct"):
+        return collection, filter_shape(command.get("filter", command.get("query", {})))
+    if name == "aggregate":
+        return collection, filter_shape(command.get("pipeline", []))
+    if name == "findAndModify":
+        return collection, filter_shape(command.get("query", {}))
+    if name == "update":
+        return collection, filter_shape((command.get("updates") or [{}])[0].get("q", {}))
+    if name == "delete":
+        return collection, filter_shape((command.get("deletes") or [{}])[0].get("q", {}))
+    return collection, None
+
+
+class CommandStats:
+    """Per (collection, command) counters for the admin debug endpoint"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.started_at = time.time()
+            self.by_target: Dict[Tuple[str, str], Dict[str, float]] = {}
+            self.slow: deque = deque(maxlen=RECENT_SLOW_LIMIT)
+
+    def record(self, collection: str, command: str, duration_ms: float, failed: bool):
+        with self._lock:
+            entry = self.by_target.setdefault(
+                (collection, command), {"count": 0, "failures": 0, "total_ms": 0.0, "max_ms": 0.0, "slow": 0}
+            )
+            entry["count"] += 1
+            entry["total_ms"] += duration_ms
+            entry["max_ms"] = max(entry["max_ms"], duration_ms)
+            if failed:
+                entry["failures"] += 1
+
+    def record_slow(self, record: Dict[str, Any]):
+        with self._lock:
+            # May have been reset since record()
+            entry = self.by_target.get((record["collection"], record["command"]))
+            if entry:
+                entry["slow"] += 1
+            self.slow.append(record)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            rows = [
+                {
+                    "collection": collection,
+                    "command": command,
+                    **entry,
+                    "total_ms": round(entry["total_ms"], 1),
+                    "max_ms": round(entry["max_ms"], 1),
+                    "avg_ms": round(entry["total_ms"] / entry["count"], 2) if entry["count"] else 0
+                }
+                for (collection, command), entry in self.by_target.items()
+            ]
+            slow = list(self.slow)
+            since = self.started_at
+        rows.sort(key=lambda row: row["total_ms"], reverse=True)
+        return {
+            "since": since,
+            "slow_query_ms": get_slow_query_ms(),
+            "commands": rows,
+            "recent_slow": list(reversed(slow))
+        }
+
+
+stats = CommandStats()
+
+
+class QueryMonitor(monitoring.CommandListener):
+    """Registered on the AsyncIOMotorClient in server.py"""
+
+    def __init__(self):
+        self._pending: Dict[Tuple[int, Any], Tuple[str, Any, Optional[str]]] = {}
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        if event.command_name in IGNORED_COMMANDS:
+            return
+        collection, shape = _command_target(event.command_name, event.command)
+        scope = metrics.request_scope.get()
+        route = f"{scope['method']} {metrics.route_template(scope)}" if scope else None
+        with self._lock:
+            self._pending[(event.request_id, event.connection_id)] = (collection, shape, route)
+
+    def succeeded(self, event):
+        self._finish(event, failed=False)
+
+    def failed(self, event):
+        self._finish(event, failed=True)
+
+    def _finish(self, event, failed: bool):
+        with self._lock:
+            pending = self._pending.pop((event.request_id, event.connection_id), None)
+        if pending is None:
+            return
+        collection, shape, route = pending
+        name = event.command_name
+        duration_ms = event.duration_micros / 1000
+
+        command_duration.observe((name, collection), duration_ms / 1000)
+        if failed:
+            command_failures.inc((name, collection))
+        stats.record(collection, name, duration_ms, failed)
+
+        if duration_ms >= get_slow_query_ms():
+            record = {
+                "at": time.time(),
+                "command": name,
+                "collection": collection,
+                "duration_ms": round(duration_ms, 1),
+                "shape": shape,
+                "route": route,
+                "failed": failed
+            }
+            stats.record_slow(record)
+            logger.warning(
+                f"Slow MongoDB {name} on {collection}: {record['duration_ms']} ms, "
+                f"shape={shape}, route={route or 'background'}"
+            )
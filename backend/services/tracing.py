@@ -0,0 +1,423 @@
+"""
+Request Tracing for Panaghia
+Lightweight spans without an SDK. The current span lives in a ContextVar,
+so it follows a request into awaited calls, Motor's executor threads and
+background.spawn() tasks (which copy the context). Every HTTP request gets
+a server span (continuing an incoming W3C traceparent), outbound calls to
+MongoDB, Zoho, Stripe and Resend get client spans, and finished spans are
+written in batches as OTLP/JSON: one ExportTraceServiceRequest per line in
+TRACE_EXPORT_PATH and/or POSTed to TRACE_OTLP_ENDPOINT (an OTLP/HTTP
+collector's /v1/traces). Without either setting tracing is off and span()
+costs next to nothing.
+"""
+import os
+import json
+import time
+import random
+import asyncio
+import logging
+import functools
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Any, List, Optional
+
+import httpx
+from pymongo import monitoring
+
+from services import metrics
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = "panaghia-backend"
+# OTLP SpanKind / StatusCode values
+KIND_INTERNAL = 1
+KIND_SERVER = 2
+KIND_CLIENT = 3
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+# Finished spans waiting for export; the oldest are dropped beyond this
+MAX_PENDING_SPANS = 20000
+
+_pending: deque = deque(maxlen=MAX_PENDING_SPANS)
+_export_task: Optional[asyncio.Task] = None
+
+spans_dropped = metrics.register(metrics.Counter(
+    "trace_spans_dropped_total", "Finished spans dropped before export (buffer full or export failed)"
+))
+metrics.register(metrics.Gauge(
+    "trace_spans_pending", "Finished spans waiting for export", callback=lambda: {(): len(_pending)}
+))
+
+
+def get_export_path() -> Optional[str]:
+    return os.environ.get('TRACE_EXPORT_PATH') or None
+
+
+def get_otlp_endpoint() -> Optional[str]:
+    return os.environ.get('TRACE_OTLP_ENDPOINT') or None
+
+
+def get_sample_rate() -> float:
+    return float(os.environ.get('TRACE_SAMPLE_RATE', 1.0))
+
+
+def get_export_interval_seconds() -> float:
+    return float(os.environ.get('TRACE_EXPORT_SECONDS', 5))
+
+
+def is_enabled() -> bool:
+    return bool(get_export_path() or get_otlp_endpoint())
+
+
+# ============== SPANS ==============
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "kind", "start_ns", "end_ns",
+                 "attributes", "status", "status_message", "sampled")
+
+    def __init__(self, name: str, kind: int, trace_id: str, parent_id: Optional[str], sampled: bool,
+                 attributes: Optional[Dict[str, Any]] = None):
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.attributes = dict(attributes or {})
+        self.status = 0
+        self.status_message = ""
+        self.sampled = sampled
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def set_error(self, message: str):
+        self.status = STATUS_ERROR
+        self.status_message = message[:500]
+
+    def end(self, end_ns: Optional[int] = None):
+        self.end_ns = end_ns or time.time_ns()
+        if self.sampled:
+            if len(_pending) == _pending.maxlen:
+                spans_dropped.inc()
+            _pending.append(self)
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def current_trace_id() -> Optional[str]:
+    span = _current_span.get()
+    return span.trace_id if span else None
+
+
+def set_attribute(key: str, value: Any):
+    """Annotate the current span (e.g. order.number on the request span)"""
+    span = _current_span.get()
+    if span is not None:
+        span.set_attribute(key, value)
+
+
+def start_span(name: str, kind: int = KIND_INTERNAL, attributes: Optional[Dict[str, Any]] = None,
+               parent: Optional[Span] = None, remote_parent: Optional[tuple] = None) -> Optional[Span]:
+    """New span under `parent` (default: the current one), or a new trace; None when tracing is off"""
+    if not is_enabled():
+        return None
+    parent = parent or _current_span.get()
+    if parent is not None:
+        return Span(name, kind, parent.trace_id, parent.span_id, parent.sampled, attributes)
+    if remote_parent is not None:
+        trace_id, parent_id, sampled = remote_parent
+        return Span(name, kind, trace_id, parent_id, sampled, attributes)
+    # Sampling is decided once per trace, at its root
+    return Span(name, kind, os.urandom(16).hex(), None, random.random() < get_sample_rate(), attributes)
+
+
+@contextmanager
+def span(name: str, kind: int = KIND_INTERNAL, attributes: Optional[Dict[str, Any]] = None):
+    """Time a block as a child of the current span; exceptions mark it failed and propagate"""
+    current = start_span(name, kind, attributes)
+    if current is None:
+        yield None
+        return
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.set_error(repr(e))
+        raise
+    finally:
+        _current_span.reset(token)
+        current.end()
+
+
+def traced(name: str, kind: int = KIND_INTERNAL, attributes: Optional[Dict[str, Any]] = None):
+    """Decorator form of span() for coroutine functions"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            with span(name, kind, attributes):
+                return await fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+async def run_in_span(coro, name: str):
+    """Wrap a background coroutine so its work shows as one span in the spawning trace"""
+    with span(name):
+        return await coro
+
+
+# ============== W3C TRACE CONTEXT ==============
+
+def parse_traceparent(header: Optional[str]) -> Optional[tuple]:
+    """(trace_id, parent_span_id, sampled) from a "00-<trace>-<span>-<flags>" header"""
+    if not header:
+        return None
+    parts = header.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        int(parts[1], 16), int(parts[2], 16)
+        flags = int(parts[3], 16)
+    except ValueError:
+        return None
+    if parts[1] == "0" * 32 or parts[2] == "0" * 16:
+        return None
+    return parts[1], parts[2], bool(flags & 1)
+
+
+def format_traceparent(current: Span) -> str:
+    return f"00-{current.trace_id}-{current.span_id}-{'01' if current.sampled else '00'}"
+
+
+class TracingMiddleware:
+    """Pure ASGI middleware: one server span per HTTP request, trace ID echoed in X-Trace-Id"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not is_enabled():
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        remote = parse_traceparent(headers.get(b"traceparent", b"").decode("latin-1"))
+        server_span = start_span(
+            f"{scope['method']} {scope['path']}", KIND_SERVER,
+            {"http.method": scope["method"], "http.target": scope["path"]},
+            remote_parent=remote
+        )
+        status = {"code": 500}
+
+        async def traced_send(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"x-trace-id", server_span.trace_id.encode())]
+            await send(message)
+
+        token = _current_span.set(server_span)
+        try:
+            await self.app(scope, receive, traced_send)
+        except BaseException as e:
+            server_span.set_error(repr(e))
+            raise
+        finally:
+            _current_span.reset(token)
+            route = metrics.route_template(scope)
+            server_span.name = f"{scope['method']} {route}"
+            server_span.set_attribute("http.route", route)
+            server_span.set_attribute("http.status_code", status["code"])
+            if status["code"] >= 500 and not server_span.status:
+                server_span.set_error(f"HTTP {status['code']}")
+            server_span.end()
+
+
+# ============== OUTBOUND CALLS ==============
+
+class TracedTransport(httpx.AsyncBaseTransport):
+    """httpx transport that records a client span per request (URL without query string)"""
+
+    def __init__(self, peer_service: str, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.peer_service = peer_service
+        self.transport = transport or httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        attributes = {
+            "peer.service": self.peer_service,
+            "http.method": request.method,
+            "http.url": str(request.url.copy_with(query=None))
+        }
+        with span(f"{self.peer_service} {request.method} {request.url.path}", KIND_CLIENT, attributes) as current:
+            response = await self.transport.handle_async_request(request)
+            if current is not None:
+                current.set_attribute("http.status_code", response.status_code)
+                if response.status_code >= 400:
+                    current.set_error(f"HTTP {response.status_code}")
+            return response
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+class MongoTracingListener(monitoring.CommandListener):
+    """Registered on the AsyncIOMotorClient in server.py; one client span per command"""
+
+    def __init__(self):
+        self._pending: Dict[tuple, tuple] = {}
+
+    def started(self, event):
+        parent = _current_span.get()
+        if parent is None or not parent.sampled or event.command_name in ("hello", "isMaster", "ismaster", "ping"):
+            return
+        command = event.command.get(event.command_name)
+        collection = command if isinstance(command, str) else event.command.get("collection", "")
+        # dict ops are atomic under the GIL; events arrive on executor threads
+        self._pending[(event.request_id, event.connection_id)] = (parent, time.time_ns(), collection)
+
+    def succeeded(self, event):
+        self._finish(event, None)
+
+    def failed(self, event):
+        self._finish(event, str(event.failure))
+
+    def _finish(self, event, failure: Optional[str]):
+        pending = self._pending.pop((event.request_id, event.connection_id), None)
+        if pending is None:
+            return
+        parent, started_ns, collection = pending
+        name = event.command_name
+        client_span = start_span(
+            f"mongodb {name} {collection}".strip(), KIND_CLIENT,
+            {"db.system": "mongodb", "db.operation": name, "db.mongodb.collection": collection},
+            parent=parent
+        )
+        if client_span is None:
+            return
+        client_span.start_ns = started_ns
+        if failure:
+            client_span.set_error(failure)
+        client_span.end(started_ns + event.duration_micros * 1000)
+
+
+# ============== EXPORT ==============
+
+def _attribute_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _attributes(values: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{"key": key, "value": _attribute_value(value)} for key, value in values.items()]
+
+
+def to_otlp(spans: List[Span]) -> Dict[str, Any]:
+    """ExportTraceServiceRequest in OTLP/JSON encoding"""
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": _attributes({"service.name": SERVICE_NAME})},
+            "scopeSpans": [{
+                "scope": {"name": "services.tracing"},
+                "spans": [
+                    {
+                        "traceId": item.trace_id,
+                        "spanId": item.span_id,
+                        **({"parentSpanId": item.parent_id} if item.parent_id else {}),
+                        "name": item.name,
+                        "kind": item.kind,
+                        "startTimeUnixNano": str(item.start_ns),
+                        "endTimeUnixNano": str(item.end_ns),
+                        "attributes": _attributes(item.attributes),
+                        "status": {"code": item.status, **({"message": item.status_message} if item.status_message else {})}
+                    }
+                    for item in spans
+                ]
+            }]
+        }]
+    }
+
+
+def _append_line(path: str, line: str):
+    with open(path, "a", encoding="utf-8") as handle:
+        handle.write(line + "\n")
+
+
+async def flush() -> int:
+    """
+    Export everything finished so far to each configured sink; a failing sink
+    does not stop the others. Returns the number of spans at least one sink
+    accepted (spans no sink accepted are counted as dropped).
+    """
+    if not _pending:
+        return 0
+    batch = list(_pending)
+    _pending.clear()
+    payload = to_otlp(batch)
+    delivered = False
+
+    path = get_export_path()
+    if path:
+        try:
+            await asyncio.to_thread(_append_line, path, json.dumps(payload, separators=(",", ":")))
+            delivered = True
+        except Exception as e:
+            logger.error(f"Failed to write {len(batch)} spans to {path}: {e}")
+
+    endpoint = get_otlp_endpoint()
+    if endpoint:
+        # Plain client on purpose: exporting must not create spans of its own
+        try:
+            async with httpx.AsyncClient() as client:
+                response = await client.post(endpoint, json=payload, timeout=10.0)
+            if response.status_code >= 400:
+                logger.error(f"OTLP export rejected: {response.status_code} - {response.text[:200]}")
+            else:
+                delivered = True
+        except Exception as e:
+            logger.error(f"OTLP export of {len(batch)} spans failed: {e}")
+
+    if not delivered:
+        spans_dropped.inc(amount=len(batch))
+        return 0
+    return len(batch)
+
+
+async def _export_loop():
+    interval = get_export_interval_seconds()
+    while True:
+        await asyncio.sleep(interval)
+        await flush()
+
+
+def start():
+    global _export_task
+    if is_enabled() and (_export_task is None or _export_task.done()):
+        _export_task = asyncio.create_task(_export_loop())
+        logger.info(f"Tracing on: file={get_export_path()}, otlp={get_otlp_endpoint()}, sample rate {get_sample_rate()}")
+
+
+async def stop():
+    """Stop the exporter and send whatever is still pending"""
+    global _export_task
+    if _export_task:
+        _export_task.cancel()
+        try:
+            await _export_task
+        except asyncio.CancelledError:
+            pass
+        _export_task = None
+    await flush()
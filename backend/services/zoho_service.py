@@ -10,6 +10,8 @@ from typing import Optional, Dict, Any
 from dotenv import load_dotenv
 from pathlib import Path
 
+from services import tracing
+
 # Load environment variables
 load_dotenv(Path(__file__).parent.parent / '.env')
 
@@ -22,8 +24,9 @@ def get_zoho_config():
         'client_secret': os.environ.get('ZOHO_CLIENT_SECRET', '')
     }
 
-ZOHO_ACCOUNTS_URL = "https://accounts.zoho.eu"  # EU domain for Romania
-ZOHO_API_URL = "https://www.zohoapis.eu/crm/v6"
+# EU domain for Romania; overridable to point at a local stand-in (benchmarks/provider_servers.py)
+ZOHO_ACCOUNTS_URL = os.environ.get('ZOHO_ACCOUNTS_URL', "https://accounts.zoho.eu")
+ZOHO_API_URL = os.environ.get('ZOHO_API_URL', "https://www.zohoapis.eu/crm/v6")
 
 # Database reference (set from server.py)
 db = None
@@ -40,7 +43,7 @@ async def exchange_authorization_code(auth_code: str) -> dict:
     """
     config = get_zoho_config()
     
-    async with httpx.AsyncClient() as client:
+    async with httpx.AsyncClient(transport=tracing.TracedTransport("zoho")) as client:
         response = await client.post(
             f"{ZOHO_ACCOUNTS_URL}/oauth/v2/token",
             params={
@@ -106,11 +109,12 @@ async def get_valid_access_token() -> Optional[str]:
     return token_doc.get("access_token")
 
 
+@tracing.traced("zoho.refresh_token")
 async def _refresh_access_token(refresh_token: str) -> Optional[str]:
     """Refresh expired access token using refresh token."""
     config = get_zoho_config()
     
-    async with httpx.AsyncClient() as client:
+    async with httpx.AsyncClient(transport=tracing.TracedTransport("zoho")) as client:
         response = await client.post(
             f"{ZOHO_ACCOUNTS_URL}/oauth/v2/token",
             params={
@@ -143,6 +147,7 @@ async def _refresh_access_token(refresh_token: str) -> Optional[str]:
         return token_data["access_token"]
 
 
+@tracing.traced("zoho.upsert_contact")
 async def sync_customer_to_zoho(customer_data: Dict[str, Any]) -> Optional[str]:
     """
     Create or update a contact in Zoho CRM.
@@ -173,7 +178,7 @@ async def sync_customer_to_zoho(customer_data: Dict[str, Any]) -> Optional[str]:
     }
     
     try:
-        async with httpx.AsyncClient() as client:
+        async with httpx.AsyncClient(transport=tracing.TracedTransport("zoho")) as client:
             # First check if contact exists by phone
             existing = await _find_contact_by_phone(
                 customer_data.get("phone", ""),
@@ -213,6 +218,7 @@ async def sync_customer_to_zoho(customer_data: Dict[str, Any]) -> Optional[str]:
     return None
 
 
+@tracing.traced("zoho.create_deal")
 async def sync_order_to_zoho(order_data: Dict[str, Any], contact_id: Optional[str] = None) -> Optional[str]:
     """
     Create a deal in Zoho CRM for the order.
@@ -280,7 +286,7 @@ Observații: {customer.get('notes', '')}
         deal_payload["data"][0]["Contact_Name"] = contact_id
     
     try:
-        async with httpx.AsyncClient() as client:
+        async with httpx.AsyncClient(transport=tracing.TracedTransport("zoho")) as client:
             response = await client.post(
                 f"{ZOHO_API_URL}/Deals",
                 headers=headers,
@@ -311,6 +317,7 @@ Observații: {customer.get('notes', '')}
     return None
 
 
+@tracing.traced("zoho.update_deal")
 async def update_deal_status(deal_id: str, new_status: str) -> bool:
     """
     Update the stage of a deal based on order status.
@@ -342,7 +349,7 @@ async def update_deal_status(deal_id: str, new_status: str) -> bool:
     }
     
     try:
-        async with httpx.AsyncClient() as client:
+        async with httpx.AsyncClient(transport=tracing.TracedTransport("zoho")) as client:
             response = await client.put(
                 f"{ZOHO_API_URL}/Deals/{deal_id}",
                 headers=headers,
@@ -373,7 +380,7 @@ async def _find_contact_by_phone(phone: str, access_token: str) -> Optional[str]
     }
     
     try:
-        async with httpx.AsyncClient() as client:
+        async with httpx.AsyncClient(transport=tracing.TracedTransport("zoho")) as client:
             # Search by phone
             response = await client.get(
                 f"{ZOHO_API_URL}/Contacts/search",
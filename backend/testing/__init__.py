@@ -0,0 +1,15 @@
+"""
+In-process test harness for Panaghia
+Runs the FastAPI app through httpx's ASGI transport against an in-memory
+Motor-compatible database (mongomock-motor), with Stripe, Zoho and Resend
+replaced by recording fakes. Nothing leaves the process, so tests need no
+server, MongoDB or network and can run in parallel (pytest -n auto).
+The fixtures built on this live in tests/conftest.py.
+"""
+from testing.fake_db import new_database, use_database, seed_database, reset_process_state
+from testing.providers import FakeResend, FakeStripe, FakeZoho
+
+__all__ = [
+    "new_database", "use_database", "seed_database", "reset_process_state",
+    "FakeResend", "FakeStripe", "FakeZoho"
+]
@@ -0,0 +1,62 @@
+"""
+Fake database wiring for tests
+Each test gets its own mongomock-motor client, so data never leaks between
+tests or between xdist workers. Indexes are not created: mongomock has no
+2dsphere/TTL/capped support, and tests seed what they need explicitly.
+"""
+import uuid
+import functools
+from datetime import datetime, timezone
+
+from mongomock_motor import AsyncMongoMockClient
+
+import server
+from routes import auth
+from services import menu_index, driver_tracking, kitchen_service
+
+
+def new_database():
+    """A fresh, empty in-memory database"""
+    return AsyncMongoMockClient()[f"panaghia_test_{uuid.uuid4().hex[:8]}"]
+
+
+def reset_process_state():
+    """Clear the per-worker in-memory state that would otherwise carry over between tests"""
+    auth.login_attempts.clear()
+    driver_tracking._latest.clear()
+    driver_tracking._buffer.clear()
+    driver_tracking._subscribers.clear()
+    kitchen_service._subscribers.clear()
+
+
+def use_database(database):
+    """Point the app at `database` and start from a clean process state"""
+    server.set_database(database)
+    reset_process_state()
+
+
+# server.create_admin_user's default password
+ADMIN_PASSWORD = "Panaghia2026!"
+
+
+@functools.lru_cache(maxsize=None)
+def _password_hash(password: str) -> str:
+    # bcrypt is deliberately slow; hash once per worker, not once per test
+    return auth.hash_password(password)
+
+
+async def seed_database(admin_email: str):
+    """The data a fresh deployment starts with: menu, restaurant info, reviews and one admin"""
+    await server.seed_database()
+    await server.db.admin_users.insert_one({
+        "id": str(uuid.uuid4()),
+        "email": admin_email.lower(),
+        "hashed_password": _password_hash(ADMIN_PASSWORD),
+        "is_active": True,
+        "is_superadmin": True,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "last_login": None,
+        "failed_login_attempts": 0,
+        "locked_until": None
+    })
+    await menu_index.load()
@@ -0,0 +1,147 @@
+"""
+Recording fakes for the third-party providers
+Installed per test with pytest's monkeypatch, so nothing is ever sent:
+- FakeResend replaces the resend SDK that services/email_service.py calls
+- FakeStripe replaces emergentintegrations' StripeCheckout (imported inside
+  routes/payments.py handlers) and lets a test mark sessions paid
+- FakeZoho replaces the Zoho sync functions that orders and status
+  changes schedule, keeping the same side effect (zoho_deal_id on the order)
+"""
+import sys
+import json
+import types
+import uuid
+from typing import Dict, Any, List, Optional
+
+
+class FakeResend:
+    """Stands in for the `resend` module: resend.Emails.send(params) appends to `sent`"""
+
+    def __init__(self):
+        self.api_key = None
+        self.sent: List[Dict[str, Any]] = []
+        self.Emails = types.SimpleNamespace(send=self._send)
+
+    def _send(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        self.sent.append(params)
+        return {"id": f"email_{uuid.uuid4().hex[:12]}"}
+
+    def install(self, monkeypatch):
+        # Before email_service's `import resend` runs, whether or not the SDK is installed
+        monkeypatch.setitem(sys.modules, "resend", self)
+        from services import email_service
+        monkeypatch.setattr(email_service, "resend", self)
+        monkeypatch.setattr(email_service, "RESEND_API_KEY", "re_test")
+        return self
+
+
+class FakeStripe:
+    """Checkout sessions kept in memory; `pay()` or `webhook_body()` drive them to paid"""
+
+    MODULE = "emergentintegrations.payments.stripe.checkout"
+
+    def __init__(self):
+        self.sessions: Dict[str, Dict[str, Any]] = {}
+
+    def module(self) -> types.ModuleType:
+        fake = self
+        module = types.ModuleType(self.MODULE)
+
+        class CheckoutSessionRequest:
+            def __init__(self, amount: float, currency: str, success_url: str, cancel_url: str,
+                         metadata: Optional[Dict[str, str]] = None):
+                self.amount = amount
+                self.currency = currency
+                self.success_url = success_url
+                self.cancel_url = cancel_url
+                self.metadata = metadata or {}
+
+        class StripeCheckout:
+            def __init__(self, api_key: str, webhook_url: str):
+                self.api_key = api_key
+                self.webhook_url = webhook_url
+
+            async def create_checkout_session(self, request: CheckoutSessionRequest):
+                session_id = f"cs_test_{uuid.uuid4().hex[:16]}"
+                fake.sessions[session_id] = {
+                    "amount": request.amount,
+                    "currency": request.currency,
+                    "metadata": dict(request.metadata),
+                    "payment_status": "unpaid",
+                    "status": "open"
+                }
+                return types.SimpleNamespace(session_id=session_id, url=f"https://checkout.stripe.test/{session_id}")
+
+            async def get_checkout_status(self, session_id: str):
+                session = fake.sessions.get(session_id)
+                if session is None:
+                    raise ValueError(f"No such checkout session: {session_id}")
+                return types.SimpleNamespace(
+                    status=session["status"],
+                    payment_status=session["payment_status"],
+                    amount_total=int(round(session["amount"] * 100)),
+                    currency=session["currency"],
+                    metadata=session["metadata"]
+                )
+
+            async def handle_webhook(self, body: bytes, signature: Optional[str]):
+                if signature != "t=test":
+                    raise ValueError("Invalid signature")
+                event = json.loads(body)
+                session_id = event["session_id"]
+                return types.SimpleNamespace(
+                    event_type=event.get("event_type", "checkout.session.completed"),
+                    session_id=session_id,
+                    payment_status=fake.sessions[session_id]["payment_status"],
+                    metadata=fake.sessions[session_id]["metadata"]
+                )
+
+        module.CheckoutSessionRequest = CheckoutSessionRequest
+        module.StripeCheckout = StripeCheckout
+        return module
+
+    def pay(self, session_id: str):
+        self.sessions[session_id].update(payment_status="paid", status="complete")
+
+    def webhook_body(self, session_id: str) -> bytes:
+        """A checkout.session.completed event; send it with Stripe-Signature: t=test"""
+        self.pay(session_id)
+        return json.dumps({"event_type": "checkout.session.completed", "session_id": session_id}).encode()
+
+    def install(self, monkeypatch):
+        monkeypatch.setitem(sys.modules, self.MODULE, self.module())
+        monkeypatch.setenv("STRIPE_SECRET_KEY", "sk_test_fake")
+        monkeypatch.setenv("STRIPE_API_KEY", "sk_test_fake")
+        return self
+
+
+class FakeZoho:
+    """Records contact upserts, deals and deal stage updates"""
+
+    def __init__(self):
+        self.contacts: List[Dict[str, Any]] = []
+        self.deals: List[Dict[str, Any]] = []
+        self.deal_updates: List[tuple] = []
+
+    async def sync_customer_to_zoho(self, customer_data: Dict[str, Any]) -> Optional[str]:
+        self.contacts.append(dict(customer_data))
+        return f"contact-{len(self.contacts)}"
+
+    async def sync_order_to_zoho(self, order_data: Dict[str, Any], contact_id: Optional[str] = None) -> Optional[str]:
+        from services import zoho_service
+        deal_id = f"deal-{len(self.deals) + 1}"
+        self.deals.append({"order_id": order_data.get("id"), "contact_id": contact_id, "deal_id": deal_id})
+        await zoho_service.db.orders.update_one({"id": order_data.get("id")}, {"$set": {"zoho_deal_id": deal_id}})
+        return deal_id
+
+    async def update_deal_status(self, deal_id: str, new_status: str) -> bool:
+        self.deal_updates.append((deal_id, new_status))
+        return True
+
+    def install(self, monkeypatch):
+        from services import zoho_service
+        # Callers import these from zoho_service at call time
+        monkeypatch.setattr(zoho_service, "sync_customer_to_zoho", self.sync_customer_to_zoho)
+        monkeypatch.setattr(zoho_service, "sync_order_to_zoho", self.sync_order_to_zoho)
+        monkeypatch.setattr(zoho_service, "update_deal_status", self.update_deal_status)
+        return self
@@ -0,0 +1,69 @@
+"""
+Fixtures for the in-process tests (see backend/testing/)
+The live-server suites (test_panaghia_api.py, test_admin_auth_api.py) only
+run when REACT_APP_BACKEND_URL is set; everything else runs offline.
+"""
+import os
+import sys
+from pathlib import Path
+
+import httpx
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# server.py reads these at import; no MongoDB is ever contacted
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "panaghia_test")
+os.environ.setdefault("JWT_SECRET_KEY", "in-process-test-secret-key-0123456789")
+
+import server  # noqa: E402
+from routes.auth import create_access_token  # noqa: E402
+from services import background  # noqa: E402
+from testing import new_database, use_database, seed_database, FakeResend, FakeStripe, FakeZoho  # noqa: E402
+
+ADMIN_EMAIL = "admin@panaghia.ro"
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def resend(monkeypatch):
+    return FakeResend().install(monkeypatch)
+
+
+@pytest.fixture
+def stripe(monkeypatch):
+    return FakeStripe().install(monkeypatch)
+
+
+@pytest.fixture
+def zoho(monkeypatch):
+    return FakeZoho().install(monkeypatch)
+
+
+@pytest.fixture
+async def db(resend, stripe, zoho):
+    """Isolated, seeded database for one test, with every provider faked"""
+    database = new_database()
+    use_database(database)
+    await seed_database(ADMIN_EMAIL)
+    yield database
+    # Let emails/Zoho syncs spawned by the test finish against this test's fakes
+    await background.drain(timeout=5)
+
+
+@pytest.fixture
+async def client(db):
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://panaghia.test") as http:
+        yield http
+
+
+@pytest.fixture
+def admin_headers(db):
+    token = create_access_token({"sub": ADMIN_EMAIL})
+    return {"Authorization": f"Bearer {token}"}
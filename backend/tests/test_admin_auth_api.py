@@ -9,6 +9,9 @@ import time
 
 BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
 
+# Runs against a deployed server; the offline suite is test_inprocess_api.py
+pytestmark = pytest.mark.skipif(not BASE_URL, reason="REACT_APP_BACKEND_URL not set")
+
 # Admin credentials
 ADMIN_EMAIL = "panaghia8688@yahoo.com"
 ADMIN_PASSWORD = "Panaghia2026!"
@@ -242,6 +245,80 @@ class TestAdminOrders:
         print(f"SUCCESS: Invalid status correctly rejected")
 
 
+    def test_delivered_order_cannot_be_reopened(self, auth_token):
+        """Test the order state machine rejects backwards transitions"""
+        order_data = {
+            "items": [
+                {"menu_item_id": "1", "name": "TEST_Item", "price": 10, "quantity": 1}
+            ],
+            "customer": {
+                "name": "TEST_State Machine",
+                "phone": "0740999666"
+            },
+            "order_type": "pickup",
+            "payment_method": "cash"
+        }
+        create_response = requests.post(f"{BASE_URL}/api/orders/", json=order_data)
+        order_id = create_response.json()["id"]
+        headers = {"Authorization": f"Bearer {auth_token}"}
+        
+        delivered = requests.patch(
+            f"{BASE_URL}/api/admin/orders/{order_id}/status",
+            json={"status": "delivered", "version": 0},
+            headers=headers
+        )
+        assert delivered.status_code == 200
+        assert delivered.json()["version"] == 1
+        
+        reopen = requests.patch(
+            f"{BASE_URL}/api/admin/orders/{order_id}/status",
+            json={"status": "pending"},
+            headers=headers
+        )
+        assert reopen.status_code == 409
+        assert "nu poate trece din delivered" in reopen.json()["detail"]
+        print(f"SUCCESS: Backwards transition rejected")
+
+    def test_stale_version_is_rejected(self, auth_token):
+        """Test an allowed transition with an outdated version is a conflict, not applied"""
+        order_data = {
+            "items": [
+                {"menu_item_id": "1", "name": "TEST_Item", "price": 10, "quantity": 1}
+            ],
+            "customer": {
+                "name": "TEST_Stale Version",
+                "phone": "0740999555"
+            },
+            "order_type": "pickup",
+            "payment_method": "cash"
+        }
+        create_response = requests.post(f"{BASE_URL}/api/orders/", json=order_data)
+        order_id = create_response.json()["id"]
+        headers = {"Authorization": f"Bearer {auth_token}"}
+        
+        preparing = requests.patch(
+            f"{BASE_URL}/api/admin/orders/{order_id}/status",
+            json={"status": "preparing", "version": 0},
+            headers=headers
+        )
+        assert preparing.status_code == 200
+        assert preparing.json()["version"] == 1
+        
+        # preparing -> ready is allowed; only the version is out of date
+        stale = requests.patch(
+            f"{BASE_URL}/api/admin/orders/{order_id}/status",
+            json={"status": "ready", "version": 0},
+            headers=headers
+        )
+        assert stale.status_code == 409
+        assert "modificată între timp" in stale.json()["detail"]
+        
+        order = requests.get(f"{BASE_URL}/api/orders/{order_id}").json()
+        assert order["status"] == "preparing"
+        assert order["version"] == 1
+        print(f"SUCCESS: Stale version rejected")
+
+
 class TestAdminMenuItems:
     """Admin menu items CRUD tests"""
     
@@ -0,0 +1,271 @@
+"""
+Panaghia API Tests - in-process
+The same flows as the live suites, run through the ASGI app against a fake
+database with Stripe, Zoho and Resend faked (fixtures in conftest.py)
+"""
+import uuid
+
+import pytest
+
+from services import background, delivery_geo, idempotency_service
+
+pytestmark = pytest.mark.anyio
+
+
+def pickup_order(*items, **customer):
+    return {
+        "items": [{"menu_item_id": item_id, "quantity": quantity} for item_id, quantity in items],
+        "customer": {"name": "TEST_User", "phone": "0740111222", **customer},
+        "order_type": "pickup",
+        "payment_method": "cash"
+    }
+
+
+def delivery_order(*items, address="Str. Dornelor nr. 10, Vatra Dornei"):
+    return {**pickup_order(*items, address=address), "order_type": "delivery"}
+
+
+ZONE = {"id": "TEST_zone", "name": "Centru", "fee": 7, "min_order": 50, "is_active": True}
+
+
+@pytest.fixture
+async def zones(db, monkeypatch):
+    """One active zone; the fake database has no $geoIntersects, so membership is set per test"""
+    await db.delivery_zones.insert_one(dict(ZONE))
+    containing = {"zone": ZONE}
+
+    async def find_zone(lat, lng):
+        return containing["zone"]
+
+    monkeypatch.setattr(delivery_geo, "find_zone", find_zone)
+    return containing
+
+
+class TestPublicEndpoints:
+    """Health, menu and restaurant info"""
+
+    async def test_health_check(self, client):
+        response = await client.get("/api/health")
+        assert response.status_code == 200
+        assert response.json()["status"] == "healthy"
+
+    async def test_menu_is_seeded(self, client):
+        categories = await client.get("/api/menu/categories")
+        assert categories.status_code == 200
+        assert len(categories.json()) == 6
+
+        item = await client.get("/api/menu/items/1")
+        assert item.status_code == 200
+        assert item.json()["price"] == 18
+
+    async def test_each_test_gets_an_empty_order_collection(self, client, db):
+        assert await db.orders.count_documents({}) == 0
+        response = await client.get("/api/orders/")
+        assert response.json() == []
+
+
+class TestOrders:
+    """Order creation, pricing, idempotency and side effects"""
+
+    async def test_create_order_uses_menu_prices(self, client):
+        order_data = pickup_order(("1", 2), ("5", 1))
+        order_data["items"][0]["price"] = 1  # client prices are ignored
+
+        response = await client.post("/api/orders/", json=order_data)
+        assert response.status_code == 200
+        data = response.json()
+        assert data["order_number"].startswith("ORD-")
+        assert data["status"] == "pending"
+        assert data["total"] == 64  # 18*2 + 28*1
+
+    async def test_unknown_menu_item_is_rejected(self, client, db):
+        response = await client.post("/api/orders/", json=pickup_order(("TEST_does-not-exist", 1)))
+        assert response.status_code == 400
+        assert await db.orders.count_documents({}) == 0
+
+    async def test_new_order_notifies_admin_and_syncs_zoho(self, client, db, resend, zoho):
+        response = await client.post("/api/orders/", json=pickup_order(("2", 1)))
+        order = response.json()
+        await background.drain(timeout=5)
+
+        assert len(resend.sent) == 1
+        assert order["order_number"] in resend.sent[0]["subject"]
+        assert zoho.contacts[0]["phone"] == "0740111222"
+        assert zoho.deals[0]["order_id"] == order["id"]
+        stored = await db.orders.find_one({"id": order["id"]})
+        assert stored["zoho_deal_id"] == zoho.deals[0]["deal_id"]
+
+    async def test_idempotent_retry(self, client, db, resend):
+        headers = {"Idempotency-Key": f"TEST_{uuid.uuid4()}"}
+        order_data = pickup_order(("2", 1))
+
+        first = await client.post("/api/orders/", json=order_data, headers=headers)
+        retry = await client.post("/api/orders/", json=order_data, headers=headers)
+        assert first.status_code == retry.status_code == 200
+        assert retry.json()["id"] == first.json()["id"]
+
+        order_data["items"][0]["quantity"] = 2
+        mismatch = await client.post("/api/orders/", json=order_data, headers=headers)
+        assert mismatch.status_code == 422
+
+        await background.drain(timeout=5)
+        assert await db.orders.count_documents({}) == 1
+        assert len(resend.sent) == 1
+
+    async def test_order_is_returned_when_storing_the_response_fails(self, client, db, resend, monkeypatch):
+        async def complete(*args):
+            raise RuntimeError("write concern timeout")
+
+        monkeypatch.setattr(idempotency_service, "complete", complete)
+        response = await client.post("/api/orders/", json=pickup_order(("2", 1)), headers={"Idempotency-Key": "TEST_unstored"})
+        assert response.status_code == 200
+        assert await db.orders.count_documents({"id": response.json()["id"]}) == 1
+
+        await background.drain(timeout=5)
+        assert len(resend.sent) == 1
+
+    async def test_delivery_in_zone_pays_the_zone_fee(self, client, zones):
+        response = await client.post("/api/orders/", json=delivery_order(("1", 2), ("5", 1)))
+        assert response.status_code == 200
+        data = response.json()
+        assert data["delivery_zone"] == {"id": "TEST_zone", "name": "Centru"}
+        assert data["subtotal"] == 64
+        assert data["delivery_fee"] == 7
+        assert data["total"] == 71
+
+    async def test_delivery_outside_zones_is_rejected(self, client, db, zones):
+        zones["zone"] = None
+        response = await client.post("/api/orders/", json=delivery_order(("1", 2), ("5", 1)))
+        assert response.status_code == 422
+        assert await db.orders.count_documents({}) == 0
+
+    async def test_delivery_below_zone_minimum_is_rejected(self, client, db, zones):
+        response = await client.post("/api/orders/", json=delivery_order(("1", 2)))
+        assert response.status_code == 422
+        assert "50 lei" in response.json()["detail"]
+        assert await db.orders.count_documents({}) == 0
+
+
+class TestAdmin:
+    """Login, dashboard and the order state machine"""
+
+    async def test_login(self, client):
+        response = await client.post("/api/auth/login", json={
+            "email": "admin@panaghia.ro", "password": "Panaghia2026!"
+        })
+        assert response.status_code == 200
+        assert response.json()["token_type"] == "bearer"
+
+        wrong = await client.post("/api/auth/login", json={
+            "email": "admin@panaghia.ro", "password": "wrong"
+        })
+        assert wrong.status_code == 401
+
+    async def test_dashboard_requires_auth(self, client, admin_headers):
+        assert (await client.get("/api/admin/dashboard")).status_code in (401, 403)
+
+        await client.post("/api/orders/", json=pickup_order(("1", 1)))
+        response = await client.get("/api/admin/dashboard", headers=admin_headers)
+        assert response.status_code == 200
+        assert response.json()["total_orders"] == 1
+        assert response.json()["pending_orders"] == 1
+
+    async def test_status_changes_follow_the_state_machine(self, client, admin_headers, zoho):
+        order = (await client.post("/api/orders/", json=pickup_order(("1", 1)))).json()
+        await background.drain(timeout=5)
+        url = f"/api/admin/orders/{order['id']}/status"
+
+        delivered = await client.patch(url, json={"status": "delivered", "version": 0}, headers=admin_headers)
+        assert delivered.status_code == 200
+        assert delivered.json()["version"] == 1
+
+        reopen = await client.patch(url, json={"status": "pending"}, headers=admin_headers)
+        assert reopen.status_code == 409
+
+        await background.drain(timeout=5)
+        assert zoho.deal_updates == [(zoho.deals[0]["deal_id"], "delivered")]
+
+
+class TestPayments:
+    """Stripe checkout against the fake"""
+
+    async def test_checkout_then_status_marks_order_paid(self, client, db, stripe):
+        order = (await client.post("/api/orders/", json=pickup_order(("1", 1)))).json()
+
+        checkout = await client.post("/api/payments/checkout", json={
+            "order_id": order["id"], "origin_url": "http://panaghia.test"
+        })
+        assert checkout.status_code == 200
+        session_id = checkout.json()["session_id"]
+        assert stripe.sessions[session_id]["amount"] == 18
+
+        stripe.pay(session_id)
+        status = await client.get(f"/api/payments/status/{session_id}")
+        assert status.status_code == 200
+        assert status.json()["payment_status"] == "paid"
+        assert status.json()["amount_total"] == 18
+
+        stored = await db.orders.find_one({"id": order["id"]})
+        assert stored["payment_status"] == "paid"
+
+    async def test_webhook_marks_order_paid(self, client, db, stripe):
+        order = (await client.post("/api/orders/", json=pickup_order(("1", 1)))).json()
+        session_id = (await client.post("/api/payments/checkout", json={
+            "order_id": order["id"], "origin_url": "http://panaghia.test"
+        })).json()["session_id"]
+
+        response = await client.post(
+            "/api/webhook/stripe",
+            content=stripe.webhook_body(session_id),
+            headers={"Stripe-Signature": "t=test"}
+        )
+        assert response.json()["status"] == "success"
+
+        stored = await db.orders.find_one({"id": order["id"]})
+        assert stored["payment_status"] == "paid"
+
+
+def past_order(order_id, created_at, status="delivered", total=40):
+    return {
+        "id": order_id,
+        "order_number": f"ORD-{order_id}",
+        "items": [{"menu_item_id": "1", "name": "Ciorbă de burtă", "price": 18, "quantity": 2}],
+        "customer": {"name": "TEST_User", "phone": "0740111222"},
+        "total": total,
+        "status": status,
+        "order_type": "pickup",
+        "payment_method": "cash",
+        "created_at": created_at
+    }
+
+
+class TestArchive:
+    """Moving old closed orders out of db.orders without changing the dashboard"""
+
+    async def test_archive_run_keeps_dashboard_totals(self, client, db, admin_headers):
+        await db.orders.insert_many([
+            past_order("jan-1", "2025-01-10T12:00:00+00:00", total=40),
+            past_order("jan-2", "2025-01-20T12:00:00+00:00", total=55),
+            past_order("feb-1", "2025-02-03T12:00:00+00:00", status="cancelled", total=30),
+            past_order("feb-open", "2025-02-04T12:00:00+00:00", status="pending", total=25),
+        ])
+        await client.post("/api/orders/", json=pickup_order(("1", 2)))
+
+        before = (await client.get("/api/admin/dashboard", headers=admin_headers)).json()
+        response = await client.post("/api/admin/archive/run?older_than_days=90", headers=admin_headers)
+        assert response.status_code == 200
+        assert response.json()["by_month"] == {"2025-01": 2, "2025-02": 1}
+
+        after = (await client.get("/api/admin/dashboard", headers=admin_headers)).json()
+        for field in ("total_orders", "total_revenue", "orders_by_status", "popular_items"):
+            assert after[field] == before[field]
+        assert after["total_orders"] == 5
+
+        # Open and recent orders stay; the rest moved to their month's collection
+        remaining = {order["id"] async for order in db.orders.find({}, {"id": 1})}
+        assert "feb-open" in remaining and len(remaining) == 2
+        assert {o["id"] async for o in db.orders_archive_2025_01.find()} == {"jan-1", "jan-2"}
+        assert {o["id"] async for o in db.orders_archive_2025_02.find()} == {"feb-1"}
+
+        again = await client.post("/api/admin/archive/run?older_than_days=90", headers=admin_headers)
+        assert again.json()["archived"] == 0
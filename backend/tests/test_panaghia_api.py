@@ -5,9 +5,13 @@ Tests for: health, restaurant info, menu categories, menu items, daily menu, rev
 import pytest
 import requests
 import os
+import uuid
 
 BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
 
+# Runs against a deployed server; the offline suite is test_inprocess_api.py
+pytestmark = pytest.mark.skipif(not BASE_URL, reason="REACT_APP_BACKEND_URL not set")
+
 
 class TestHealthEndpoint:
     """Health check endpoint tests"""
@@ -223,6 +227,56 @@ class TestOrders:
         assert data["total"] == 66  # 22*3
         assert data["customer"]["address"] == "Str. Test nr. 123, Vatra Dornei"
     
+    def test_create_order_uses_menu_prices(self):
+        """Test order totals come from the menu, not client-supplied prices"""
+        order_data = {
+            "items": [
+                {"menu_item_id": "1", "name": "Ciorbă de burtă", "price": 1, "quantity": 2}
+            ],
+            "customer": {
+                "name": "TEST_User Pricing",
+                "phone": "0740777888"
+            },
+            "order_type": "pickup",
+            "payment_method": "cash"
+        }
+        
+        response = requests.post(f"{BASE_URL}/api/orders/", json=order_data)
+        assert response.status_code == 200
+        assert response.json()["total"] == 36  # 18*2 from the menu
+        
+        order_data["items"][0]["menu_item_id"] = "TEST_does-not-exist"
+        response = requests.post(f"{BASE_URL}/api/orders/", json=order_data)
+        assert response.status_code == 400
+    
+    def test_create_order_idempotent_retry(self):
+        """Test retrying with the same Idempotency-Key returns the original order"""
+        order_data = {
+            "items": [
+                {"menu_item_id": "2", "name": "Ciorbă de perișoare", "price": 15, "quantity": 1}
+            ],
+            "customer": {
+                "name": "TEST_User Retry",
+                "phone": "0740555666"
+            },
+            "order_type": "pickup",
+            "payment_method": "cash"
+        }
+        headers = {"Idempotency-Key": f"TEST_{uuid.uuid4()}"}
+        
+        first = requests.post(f"{BASE_URL}/api/orders/", json=order_data, headers=headers)
+        assert first.status_code == 200
+        
+        retry = requests.post(f"{BASE_URL}/api/orders/", json=order_data, headers=headers)
+        assert retry.status_code == 200
+        assert retry.json()["id"] == first.json()["id"]
+        assert retry.json()["order_number"] == first.json()["order_number"]
+        
+        # Same key with a different payload is rejected
+        order_data["items"][0]["quantity"] = 2
+        mismatch = requests.post(f"{BASE_URL}/api/orders/", json=order_data, headers=headers)
+        assert mismatch.status_code == 422
+    
     def test_get_orders(self):
         """Test getting all orders"""
         response = requests.get(f"{BASE_URL}/api/orders/")
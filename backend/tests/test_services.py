@@ -0,0 +1,297 @@
+"""
+Panaghia service tests - in-process
+Service functions called directly, against the same fake database and
+fixtures as test_inprocess_api.py
+"""
+import json
+import math
+from datetime import datetime, timezone
+
+import httpx
+import numpy as np
+import pytest
+
+from services import idempotency_service, kitchen_service, delivery_routing, geocoding_service, background, metrics, tracing
+
+pytestmark = pytest.mark.anyio
+
+
+def active_order(order_id, *items):
+    return {
+        "id": order_id,
+        "order_number": f"ORD-{order_id}",
+        "status": "confirmed",
+        "items": [{"menu_item_id": item_id, "name": f"Item {item_id}", "quantity": quantity} for item_id, quantity in items]
+    }
+
+
+def stop(order_id, north_m=0.0, east_m=0.0, ready_at="2026-06-01T12:00:00+00:00"):
+    """Delivery stop placed in metres from the restaurant"""
+    restaurant = delivery_routing.get_restaurant_location()
+    metres_per_degree = math.pi * delivery_routing.EARTH_RADIUS_M / 180
+    return {
+        "id": order_id,
+        "coordinates": {
+            "lat": restaurant["lat"] + north_m / metres_per_degree,
+            "lng": restaurant["lng"] + east_m / (metres_per_degree * math.cos(math.radians(restaurant["lat"])))
+        },
+        "status_history": [{"status": "ready", "at": ready_at}]
+    }
+
+
+class TestKitchenPrepList:
+    """Running totals and recovery rebuild"""
+
+    async def test_rebuild_recomputes_from_active_orders(self, db):
+        await db.orders.insert_one(active_order("a", ("1", 2), ("5", 1)))
+        await db.orders.insert_one({**active_order("b", ("1", 4)), "status": "delivered"})
+        await db.kitchen_prep_totals.insert_one({"_id": "9", "name": "Stale", "quantity": 3})
+
+        prep_list = await kitchen_service.rebuild()
+        assert {item["menu_item_id"]: item["quantity"] for item in prep_list} == {"1": 2, "5": 1}
+        assert await db.kitchen_prep_totals.count_documents({"_id": "9"}) == 0
+
+    async def test_delta_during_rebuild_is_kept(self, db, monkeypatch):
+        await db.orders.insert_one(active_order("a", ("1", 2)))
+        await kitchen_service.apply_status_change(active_order("a", ("1", 2)), "pending", "confirmed")
+        await db.kitchen_prep_totals.insert_one({"_id": "9", "name": "Stale", "quantity": 3})
+        late_order = active_order("b", ("1", 3), ("5", 1))
+
+        orders = db.orders
+        confirmed = []
+
+        async def scan_then_confirm(cursor):
+            async for order in cursor:
+                yield order
+            # Order b is confirmed after rebuild scanned the orders, before it writes the totals
+            if not confirmed:
+                confirmed.append(True)
+                await orders.insert_one(dict(late_order))
+                await kitchen_service.apply_status_change(late_order, "pending", "confirmed")
+
+        class Orders:
+            def find(self, *args, **kwargs):
+                return scan_then_confirm(orders.find(*args, **kwargs))
+
+            def __getattr__(self, name):
+                return getattr(orders, name)
+
+        class Database:
+            def __getattr__(self, name):
+                return Orders() if name == "orders" else getattr(db, name)
+
+        monkeypatch.setattr(kitchen_service, "db", Database())
+        await kitchen_service.rebuild()
+
+        assert confirmed
+        quantities = {doc["_id"]: doc["quantity"] async for doc in db.kitchen_prep_totals.find()}
+        # Item 1 was moved by the live $inc (not overwritten with the scanned 2),
+        # item 5 only exists through it, and the stale item 9 is gone
+        assert quantities == {"1": 5, "5": 1}
+
+
+class TestDeliveryRouting:
+    """Distance matrix, route ordering and driver batches"""
+
+    def test_distance_matrix_is_symmetric_haversine(self):
+        dist = delivery_routing.distance_matrix(np.array([[47.0, 25.0], [47.01, 25.0], [47.0, 25.01]]))
+        assert np.allclose(dist, dist.T)
+        assert np.allclose(np.diag(dist), 0)
+        assert dist[0, 1] == pytest.approx(1112, abs=1)  # 0.01 degrees of latitude
+        assert dist[0, 2] == pytest.approx(1112 * math.cos(math.radians(47)), abs=1)
+
+    def test_two_opt_uncrosses_a_square(self):
+        square = np.array([[47.0, 25.0], [47.0, 25.01], [47.01, 25.01], [47.01, 25.0]])
+        dist = delivery_routing.distance_matrix(square)
+        crossed = np.array([0, 2, 1, 3, 0])
+
+        route = delivery_routing.two_opt(crossed, dist)
+        length = sum(dist[a, b] for a, b in zip(route[:-1], route[1:]))
+        assert route[0] == route[-1] == 0
+        assert sorted(route[1:-1]) == [1, 2, 3]
+        assert length == pytest.approx(dist[0, 1] + dist[1, 2] + dist[2, 3] + dist[3, 0])
+
+    def test_plan_route_visits_stops_in_driving_order(self):
+        stops = [stop("b", east_m=2000), stop("a", east_m=1000), stop("c", east_m=3000), {"id": "no-address"}]
+
+        route = delivery_routing.plan_route(stops)
+        assert [s["id"] for s in route["stops"]] == ["a", "b", "c"]
+        assert [s["sequence"] for s in route["stops"]] == [1, 2, 3]
+        assert [s["cumulative_distance_m"] for s in route["stops"]] == pytest.approx([1000, 2000, 3000], abs=2)
+        assert route["total_distance_m"] == pytest.approx(6000, abs=2)  # back to the restaurant
+        assert [s["id"] for s in route["unrouted"]] == ["no-address"]
+
+    def test_open_route_ends_at_the_far_stop(self):
+        stops = [stop("east-1", east_m=1000), stop("east-2", east_m=2000), stop("west", east_m=-500)]
+
+        closed = delivery_routing.plan_route(stops)
+        open_path = delivery_routing.plan_route(stops, return_to_restaurant=False)
+        # Closed, every order costs 5 km; open, the short side comes first and there is no return leg
+        assert closed["total_distance_m"] == pytest.approx(5000, abs=2)
+        assert [s["id"] for s in open_path["stops"]] == ["west", "east-1", "east-2"]
+        assert open_path["total_distance_m"] == open_path["stops"][-1]["cumulative_distance_m"]
+        assert open_path["total_distance_m"] == pytest.approx(3000, abs=2)
+
+    def test_batches_split_past_the_spread_limit(self):
+        # c is 1600 m past b, b is 1400 m past a: c rides alone, a and b share a run
+        stops = [stop("a", north_m=2000), stop("b", north_m=3400), stop("c", north_m=5000)]
+
+        plan = delivery_routing.plan_batches(stops, drivers=2, capacity=4, window_minutes=15)
+        runs = sorted(sorted(s["id"] for s in batch["stops"]) for batch in plan["batches"])
+        assert runs == [["a", "b"], ["c"]]
+        assert sorted(batch["driver"] for batch in plan["batches"]) == [1, 2]
+
+    def test_batches_split_by_ready_window(self):
+        stops = [
+            stop("first", north_m=1000, ready_at="2026-06-01T12:00:00+00:00"),
+            stop("later", north_m=1100, ready_at="2026-06-01T12:30:00+00:00")
+        ]
+
+        plan = delivery_routing.plan_batches(stops, drivers=1, capacity=4, window_minutes=15)
+        assert [[s["id"] for s in batch["stops"]] for batch in plan["batches"]] == [["first"], ["later"]]
+        assert plan["batches"][1]["depart_at"] == datetime(2026, 6, 1, 12, 30, tzinfo=timezone.utc).isoformat()
+        assert [batch["driver"] for batch in plan["batches"]] == [1, 1]
+
+
+STREETS = json.loads(geocoding_service.GAZETTEER_PATH.read_text(encoding="utf-8"))["streets"]
+
+
+class TestGeocoding:
+    """Address normalization, gazetteer lookup and the confirmed-position cache"""
+
+    @pytest.mark.parametrize("address, normalized", [
+        ("Str. Dornelor nr.10, Vatra Dornei", "strada dornelor nr 10"),
+        ("Strada Ștefan cel Mare 12", "strada stefan cel mare 12"),
+        ("str.Gării nr 3 bl. A2 sc. 1 ap. 4", "strada garii nr 3 bloc a 2 scara 1 ap 4"),
+        ("Bd. Unirii 5, jud. Suceava, România", "bulevardul unirii 5"),
+        ("Bdul 1 Mai nr 2", "bulevardul 1 mai nr 2"),
+        ("Calea Transilvaniei, nr. 45A", "calea transilvaniei nr 45a"),
+        ("Strada George Coșbuc, 725700 Vatra Dornei", "strada george cosbuc"),
+        ("Str. Dornelor, Judetul Suceava", "strada dornelor"),
+    ])
+    def test_normalize_address(self, address, normalized):
+        assert geocoding_service.normalize_address(address) == normalized
+
+    @pytest.mark.parametrize("normalized, street, number", [
+        ("strada dornelor nr 10", "strada dornelor", "10"),
+        ("strada stefan cel mare 12", "strada stefan cel mare", "12"),
+        ("strada 22 decembrie nr 7", "strada 22 decembrie", "7"),
+        ("strada garii nr 3 bloc a 2 scara 1 ap 4", "strada garii", "3"),
+        ("calea transilvaniei nr 45a", "calea transilvaniei", "45a"),
+        ("aleea parcului bloc 4", "aleea parcului", None),
+        ("mihai eminescu 20", "mihai eminescu", "20"),
+    ])
+    def test_split_street(self, normalized, street, number):
+        assert geocoding_service.split_street(normalized) == (street, number)
+
+    @pytest.mark.parametrize("address, street", [
+        ("Str. Dornelor nr.10, Vatra Dornei", "strada dornelor"),
+        ("Strada Ștefan cel Mare 12", "strada stefan cel mare"),
+        ("str.Gării nr 3 bl. A2 sc. 1 ap. 4", "strada garii"),
+        ("Str. 22 Decembrie nr. 7", "strada 22 decembrie"),
+        ("Mihai Eminescu 20", "strada mihai eminescu"),
+        ("Calea Transilvaniei, nr. 45A", "calea transilvaniei"),
+        ("Strada George Coșbuc, 725700 Vatra Dornei", "strada george cosbuc"),
+        ("Str. Dornelor, jud. Suceava", "strada dornelor"),
+    ])
+    async def test_geocode_from_gazetteer(self, db, address, street):
+        position = await geocoding_service.geocode(address)
+        assert (position["lat"], position["lng"]) == tuple(STREETS[street])
+        assert position["source"] == "gazetteer"
+        assert position["precision"] == "street"
+
+    @pytest.mark.parametrize("address", [None, "", "Vatra Dornei, România", "Bdul 1 Mai nr 2"])
+    async def test_geocode_unresolved(self, db, address):
+        assert await geocoding_service.geocode(address) is None
+
+    async def test_remembered_position_is_served_from_cache(self, db):
+        await geocoding_service.remember("Str. Dornelor nr. 10, Vatra Dornei", 47.3461, 25.3567)
+
+        # Same building, written differently and with apartment details
+        cached = await geocoding_service.geocode("strada Dornelor 10, ap. 3")
+        assert cached == {"lat": 47.3461, "lng": 25.3567, "source": "cache", "precision": "address"}
+        # Another house number on the street still gets the street centroid
+        other = await geocoding_service.geocode("Str. Dornelor nr. 12")
+        assert other["source"] == "gazetteer"
+
+        await geocoding_service.remember("Strada Dornelor 10", 47.3462, 25.3568)
+        entry = await db.geocode_cache.find_one({"_id": "strada dornelor nr 10"})
+        assert (entry["lat"], entry["lng"], entry["confirmations"]) == (47.3462, 25.3568, 2)
+
+
+class TestBackground:
+    """spawn() context handling"""
+
+    async def test_spawned_task_does_not_inherit_the_request(self):
+        seen = {}
+
+        async def side_effect():
+            seen["scope"] = metrics.request_scope.get()
+
+        token = metrics.request_scope.set({"type": "http", "method": "POST", "path": "/api/orders/"})
+        try:
+            await background.spawn(side_effect(), name="side_effect")
+            # Only the task's copy of the context was cleared
+            assert metrics.request_scope.get()["path"] == "/api/orders/"
+        finally:
+            metrics.request_scope.reset(token)
+
+        assert seen == {"scope": None}
+
+
+class TestTraceExport:
+    """flush() with one failing sink"""
+
+    async def test_file_failure_still_exports_to_otlp(self, tmp_path, monkeypatch):
+        received = []
+
+        def collector(request):
+            received.append(json.loads(request.content))
+            return httpx.Response(200)
+
+        real_client = httpx.AsyncClient
+        monkeypatch.setattr(tracing.httpx, "AsyncClient", lambda: real_client(transport=httpx.MockTransport(collector)))
+        monkeypatch.setenv("TRACE_EXPORT_PATH", str(tmp_path))  # a directory: the append fails
+        monkeypatch.setenv("TRACE_OTLP_ENDPOINT", "http://collector.test/v1/traces")
+        dropped = tracing.spans_dropped.get()
+
+        with tracing.span("request"):
+            pass
+        assert await tracing.flush() == 1
+        assert len(received) == 1
+        assert tracing.spans_dropped.get() == dropped
+
+        monkeypatch.setenv("TRACE_OTLP_ENDPOINT", "")
+        with tracing.span("request"):
+            pass
+        assert await tracing.flush() == 0
+        assert tracing.spans_dropped.get() == dropped + 1
+
+
+class TestIdempotency:
+    """Storing the response of a reserved key"""
+
+    async def test_complete_retries_a_failed_write(self, db, monkeypatch):
+        await idempotency_service.begin("orders:create", "TEST_key", "hash")
+        keys = db.idempotency_keys
+        failures = []
+
+        async def flaky_update_one(*args, **kwargs):
+            if not failures:
+                failures.append(True)
+                raise RuntimeError("not primary")
+            return await keys.update_one(*args, **kwargs)
+
+        class Keys:
+            def __getattr__(self, name):
+                return flaky_update_one if name == "update_one" else getattr(keys, name)
+
+        class Database:
+            idempotency_keys = Keys()
+
+        monkeypatch.setattr(idempotency_service, "db", Database())
+        await idempotency_service.complete("orders:create", "TEST_key", {"id": "a"})
+
+        assert failures
+        monkeypatch.setattr(idempotency_service, "db", db)
+        assert await idempotency_service.begin("orders:create", "TEST_key", "hash") == {"id": "a"}
@@ -20,6 +20,13 @@ const Order = ({ cart = [], onUpdateCart, onRemoveFromCart, onClearCart }) => {
   const [error, setError] = useState(null);
   const [restaurantInfo, setRestaurantInfo] = useState({ phone: '0746 254 162' });
   const [paymentSuccess, setPaymentSuccess] = useState(false);
+  // One key per checkout attempt: resubmitting the same order replays it instead of duplicating it
+  const [idempotencyKey, setIdempotencyKey] = useState(() => crypto.randomUUID());
+  const [deliveryCheck, setDeliveryCheck] = useState(null);
+
+  useEffect(() => {
+    setIdempotencyKey(crypto.randomUUID());
+  }, [cart, orderType, paymentMethod, customerInfo]);
 
   useEffect(() => {
     const fetchRestaurantInfo = async () => {
@@ -58,7 +65,20 @@ const Order = ({ cart = [], onUpdateCart, onRemoveFromCart, onClearCart }) => {
   };
 
   const subtotal = cart.reduce((sum, item) => sum + (item.price * item.quantity), 0);
-  const deliveryFee = orderType === 'delivery' ? 10 : 0;
+  const deliveryFee = orderType === 'delivery' ? (deliveryCheck?.fee ?? 10) : 0;
+
+  const checkDeliveryAddress = async () => {
+    if (!customerInfo.address.trim()) {
+      setDeliveryCheck(null);
+      return;
+    }
+    try {
+      setDeliveryCheck(await ordersApi.checkDelivery(customerInfo.address));
+    } catch (err) {
+      console.error('Error checking delivery address:', err);
+      setDeliveryCheck(null);
+    }
+  };
   const total = subtotal + deliveryFee;
 
   const handleSubmit = async (e) => {
@@ -85,7 +105,7 @@ const Order = ({ cart = [], onUpdateCart, onRemoveFromCart, onClearCart }) => {
         payment_method: paymentMethod
       };
 
-      const result = await ordersApi.create(orderData);
+      const result = await ordersApi.create(orderData, idempotencyKey);
 
       // If card payment, redirect to Stripe
       if (paymentMethod === 'card') {
@@ -372,11 +392,17 @@ const Order = ({ cart = [], onUpdateCart, onRemoveFromCart, onClearCart }) => {
                       name="address"
                       value={customerInfo.address}
                       onChange={handleChange}
+                      onBlur={checkDeliveryAddress}
                       required
                       className="w-full px-4 py-3 rounded-xl border border-gray-200 focus:outline-none focus:border-[#D4A847] focus:ring-2 focus:ring-[#D4A847]/20 transition-all"
                       placeholder="Strada, nr., bloc, apart."
                       data-testid="address-input"
                     />
+                    {deliveryCheck && !deliveryCheck.deliverable && (
+                      <p className="mt-2 text-sm text-red-600" data-testid="delivery-area-warning">
+                        Nu livrăm încă la această adresă.
+                      </p>
+                    )}
                   </div>
                 )}
                 <div>
@@ -5,13 +5,12 @@ const API_URL = process.env.REACT_APP_BACKEND_URL || '';
 const apiCall = async (endpoint, options = {}) => {
   const url = `${API_URL}/api${endpoint}`;
   
-  const defaultOptions = {
-    headers: {
-      'Content-Type': 'application/json',
-    },
+  const headers = {
+    'Content-Type': 'application/json',
+    ...(options.headers || {}),
   };
   
-  const response = await fetch(url, { ...defaultOptions, ...options });
+  const response = await fetch(url, { ...options, headers });
   
   if (!response.ok) {
     const error = await response.json().catch(() => ({ detail: 'An error occurred' }));
@@ -50,12 +49,16 @@ export const menuApi = {
 // ============== ORDERS API ==============
 
 export const ordersApi = {
-  // Create new order
-  create: (orderData) => apiCall('/orders/', {
+  // Create new order; retries with the same idempotencyKey never duplicate it
+  create: (orderData, idempotencyKey = null) => apiCall('/orders/', {
     method: 'POST',
     body: JSON.stringify(orderData),
+    headers: idempotencyKey ? { 'Idempotency-Key': idempotencyKey } : {},
   }),
   
+  // Delivery area and fee for a checkout address
+  checkDelivery: (address) => apiCall(`/orders/delivery-check?address=${encodeURIComponent(address)}`),
+  
   // Get order by ID
   get: (orderId) => apiCall(`/orders/${orderId}`),
   